@@ -1,7 +1,11 @@
+import json
 import logging
 import re
+from itertools import chain, islice
 from smtplib import SMTPException
 
+from django.apps import apps
+from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.utils import timezone
@@ -63,6 +67,12 @@ def send_campaign_email(email, context, to, connection=None, is_test=False):
         headers['List-Subscribe'] = ', '.join(list_subscribe_header)
         headers['List-Unsubscribe'] = ', '.join(list_unsubscribe_header)
 
+        # Returned by Mailgun in the `user-variables` of the message events
+        headers['X-Mailgun-Variables'] = json.dumps({
+            'colossus_email': str(email.uuid),
+            'colossus_subscriber': str(context['uuid']),
+        })
+
     message = EmailMultiAlternatives(
         subject=subject,
         body=plain_text_message,
@@ -111,7 +121,14 @@ def send_campaign_email_test(email, recipient_list):
     return send_campaign_email(email, context, recipient_list, is_test=True)
 
 
-def send_campaign(campaign):
+def send_campaign(campaign, audience=None):
+    """
+    :param audience: A `RoaringBitmap` of subscribers' primary keys (see
+    `colossus.apps.subscribers.audiences.get_audience`). If set, only the
+    recipients of the campaign which are part of it are sent the email.
+    """
+    from colossus.apps.subscribers.audiences import iter_audience_querysets
+
     campaign.status = CampaignStatus.DELIVERING
     campaign.save(update_fields=['status'])
     site = get_current_site(request=None)  # get site based on SITE_ID
@@ -122,15 +139,32 @@ def send_campaign(campaign):
     if campaign.track_opens:
         campaign.email.enable_open_tracking()
 
+    Suppression = apps.get_model('subscribers', 'Suppression')
+    recipients = campaign.get_recipients().order_by('pk')
+    if audience is not None:
+        recipients = chain.from_iterable(
+            iter_audience_querysets(recipients, audience, batch_size=settings.COLOSSUS_SEND_CHUNK_SIZE)
+        )
+    else:
+        recipients = recipients.iterator(chunk_size=settings.COLOSSUS_SEND_CHUNK_SIZE)
+
     with get_connection() as connection:
-        for subscriber in campaign.mailing_list.get_active_subscribers():
-            if not subscriber.activities.filter(activity_type=ActivityTypes.SENT, email=campaign.email).exists():
-                sent = send_campaign_email_subscriber(campaign.email, subscriber, site, connection)
-                if sent:
-                    subscriber.create_activity(ActivityTypes.SENT, email=campaign.email)
-                    subscriber.update_open_and_click_rate()
-                    subscriber.last_sent = timezone.now()
-                    subscriber.save(update_fields=['last_sent'])
+        while True:
+            subscribers = list(islice(recipients, settings.COLOSSUS_SEND_CHUNK_SIZE))
+            if not subscribers:
+                break
+            # Skip the globally suppressed addresses with one lookup per chunk
+            suppressed = Suppression.objects.get_suppressed_emails([subscriber.email for subscriber in subscribers])
+            for subscriber in subscribers:
+                if subscriber.email in suppressed:
+                    continue
+                if not subscriber.activities.filter(activity_type=ActivityTypes.SENT, email=campaign.email).exists():
+                    sent = send_campaign_email_subscriber(campaign.email, subscriber, site, connection)
+                    if sent:
+                        subscriber.create_activity(ActivityTypes.SENT, email=campaign.email)
+                        subscriber.update_open_and_click_rate()
+                        subscriber.last_sent = timezone.now()
+                        subscriber.save(update_fields=['last_sent'])
 
     campaign.mailing_list.update_open_and_click_rate()
     campaign.status = CampaignStatus.SENT
@@ -0,0 +1,100 @@
+from typing import Iterator, List
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import Activity
+
+ENGAGEMENT_EXPORT_FIELDS = [
+    'email',
+    'uuid',
+    'sent_date',
+    'first_open_date',
+    'last_open_date',
+    'opens_count',
+    'clicks_count',
+    'clicked_links',
+    'unsubscribed',
+    'city',
+    'country',
+]
+
+
+def get_campaign_activities(campaign):
+    """
+    Activities of the campaign emails, plus the unsubscriptions attributed to
+    the campaign. The emails are matched with a subquery, so no extra join is
+    needed to filter the (potentially very large) activities table.
+    """
+    emails_ids = campaign.emails.values('pk')
+    activities = Activity.objects.filter(
+        Q(email_id__in=emails_ids) | Q(campaign_id=campaign.pk, activity_type=ActivityTypes.UNSUBSCRIBED)
+    )
+    if campaign.send_date is not None:
+        activities = activities.filter(date__gte=campaign.send_date)
+    return activities
+
+
+def get_engagement_queryset(campaign):
+    """
+    One row per recipient, aggregating all their activities with a single
+    GROUP BY. The clicked links are fetched by `get_clicked_links_queryset`
+    instead of being joined here, which would repeat the row for every link.
+    """
+    return get_campaign_activities(campaign) \
+        .values('subscriber_id') \
+        .annotate(
+            sent_date=Min('date', filter=Q(activity_type=ActivityTypes.SENT)),
+            first_open_date=Min('date', filter=Q(activity_type=ActivityTypes.OPENED)),
+            last_open_date=Max('date', filter=Q(activity_type=ActivityTypes.OPENED)),
+            opens_count=Count('id', filter=Q(activity_type=ActivityTypes.OPENED)),
+            clicks_count=Count('id', filter=Q(activity_type=ActivityTypes.CLICKED)),
+            unsubscribed_count=Count('id', filter=Q(activity_type=ActivityTypes.UNSUBSCRIBED)),
+        ) \
+        .values_list(
+            'subscriber_id',
+            'subscriber__email',
+            'subscriber__uuid',
+            'sent_date',
+            'first_open_date',
+            'last_open_date',
+            'opens_count',
+            'clicks_count',
+            'unsubscribed_count',
+            'subscriber__location__name',
+            'subscriber__location__country__code',
+        ) \
+        .order_by('subscriber_id')
+
+
+def get_clicked_links_queryset(campaign):
+    return get_campaign_activities(campaign) \
+        .filter(activity_type=ActivityTypes.CLICKED) \
+        .values_list('subscriber_id', 'link__url') \
+        .order_by('subscriber_id', 'link__url') \
+        .distinct()
+
+
+def iter_engagement_rows(campaign) -> Iterator[List]:
+    """
+    Stream both querysets, ordered by subscriber, and merge them as they are
+    read, so only the current recipient is held in memory.
+    """
+    chunk_size = settings.COLOSSUS_EXPORT_CHUNK_SIZE
+    clicked_links = get_clicked_links_queryset(campaign).iterator(chunk_size=chunk_size)
+    next_link = next(clicked_links, None)
+    for row in get_engagement_queryset(campaign).iterator(chunk_size=chunk_size):
+        (subscriber_id, email, uuid, sent_date, first_open_date, last_open_date, opens_count, clicks_count,
+         unsubscribed_count, city, country) = row
+        links = list()
+        while next_link is not None and next_link[0] <= subscriber_id:
+            if next_link[0] == subscriber_id:
+                links.append(next_link[1])
+            next_link = next(clicked_links, None)
+        yield [email, uuid, sent_date, first_open_date, last_open_date, opens_count, clicks_count, links,
+               unsubscribed_count > 0, city, country]
+
+
+def get_engagement_export_name(campaign) -> str:
+    return 'campaign-%s-engagement' % campaign.pk
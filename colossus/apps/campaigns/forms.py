@@ -14,6 +14,23 @@ class CreateCampaignForm(forms.ModelForm):
         fields = ('name',)
 
 
+class CampaignRecipientsForm(forms.ModelForm):
+    class Meta:
+        model = Campaign
+        fields = ('mailing_list', 'segment')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        mailing_list = cleaned_data.get('mailing_list')
+        segment = cleaned_data.get('segment')
+        if segment is not None and segment.mailing_list != mailing_list:
+            self.add_error('segment', ValidationError(
+                gettext('The segment must belong to the selected mailing list.'),
+                code='segment_mailing_list_mismatch'
+            ))
+        return cleaned_data
+
+
 class ScheduleCampaignForm(forms.ModelForm):
     class Meta:
         model = Campaign
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0015_segment'),
+        ('campaigns', '0003_auto_20180815_2311'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='segment',
+            field=models.ForeignKey(blank=True, help_text='Send to the members of a segment instead of all the subscribers of the list.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campaigns', to='subscribers.Segment', verbose_name='segment'),
+        ),
+    ]
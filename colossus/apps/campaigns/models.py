@@ -40,6 +40,15 @@ class Campaign(models.Model):
         null=True,
         blank=True
     )
+    segment = models.ForeignKey(
+        'subscribers.Segment',
+        on_delete=models.SET_NULL,
+        verbose_name=_('segment'),
+        related_name='campaigns',
+        null=True,
+        blank=True,
+        help_text=_('Send to the members of a segment instead of all the subscribers of the list.')
+    )
     status = models.PositiveSmallIntegerField(
         _('status'),
         choices=CampaignStatus.CHOICES,
@@ -105,9 +114,16 @@ class Campaign(models.Model):
                 self.__cached_email = self.emails.order_by('id').first()
         return self.__cached_email
 
+    def get_recipients(self) -> QuerySet:
+        if self.segment_id is not None:
+            return self.segment.get_members()
+        return self.mailing_list.get_active_subscribers()
+
     def send(self):
         with transaction.atomic():
-            self.recipients_count = self.mailing_list.get_active_subscribers().count()
+            if self.segment_id is not None:
+                self.segment.refresh_members()
+            self.recipients_count = self.get_recipients().count()
             self.send_date = timezone.now()
             self.status = CampaignStatus.QUEUED
             for email in self.emails.select_related('template').all():
@@ -128,6 +144,7 @@ class Campaign(models.Model):
             name=name,
             campaign_type=self.campaign_type,
             mailing_list=self.mailing_list,
+            segment=self.segment,
             status=CampaignStatus.DRAFT,
         )
 
@@ -181,6 +198,22 @@ class Campaign(models.Model):
         self.save(update_fields=['unique_opens_count', 'total_opens_count', 'open_rate'])
         return (self.unique_opens_count, self.total_opens_count, self.open_rate)
 
+    def get_activities(self) -> QuerySet:
+        """
+        A method to list the activities related to the campaign's emails
+
+        Once the campaign is sent, the search is limited to activities created
+        after the send date. This way, if the activities table is partitioned,
+        only the partitions after the send date are scanned.
+
+        :return: All activities associated with the campaign's emails
+        """
+        Activity = apps.get_model('subscribers', 'Activity')
+        activities = Activity.objects.filter(email__campaign=self)
+        if self.send_date is not None:
+            activities = activities.filter(date__gte=self.send_date)
+        return activities
+
     def get_links(self) -> QuerySet:
         """
         A method to list campaign's links
@@ -301,7 +334,7 @@ class Email(models.Model):
             'unsub': False
         }
 
-        if self.campaign.mailing_list is not None and self.campaign.mailing_list.get_active_subscribers().exists():
+        if self.campaign.mailing_list is not None and self.campaign.get_recipients().exists():
             _checklist['recipients'] = True
 
         if self.from_email:
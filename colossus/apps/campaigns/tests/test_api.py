@@ -1,4 +1,7 @@
+import json
+
 from django.core import mail
+from django.test import override_settings
 
 from colossus.apps.campaigns.api import (
     get_test_email_context, send_campaign, send_campaign_email_test,
@@ -9,8 +12,13 @@ from colossus.apps.campaigns.tests.factories import (
 )
 from colossus.apps.lists.models import MailingList
 from colossus.apps.lists.tests.factories import MailingListFactory
-from colossus.apps.subscribers.constants import ActivityTypes
-from colossus.apps.subscribers.models import Activity, Subscriber
+from colossus.apps.subscribers.audiences import get_audience
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, Status, SuppressionReasons,
+)
+from colossus.apps.subscribers.models import (
+    Activity, Segment, Subscriber, Suppression, Tag,
+)
 from colossus.apps.subscribers.tests.factories import SubscriberFactory
 from colossus.test.testcases import TestCase
 from colossus.utils import get_absolute_url
@@ -108,6 +116,14 @@ class SendCampaignTests(TestCase):
     def test_emails_sent(self):
         self.assertEqual(len(mail.outbox), 10, 'Campaign must send 1 email for each subscriber.')
 
+    def test_mailgun_variables_header(self):
+        for email in mail.outbox:
+            with self.subTest(email=email):
+                subscriber = Subscriber.objects.get(email=email.to[0])
+                variables = json.loads(email.extra_headers['X-Mailgun-Variables'])
+                self.assertEqual({'colossus_email': str(self.email.uuid), 'colossus_subscriber': str(subscriber.uuid)},
+                                 variables)
+
     def test_emails_contents(self):
         for email in mail.outbox:
             with self.subTest(email=email):
@@ -128,6 +144,83 @@ class SendCampaignTests(TestCase):
                 self.assertIn('/track/open/', html_body, 'Email HTML body must contain track open pixel.')
 
 
+class SendCampaignToSegmentTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        tag = Tag.objects.create(name='vip', mailing_list=self.mailing_list)
+        self.members = SubscriberFactory.create_batch(3, mailing_list=self.mailing_list)
+        for subscriber in self.members:
+            subscriber.tags.add(tag)
+        SubscriberFactory.create_batch(2, mailing_list=self.mailing_list)
+        segment = Segment(mailing_list=self.mailing_list, name='VIP')
+        segment.set_filters([{'field': 'tags', 'operator': 'in', 'value': [tag.pk]}])
+        segment.save()
+        self.campaign = CampaignFactory(mailing_list=self.mailing_list, segment=segment)
+        self.email = EmailFactory(campaign=self.campaign, from_email='john@doe.com', subject='Test email subject')
+        self.email.set_template_content()
+        self.email.set_blocks({'content': '<p>Hi there!</p>'})
+        self.email.save()
+
+    def test_send_to_segment_members(self):
+        self.campaign.send()
+        self.campaign.refresh_from_db()
+        self.assertEqual(3, self.campaign.recipients_count)
+        self.assertEqual(CampaignStatus.SENT, self.campaign.status)
+        self.assertEqual(
+            sorted(subscriber.email for subscriber in self.members),
+            sorted(email.to[0] for email in mail.outbox)
+        )
+
+
+class SendCampaignToAudienceTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        self.tag = Tag.objects.create(name='vip', mailing_list=self.mailing_list)
+        self.subscribers = SubscriberFactory.create_batch(4, mailing_list=self.mailing_list)
+        for subscriber in self.subscribers[:3]:
+            subscriber.tags.add(self.tag)
+        self.subscribers[0].status = Status.UNSUBSCRIBED
+        self.subscribers[0].save()
+        self.campaign = CampaignFactory(mailing_list=self.mailing_list)
+        self.email = EmailFactory(campaign=self.campaign, from_email='john@doe.com', subject='Test email subject')
+        self.email.set_template_content()
+        self.email.set_blocks({'content': '<p>Hi there!</p>'})
+        self.email.save()
+
+    @override_settings(COLOSSUS_SEND_CHUNK_SIZE=1)
+    def test_send_to_tag_audience(self):
+        audience = get_audience(self.mailing_list.pk, status=None, all_tags=[self.tag])
+        send_campaign(self.campaign, audience=audience)
+        # The unsubscribed member of the audience isn't a recipient of the campaign
+        self.assertEqual(
+            sorted(subscriber.email for subscriber in self.subscribers[1:3]),
+            sorted(email.to[0] for email in mail.outbox)
+        )
+
+
+class SendCampaignSuppressionTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        self.subscribers = SubscriberFactory.create_batch(3, mailing_list=self.mailing_list)
+        Suppression.objects.suppress([self.subscribers[0].email.upper()], SuppressionReasons.COMPLAINED)
+        self.campaign = CampaignFactory(mailing_list=self.mailing_list)
+        self.email = EmailFactory(campaign=self.campaign, from_email='john@doe.com', subject='Test email subject')
+        self.email.set_template_content()
+        self.email.set_blocks({'content': '<p>Hi there!</p>'})
+        self.email.save()
+
+    def test_suppressed_addresses_are_skipped(self):
+        send_campaign(self.campaign)
+        self.assertEqual(
+            sorted(subscriber.email for subscriber in self.subscribers[1:]),
+            sorted(email.to[0] for email in mail.outbox)
+        )
+        self.assertFalse(Activity.objects.filter(subscriber=self.subscribers[0]).exists())
+
+
 class SendCampaignEmailTestTests(TestCase):
     def setUp(self):
         super().setUp()
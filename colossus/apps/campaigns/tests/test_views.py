@@ -1,10 +1,14 @@
+import json
+
 from django.urls import reverse
 
 from colossus.apps.accounts.tests.factories import UserFactory
 from colossus.apps.campaigns.models import Campaign
-from colossus.test.testcases import TestCase
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.test.testcases import AuthenticatedTestCase, TestCase
 
-from .factories import CampaignFactory
+from .factories import CampaignFactory, EmailFactory, LinkFactory
 
 
 class CampaignsLoginRequiredTests(TestCase):
@@ -32,6 +36,7 @@ class CampaignsLoginRequiredTests(TestCase):
             ('replicate_campaign', {'pk': 1}),
             ('delete_campaign', {'pk': 1}),
             ('schedule_campaign', {'pk': 1}),
+            ('export_campaign_engagement', {'pk': 1}),
         ]
         for url_name, kwargs in patterns:
             with self.subTest(url_name=url_name):
@@ -66,3 +71,49 @@ class CampaignListViewSuccessTests(TestCase):
         for content in contents:
             with self.subTest(content=content):
                 self.assertContains(self.response, content)
+
+
+class ExportCampaignEngagementTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.email = EmailFactory()
+        self.campaign = self.email.campaign
+        link_1 = LinkFactory(email=self.email, url='https://example.com/1')
+        link_2 = LinkFactory(email=self.email, url='https://example.com/2')
+        self.subscriber_1 = SubscriberFactory()
+        self.subscriber_2 = SubscriberFactory()
+        for subscriber in (self.subscriber_1, self.subscriber_2):
+            subscriber.create_activity(ActivityTypes.SENT, email=self.email)
+        self.subscriber_1.create_activity(ActivityTypes.OPENED, email=self.email)
+        self.subscriber_1.create_activity(ActivityTypes.OPENED, email=self.email)
+        self.subscriber_1.create_activity(ActivityTypes.CLICKED, email=self.email, link=link_1)
+        self.subscriber_1.create_activity(ActivityTypes.CLICKED, email=self.email, link=link_1)
+        self.subscriber_1.create_activity(ActivityTypes.CLICKED, email=self.email, link=link_2)
+        self.subscriber_2.create_activity(ActivityTypes.UNSUBSCRIBED, campaign=self.campaign)
+        self.url = reverse('campaigns:export_campaign_engagement', kwargs={'pk': self.campaign.pk})
+
+    def export(self, export_format):
+        response = self.client.get(self.url, {'format': export_format})
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_one_row_per_recipient(self):
+        rows = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertEqual([self.subscriber_1.email, self.subscriber_2.email], [row['email'] for row in rows])
+        self.assertEqual(2, rows[0]['opens_count'])
+        self.assertEqual(3, rows[0]['clicks_count'])
+        self.assertEqual(['https://example.com/1', 'https://example.com/2'], rows[0]['clicked_links'])
+        self.assertIsNotNone(rows[0]['first_open_date'])
+        self.assertFalse(rows[0]['unsubscribed'])
+        self.assertEqual(0, rows[1]['opens_count'])
+        self.assertEqual([], rows[1]['clicked_links'])
+        self.assertIsNone(rows[1]['first_open_date'])
+        self.assertTrue(rows[1]['unsubscribed'])
+
+    def test_csv(self):
+        lines = self.export('csv').splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith('email,uuid,sent_date'))
+        self.assertIn('https://example.com/1 https://example.com/2', lines[1])
+
+    def test_invalid_format(self):
+        self.assertEqual(404, self.client.get(self.url, {'format': 'xls'}).status_code)
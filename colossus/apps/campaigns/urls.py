@@ -16,6 +16,7 @@ urlpatterns = [
          name='campaign_reports_locations'),
     path('<int:pk>/reports/locations/<str:country_code>/', views.CampaignReportsCountryView.as_view(),
          name='campaign_reports_country'),
+    path('<int:pk>/reports/export/', views.export_campaign_engagement, name='export_campaign_engagement'),
     path('<int:pk>/links/', views.CampaignLinksView.as_view(), name='campaign_links'),
     path('<int:pk>/links/<int:link_pk>/edit/', views.LinkUpdateView.as_view(), name='edit_link'),
     path('<int:pk>/edit/', views.CampaignEditView.as_view(), name='campaign_edit'),
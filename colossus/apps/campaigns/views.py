@@ -2,7 +2,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Count
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
@@ -17,12 +17,16 @@ from django.views.generic import (
 from colossus.apps.core.models import Country
 from colossus.apps.subscribers.constants import ActivityTypes
 from colossus.apps.subscribers.models import Activity
+from colossus.exports import ExportFormats, get_streaming_export_response
 
 from .api import get_test_email_context
 from .constants import CampaignStatus, CampaignTypes
+from .exports import (
+    ENGAGEMENT_EXPORT_FIELDS, get_engagement_export_name, iter_engagement_rows,
+)
 from .forms import (
-    CampaignTestEmailForm, CreateCampaignForm, EmailEditorForm,
-    ScheduleCampaignForm,
+    CampaignRecipientsForm, CampaignTestEmailForm, CreateCampaignForm,
+    EmailEditorForm, ScheduleCampaignForm,
 )
 from .mixins import CampaignMixin
 from .models import Campaign, Email, Link
@@ -154,18 +158,19 @@ class CampaignReportsView(CampaignMixin, DetailView):
 
         links = campaign.get_links().only('url', 'total_clicks_count')[:10]
 
-        unsubscribed_count = Activity.objects \
-            .filter(campaign_id=self.kwargs.get('pk'), activity_type=ActivityTypes.UNSUBSCRIBED) \
-            .count()
+        unsubscribed_activities = Activity.objects.filter(campaign=campaign, activity_type=ActivityTypes.UNSUBSCRIBED)
+        if campaign.send_date is not None:
+            unsubscribed_activities = unsubscribed_activities.filter(date__gte=campaign.send_date)
+        unsubscribed_count = unsubscribed_activities.count()
 
-        subscriber_open_activities = Activity.objects \
-            .filter(email__campaign_id=self.kwargs.get('pk'), activity_type=ActivityTypes.OPENED) \
+        subscriber_open_activities = campaign.get_activities() \
+            .filter(activity_type=ActivityTypes.OPENED) \
             .values('subscriber__id', 'subscriber__email') \
             .annotate(total_opens=Count('id')) \
             .order_by('-total_opens')[:10]
 
-        location_open_activities = Activity.objects \
-            .filter(email__campaign_id=self.kwargs.get('pk'), activity_type=ActivityTypes.OPENED) \
+        location_open_activities = campaign.get_activities() \
+            .filter(activity_type=ActivityTypes.OPENED) \
             .values('location__country__code', 'location__country__name') \
             .annotate(total_opens=Count('id')) \
             .order_by('-total_opens')[:10]
@@ -187,8 +192,8 @@ class CampaignReportsLocationsView(CampaignMixin, DetailView):
     extra_context = {'submenu': 'reports'}
 
     def get_context_data(self, **kwargs):
-        location_open_activities = Activity.objects \
-            .filter(email__campaign_id=self.kwargs.get('pk'), activity_type=ActivityTypes.OPENED) \
+        location_open_activities = self.object.get_activities() \
+            .filter(activity_type=ActivityTypes.OPENED) \
             .values('location__country__code', 'location__country__name') \
             .annotate(total_opens=Count('id')) \
             .order_by('-total_opens')
@@ -210,17 +215,13 @@ class CampaignReportsCountryView(CampaignMixin, DetailView):
         country_code = self.kwargs.get('country_code')
         country = get_object_or_404(Country, code=country_code)
 
-        country_total_opens = Activity.objects \
-            .filter(email__campaign_id=self.kwargs.get('pk'),
-                    activity_type=ActivityTypes.OPENED,
-                    location__country__code=country_code) \
+        country_total_opens = self.object.get_activities() \
+            .filter(activity_type=ActivityTypes.OPENED, location__country__code=country_code) \
             .values('location__country__code') \
             .aggregate(total=Count('location__country__code'))
 
-        cities = Activity.objects \
-            .filter(email__campaign_id=self.kwargs.get('pk'),
-                    activity_type=ActivityTypes.OPENED,
-                    location__country__code=country_code) \
+        cities = self.object.get_activities() \
+            .filter(activity_type=ActivityTypes.OPENED, location__country__code=country_code) \
             .select_related('location') \
             .values('location__name') \
             .annotate(total=Count('location__name')) \
@@ -236,7 +237,7 @@ class CampaignReportsCountryView(CampaignMixin, DetailView):
 @method_decorator(login_required, name='dispatch')
 class CampaignEditRecipientsView(CampaignMixin, UpdateView):
     model = Campaign
-    fields = ('mailing_list',)
+    form_class = CampaignRecipientsForm
     context_object_name = 'campaign'
 
     def get_context_data(self, **kwargs):
@@ -439,6 +440,21 @@ def send_campaign(request, pk):
     })
 
 
+@require_GET
+@login_required
+def export_campaign_engagement(request, pk):
+    campaign = get_object_or_404(Campaign, pk=pk)
+    export_format = request.GET.get('format', ExportFormats.CSV)
+    if export_format not in ExportFormats.LABELS:
+        raise Http404
+    return get_streaming_export_response(
+        get_engagement_export_name(campaign),
+        export_format,
+        ENGAGEMENT_EXPORT_FIELDS,
+        iter_engagement_rows(campaign)
+    )
+
+
 @require_GET
 @login_required
 def replicate_campaign(request, pk):
@@ -1,28 +1,111 @@
-from typing import Dict, Optional
+"""
+Minimal client of the Mailgun API.
+
+All the requests of a process go through a single `requests.Session`, so the
+TLS connections to the API are pooled and reused across calls. Responses with
+a 429 or 5xx status, as well as failed connections, are retried with an
+exponential backoff (honoring the `Retry-After` header). Every request has
+explicit connect and read timeouts.
+
+The listing endpoints are exposed as generators following the `paging.next`
+links, so callers can read any number of items while holding a single page
+in memory.
+"""
+import os
+from typing import Dict, Iterator, Optional
 
 from django.conf import settings
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_pid = None
+
+
+def get_session() -> requests.Session:
+    """
+    Return the session shared by the current process. Worker processes forked
+    from a parent that already opened connections get a session of their own.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        retry = Retry(
+            total=settings.MAILGUN_API_MAX_RETRIES,
+            # A request that timed out while reading may have been processed:
+            # raise the timeout instead of sending it again.
+            read=False,
+            backoff_factor=settings.MAILGUN_API_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=settings.MAILGUN_API_POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def close_session():
+    global _session, _session_pid
+    if _session is not None:
+        _session.close()
+    _session, _session_pid = None, None
 
 
 class Mailgun:
-    def _request(self, method: str, endpoint: str, params: Optional[Dict] = None):
-        url = '%s/%s' % (settings.MAILGUN_API_BASE_URL, endpoint)
-        response = requests.request(method, url, params=params, auth=('api', settings.MAILGUN_API_KEY))
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session if session is not None else get_session()
+
+    def _request_url(self, method: str, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """
+        :raises requests.HTTPError: If the API still answers with an error once
+        the retries are exhausted
+        :raises requests.Timeout: If the API does not answer in time
+        """
+        response = self.session.request(
+            method,
+            url,
+            params=params,
+            auth=('api', settings.MAILGUN_API_KEY),
+            timeout=(settings.MAILGUN_API_CONNECT_TIMEOUT, settings.MAILGUN_API_READ_TIMEOUT)
+        )
+        response.raise_for_status()
         return response
 
-    def bounces(self):
-        response = self._request('get', 'bounces')
-        return response.json()
+    def _request(self, method: str, endpoint: str, params: Optional[Dict] = None) -> requests.Response:
+        url = '%s/%s' % (settings.MAILGUN_API_BASE_URL, endpoint)
+        return self._request_url(method, url, params)
+
+    def _iter_pages(self, endpoint: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Follow the `paging.next` links of a listing endpoint. The last page is
+        the first one to come back without items.
+        """
+        page = self._request('get', endpoint, params).json()
+        while page.get('items'):
+            yield from page['items']
+            next_url = page.get('paging', dict()).get('next')
+            if not next_url:
+                break
+            page = self._request_url('get', next_url).json()
+
+    def bounces(self, limit: int = 1000) -> Iterator[Dict]:
+        return self._iter_pages('bounces', {'limit': limit})
 
     def delete_bounce(self, address: str):
         endpoint = 'bounces/%s' % address
         response = self._request('delete', endpoint)
         return response.json()
 
-    def events(self, params: Optional[Dict] = None):
-        response = self._request('get', 'events', params)
-        return response.json()
+    def events(self, params: Optional[Dict] = None, limit: int = 300) -> Iterator[Dict]:
+        params = dict(params or dict(), limit=limit)
+        return self._iter_pages('events', params)
 
-    def failed_events(self):
-        return self.events({'event': 'rejected OR failed'})
+    def failed_events(self, params: Optional[Dict] = None, limit: int = 300) -> Iterator[Dict]:
+        params = dict(params or dict(), event='rejected OR failed')
+        return self.events(params, limit)
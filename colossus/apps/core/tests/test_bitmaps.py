@@ -0,0 +1,46 @@
+import random
+
+from django.test import SimpleTestCase
+
+from colossus.bitmaps import ARRAY_MAX_SIZE, RoaringBitmap
+
+
+class RoaringBitmapTests(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(42)
+        # Sparse values spread over many containers, plus a dense range.
+        self.left = set(generator.sample(range(500000), 20000)) | set(range(70000, 80000))
+        self.right = set(generator.sample(range(500000), 3000)) | set(range(75000, 76000))
+
+    def test_set_operations(self):
+        left, right = RoaringBitmap(self.left), RoaringBitmap(self.right)
+        self.assertEqual(sorted(self.left & self.right), list(left & right))
+        self.assertEqual(sorted(self.left | self.right), list(left | right))
+        self.assertEqual(sorted(self.left - self.right), list(left - right))
+        self.assertEqual(sorted(self.right - self.left), list(right - left))
+        self.assertEqual(len(self.left | self.right), len(RoaringBitmap.union(left, right)))
+
+    def test_containers_switch_representation(self):
+        bitmap = RoaringBitmap(range(ARRAY_MAX_SIZE + 1))
+        self.assertIsInstance(bitmap._containers[0], int)
+        bitmap.discard(0)
+        self.assertNotIsInstance(bitmap._containers[0], int)
+        self.assertEqual(ARRAY_MAX_SIZE, len(bitmap))
+        self.assertNotIn(0, bitmap)
+        self.assertIn(ARRAY_MAX_SIZE, bitmap)
+
+    def test_serialization(self):
+        bitmap = RoaringBitmap(self.left)
+        self.assertEqual(bitmap, RoaringBitmap.from_bytes(bitmap.to_bytes()))
+        self.assertEqual(RoaringBitmap(), RoaringBitmap.from_bytes(RoaringBitmap().to_bytes()))
+        with self.assertRaises(ValueError):
+            RoaringBitmap.from_bytes(b'invalid!')
+
+    def test_chunks(self):
+        bitmap = RoaringBitmap([5, 1, 70000, 3])
+        self.assertEqual([[1, 3, 5], [70000]], list(bitmap.chunks(3)))
+
+    def test_negative_values(self):
+        with self.assertRaises(ValueError):
+            RoaringBitmap([-1])
+        self.assertNotIn(-1, RoaringBitmap([1]))
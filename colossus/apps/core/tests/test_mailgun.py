@@ -0,0 +1,127 @@
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.test import SimpleTestCase, override_settings
+
+import requests
+
+from colossus.apps.core import mailgun
+from colossus.apps.core.mailgun import Mailgun
+
+
+class MailgunStandInHandler(BaseHTTPRequestHandler):
+    """
+    Answer the requests with the responses queued in `server.responses`, as
+    (status, body) tuples, recording the path and client port of each request.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address[1]))
+        status, body = self.server.responses.pop(0)
+        if body is None:
+            # Hang past the read timeout of the client.
+            self.server.release.wait(5)
+            return
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MailgunStandInServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MailgunTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = MailgunStandInServer(('127.0.0.1', 0), MailgunStandInHandler)
+        self.server.requests = list()
+        self.server.responses = list()
+        self.server.release = threading.Event()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.base_url = 'http://127.0.0.1:%s/v3/example.com' % self.server.server_port
+        settings_override = override_settings(
+            MAILGUN_API_KEY='key',
+            MAILGUN_API_BASE_URL=self.base_url,
+            MAILGUN_API_BACKOFF_FACTOR=0,
+            MAILGUN_API_READ_TIMEOUT=0.5,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.release.set)
+        mailgun.close_session()
+        self.addCleanup(mailgun.close_session)
+
+    def next_page(self, address):
+        return '%s/bounces?page=next&address=%s' % (self.base_url, address)
+
+
+class MailgunPaginationTests(MailgunTestCase):
+    def test_bounces_follow_pages(self):
+        self.server.responses = [
+            (200, {'items': [{'address': 'a@example.com'}, {'address': 'b@example.com'}],
+                   'paging': {'next': self.next_page('b@example.com')}}),
+            (200, {'items': [{'address': 'c@example.com'}], 'paging': {'next': self.next_page('c@example.com')}}),
+            (200, {'items': [], 'paging': {'next': self.next_page('c@example.com')}}),
+        ]
+        addresses = [bounce['address'] for bounce in Mailgun().bounces(limit=2)]
+        self.assertEqual(['a@example.com', 'b@example.com', 'c@example.com'], addresses)
+        paths = [path for path, port in self.server.requests]
+        self.assertEqual(3, len(paths))
+        self.assertEqual({'limit': ['2']}, parse_qs(urlparse(paths[0]).query))
+        self.assertTrue(paths[1].endswith('page=next&address=b@example.com'))
+
+    def test_failed_events_filter(self):
+        self.server.responses = [(200, {'items': [{'event': 'failed'}]}), ]
+        self.assertEqual([{'event': 'failed'}], list(Mailgun().failed_events(limit=10)))
+        query = parse_qs(urlparse(self.server.requests[0][0]).query)
+        self.assertEqual({'event': ['rejected OR failed'], 'limit': ['10']}, query)
+
+    def test_connection_reused(self):
+        self.server.responses = [(200, {'items': []})] * 3
+        client = Mailgun()
+        for _ in range(3):
+            list(client.events())
+        self.assertEqual(1, len({port for path, port in self.server.requests}))
+
+
+class MailgunRetryTests(MailgunTestCase):
+    def test_retry_on_server_errors(self):
+        self.server.responses = [
+            (503, {'message': 'Service unavailable'}),
+            (429, {'message': 'Too many requests'}),
+            (200, {'items': [{'address': 'a@example.com'}]}),
+        ]
+        self.assertEqual([{'address': 'a@example.com'}], list(Mailgun().bounces()))
+        self.assertEqual(3, len(self.server.requests))
+
+    @override_settings(MAILGUN_API_MAX_RETRIES=1)
+    def test_error_raised_once_retries_exhausted(self):
+        self.server.responses = [(500, {'message': 'Error'})] * 2
+        with self.assertRaises(requests.HTTPError):
+            list(Mailgun().bounces())
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_client_errors_not_retried(self):
+        self.server.responses = [(401, {'message': 'Unauthorized'})]
+        with self.assertRaises(requests.HTTPError):
+            list(Mailgun().bounces())
+        self.assertEqual(1, len(self.server.requests))
+
+    @override_settings(MAILGUN_API_MAX_RETRIES=0)
+    def test_read_timeout(self):
+        self.server.responses = [(200, None)]
+        with self.assertRaises(requests.Timeout):
+            list(Mailgun().bounces())
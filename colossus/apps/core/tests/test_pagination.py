@@ -0,0 +1,50 @@
+import datetime
+
+from django.utils import timezone
+
+from colossus.apps.subscribers.models import Activity
+from colossus.apps.subscribers.tests.factories import ActivityFactory
+from colossus.pagination import InvalidCursor, KeysetPaginator
+from colossus.test.testcases import TestCase
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        ActivityFactory.create_batch(7, activity_type=1)
+        # Force a few activities to share the same date to exercise the tie breaker
+        activities = list(Activity.objects.order_by('pk'))
+        for index, activity in enumerate(activities):
+            activity.date = now - datetime.timedelta(minutes=index // 2)
+            activity.save(update_fields=['date'])
+        self.expected = list(Activity.objects.order_by('-date', '-id').values_list('pk', flat=True))
+
+    def test_walk_all_pages(self):
+        paginator = KeysetPaginator(Activity.objects.all(), ('-date', '-id'), per_page=3)
+        pks = list()
+        cursor = None
+        pages_count = 0
+        while True:
+            page = paginator.page(cursor)
+            pages_count += 1
+            pks.extend(activity.pk for activity in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(self.expected, pks)
+        self.assertEqual(3, pages_count)
+
+    def test_ascending_ordering(self):
+        paginator = KeysetPaginator(Activity.objects.all(), ('date', 'id'), per_page=4)
+        first_page = paginator.page()
+        second_page = paginator.page(first_page.next_cursor)
+        pks = [activity.pk for activity in first_page] + [activity.pk for activity in second_page]
+        self.assertEqual(list(reversed(self.expected)), pks)
+        self.assertFalse(second_page.has_next())
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Activity.objects.all(), ('-date', '-id'))
+        for cursor in ('invalid', 'W10=', 'WyJmb28iLCAiYmFyIl0='):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(cursor)
@@ -1,10 +1,18 @@
 import uuid
+from unittest import mock
 
 from django.contrib.sites.models import Site
-from django.test import override_settings
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
 
+from geoip2.errors import AddressNotFoundError
+
+from colossus.apps.core.models import City, Country
 from colossus.test.testcases import TestCase
-from colossus.utils import get_absolute_url
+from colossus.utils import (
+    GeoIPLocator, LRUCache, get_absolute_url, get_geoip_locator,
+    get_max_batch_size,
+)
 
 
 class TestGetAbsoluteURL(TestCase):
@@ -31,3 +39,99 @@ class TestGetAbsoluteURL(TestCase):
         Site.objects.clear_cache()
         url = get_absolute_url('login')
         self.assertEqual(url, 'http://mysite.com/accounts/login/')
+
+
+class LRUCacheTests(TestCase):
+    def setUp(self):
+        self.cache = LRUCache(maxsize=2)
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+
+    def test_get(self):
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('c'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 2, 'maxsize': 2}, self.cache.stats())
+
+    def test_discard_least_recently_used(self):
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(2, len(self.cache))
+
+    def test_pop(self):
+        self.assertEqual(1, self.cache.pop('a'))
+        self.assertIsNone(self.cache.pop('a'))
+
+
+class GetMaxBatchSizeTests(TestCase):
+    def test_no_limit(self):
+        with mock.patch.object(connection.features, 'max_query_params', None):
+            self.assertEqual(5, get_max_batch_size(5))
+            self.assertEqual(5000, get_max_batch_size(5000))
+
+    def test_limit(self):
+        with mock.patch.object(connection.features, 'max_query_params', 999):
+            self.assertEqual(5, get_max_batch_size(5))
+            self.assertEqual(989, get_max_batch_size(5000))
+            self.assertEqual(1, get_max_batch_size(5000, reserved_params=999))
+
+
+GEODATA = {
+    '203.0.113.1': {'country_code': 'CA', 'country_name': 'Canada', 'city': 'Vancouver'},
+    '203.0.113.2': {'country_code': 'CA', 'country_name': 'Canada', 'city': 'Vancouver'},
+    '203.0.113.3': {'country_code': 'CA', 'country_name': 'Canada', 'city': None},
+}
+
+
+def fake_city(ip_address):
+    if ip_address not in GEODATA:
+        raise AddressNotFoundError('The address %s is not in the database.' % ip_address)
+    return GEODATA[ip_address]
+
+
+class GeoIPLocatorTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch('colossus.utils.GeoIP2')
+        self.geoip2_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.geoip2 = self.geoip2_class.return_value
+        self.geoip2.city.side_effect = fake_city
+        self.locator = GeoIPLocator(ip_cache_size=10, cities_cache_size=10)
+
+    def test_city_id(self):
+        city_id = self.locator.get_city_id_for_ip('203.0.113.1')
+        city = City.objects.get(pk=city_id)
+        self.assertEqual(('Vancouver', 'CA'), (city.name, city.country.code))
+
+    def test_cached_ip_address(self):
+        city_id = self.locator.get_city_id_for_ip('203.0.113.1')
+        with self.assertNumQueries(0):
+            self.assertEqual(city_id, self.locator.get_city_id_for_ip('203.0.113.1'))
+        self.assertEqual(1, self.geoip2.city.call_count)
+        self.geoip2_class.assert_called_once_with()
+
+    def test_cached_city_and_country(self):
+        city_id = self.locator.get_city_id_for_ip('203.0.113.1')
+        with self.assertNumQueries(0):
+            self.assertEqual(city_id, self.locator.get_city_id_for_ip('203.0.113.2'))
+        self.assertEqual(1, City.objects.count())
+
+    def test_unknown_locations_cached(self):
+        self.assertIsNone(self.locator.get_city_id_for_ip('198.51.100.1'))
+        self.assertIsNone(self.locator.get_city_id_for_ip('203.0.113.3'))
+        self.assertIsNone(self.locator.get_city_id_for_ip('198.51.100.1'))
+        self.assertEqual(2, self.geoip2.city.call_count)
+        self.assertEqual(1, Country.objects.count())
+
+    def test_stats(self):
+        self.locator.get_city_id_for_ip('203.0.113.1')
+        self.locator.get_city_id_for_ip('203.0.113.1')
+        self.locator.get_city_id_for_ip('203.0.113.1')
+        self.locator.get_city_id_for_ip('203.0.113.2')
+        stats = self.locator.stats()
+        self.assertEqual(0.5, stats['ips']['hit_rate'])
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 10, 'hit_rate': 0.5}, stats['cities'])
+
+    def test_shared_locator(self):
+        self.assertIs(get_geoip_locator(), get_geoip_locator())
@@ -0,0 +1,138 @@
+"""
+Read the bounce messages (RFC 3464 delivery status notifications) of a local
+Maildir or mbox mailbox, for the setups where bounces are not collected by an
+email service provider.
+
+The messages are parsed one at a time, so the memory footprint does not depend
+on the size of the mailbox. Each iterator yields the failed recipients of a
+message along with the position to commit once they are applied:
+
+* Maildir: the name of the file in `new/`, moved to `cur/` once processed,
+  as any other mail client would do;
+* mbox: the byte offset after the message, saved as a checkpoint so the next
+  run resumes from there.
+"""
+import hashlib
+import json
+import os
+import re
+from email.message import Message
+from email.parser import BytesParser
+from email.policy import compat32
+from typing import Iterable, Iterator, List, Tuple
+
+from colossus.apps.core.models import Option
+
+STATUS_CODE_RE = re.compile(r'\b([245]\.\d{1,3}\.\d{1,3})\b')
+
+FailedRecipients = List[Tuple[str, str]]
+
+
+def is_maildir(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, 'new'))
+
+
+def is_hard_bounce(status: str) -> bool:
+    """
+    Permanent failures have a status code of class 5 (e.g. 5.1.1, unknown
+    mailbox). Class 4 codes are transient failures the MTA will retry.
+    """
+    return status.startswith('5.')
+
+
+def parse_message(data) -> Message:
+    parser = BytesParser(policy=compat32)
+    if isinstance(data, bytes):
+        return parser.parsebytes(data)
+    return parser.parse(data)
+
+
+def get_failed_recipients(message: Message) -> FailedRecipients:
+    """
+    Extract the (email address, status code) of the recipients reported with
+    the "failed" action in the delivery status parts of the message.
+    """
+    failed = list()
+    for part in message.walk():
+        if part.get_content_type() != 'message/delivery-status':
+            continue
+        # The status fields are parsed as a list of header blocks: the
+        # per-message fields first, then one block per recipient.
+        blocks = part.get_payload()
+        if not isinstance(blocks, list):
+            continue
+        for fields in blocks:
+            recipient = fields.get('Original-Recipient') or fields.get('Final-Recipient')
+            if not recipient or str(fields.get('Action', '')).strip().lower() != 'failed':
+                continue
+            address = str(recipient).split(';', 1)[-1].strip().strip('<>')
+            match = STATUS_CODE_RE.search(str(fields.get('Status', '')))
+            if address and match is not None:
+                failed.append((address, match.group(1)))
+    return failed
+
+
+def iter_maildir_bounces(path: str) -> Iterator[Tuple[FailedRecipients, str]]:
+    """
+    Iterate over the new messages of the Maildir, in delivery order, as
+    (failed recipients, file name) tuples.
+    """
+    new_dir = os.path.join(path, 'new')
+    for name in sorted(os.listdir(new_dir)):
+        if name.startswith('.'):
+            continue
+        with open(os.path.join(new_dir, name), 'rb') as message_file:
+            yield get_failed_recipients(parse_message(message_file)), name
+
+
+def mark_maildir_messages_seen(path: str, names: Iterable[str]):
+    for name in names:
+        seen_name = name if ':2,' in name else '%s:2,S' % name
+        os.rename(os.path.join(path, 'new', name), os.path.join(path, 'cur', seen_name))
+
+
+def iter_mbox_bounces(path: str, offset: int = 0) -> Iterator[Tuple[FailedRecipients, int]]:
+    """
+    Iterate over the messages of the mbox file starting from the byte
+    `offset`, as (failed recipients, offset after the message) tuples. A
+    message starts with a "From " line at the beginning of the file or after
+    a blank line.
+    """
+    with open(path, 'rb') as mbox:
+        mbox.seek(offset)
+        position = offset
+        lines: List[bytes] = list()
+        previous_blank = True
+        for line in mbox:
+            if line.startswith(b'From ') and previous_blank and lines:
+                yield get_failed_recipients(parse_message(b''.join(lines))), position
+                lines = list()
+            lines.append(line)
+            position += len(line)
+            previous_blank = line in (b'\n', b'\r\n')
+        if lines:
+            yield get_failed_recipients(parse_message(b''.join(lines))), position
+
+
+def get_mbox_checkpoint_key(path: str) -> str:
+    return 'bounces_mbox_%s' % hashlib.md5(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+
+def get_mbox_offset(path: str) -> int:
+    """
+    Byte offset the previous run stopped at. The mbox is read from the start
+    again if it was replaced (e.g. rotated) or truncated since then.
+    """
+    value = Option.objects.filter(key=get_mbox_checkpoint_key(path)).values_list('value', flat=True).first()
+    if not value:
+        return 0
+    checkpoint = json.loads(value)
+    stat = os.stat(path)
+    if checkpoint['inode'] != stat.st_ino or checkpoint['offset'] > stat.st_size:
+        return 0
+    return checkpoint['offset']
+
+
+def set_mbox_offset(path: str, offset: int):
+    value = json.dumps({'inode': os.stat(path).st_ino, 'offset': offset})
+    Option.objects.update_or_create(key=get_mbox_checkpoint_key(path), defaults={'value': value})
@@ -1,11 +1,12 @@
 from collections import OrderedDict
 
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from colossus.apps.subscribers.constants import ActivityTypes
-from colossus.apps.subscribers.models import Activity
+from colossus.apps.subscribers.models import DailyActivity
 
 
 class Chart:
@@ -43,24 +44,27 @@ class SubscriptionsSummaryChart(Chart):
         self.mailing_list = mailing_list
 
     def get_data(self):
-        thirty_days_ago = timezone.now() - timezone.timedelta(30)
+        thirty_days_ago = timezone.localdate(timezone.now()) - timezone.timedelta(29)
 
-        # Group by query returning the counts for subscribe actions and
-        # unsubscribe actions. The Count queries are defined externally
-        # for readability.
+        # Group by query over the daily rollup table returning the counts for
+        # subscribe actions and unsubscribe actions. The table holds one row
+        # per day, campaign and activity type, so the Sum is needed to merge
+        # the campaigns. The Sum queries are defined externally for readability.
         # Output format:
         # <QuerySet [
-        #     {'trunc_date': datetime.date(2018, 6, 10), 'subscribed': 1, 'unsubscribed': 0},
-        #     {'trunc_date': datetime.date(2018, 6, 11), 'subscribed': 3, 'unsubscribed': 2},
-        #     {'trunc_date': datetime.date(2018, 6, 12), 'subscribed': 1, 'unsubscribed': 0}
+        #     {'day': datetime.date(2018, 6, 10), 'subscribed': 1, 'unsubscribed': 0},
+        #     {'day': datetime.date(2018, 6, 11), 'subscribed': 3, 'unsubscribed': 2},
+        #     {'day': datetime.date(2018, 6, 12), 'subscribed': 1, 'unsubscribed': 0}
         # ]>
-        subscribed_expression = Count('id', filter=Q(activity_type=ActivityTypes.SUBSCRIBED))
-        unsubscribed_expression = Count('id', filter=Q(activity_type=ActivityTypes.UNSUBSCRIBED))
-        activities = Activity.objects \
-            .filter(subscriber__mailing_list=self.mailing_list, date__gte=thirty_days_ago) \
-            .values('date__date') \
+        subscribed_expression = Coalesce(Sum('count', filter=Q(activity_type=ActivityTypes.SUBSCRIBED)), 0)
+        unsubscribed_expression = Coalesce(Sum('count', filter=Q(activity_type=ActivityTypes.UNSUBSCRIBED)), 0)
+        activities = DailyActivity.objects \
+            .filter(mailing_list=self.mailing_list,
+                    day__gte=thirty_days_ago,
+                    activity_type__in=(ActivityTypes.SUBSCRIBED, ActivityTypes.UNSUBSCRIBED)) \
+            .values('day') \
             .annotate(subscribed=subscribed_expression, unsubscribed=unsubscribed_expression) \
-            .order_by('date__date')
+            .order_by('day')
 
         # First initialize the `series` dictionary with all last 30 days.
         # This is necessary because if the count of subscribers for a given
@@ -76,7 +80,7 @@ class SubscriptionsSummaryChart(Chart):
         # Now we are replacing the existing entries with actual counts
         # comming from our queryset.
         for entry in activities:
-            key = entry['date__date'].strftime('%-d %b, %y')
+            key = entry['day'].strftime('%-d %b, %y')
             series[key]['sub'] = entry['subscribed']
             series[key]['unsub'] = entry['unsubscribed']
 
@@ -1,7 +1,7 @@
 from django.utils.translation import gettext_lazy as _
 
 from colossus.apps.lists.utils import (
-    convert_date, normalize_email, normalize_text,
+    convert_date, normalize_text, parse_email, parse_ip_address,
 )
 
 
@@ -39,6 +39,18 @@ class ImportStrategies:
     CHOICES = tuple(LABELS.items())
 
 
+class ImportEngines:
+    ORM = 'orm'
+    POSTGRESQL_COPY = 'postgresql_copy'
+
+    LABELS = {
+        ORM: _('Django ORM (any database)'),
+        POSTGRESQL_COPY: _('PostgreSQL COPY'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+
 class ImportFields:
     EMAIL = 'email'
     NAME = 'name'
@@ -57,11 +69,11 @@ class ImportFields:
     }
 
     PARSERS = {
-        EMAIL: normalize_email,
+        EMAIL: parse_email,
         NAME: normalize_text,
-        OPTIN_IP_ADDRESS: normalize_text,
+        OPTIN_IP_ADDRESS: parse_ip_address,
         OPTIN_DATE: convert_date,
-        CONFIRM_IP_ADDRESS: normalize_text,
+        CONFIRM_IP_ADDRESS: parse_ip_address,
         CONFIRM_DATE: convert_date,
     }
 
@@ -0,0 +1,71 @@
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from colossus.apps.subscribers.audiences import (
+    get_audience, iter_audience_querysets,
+)
+from colossus.apps.subscribers.constants import Status
+from colossus.apps.subscribers.models import Subscriber, Tag
+from colossus.bitmaps import RoaringBitmap
+
+SUBSCRIBERS_EXPORT_COLUMNS = (
+    ('uuid', 'uuid'),
+    ('email', 'email'),
+    ('name', 'name'),
+    ('status', 'status'),
+    ('optin_date', 'optin_date'),
+    ('optin_ip_address', 'optin_ip_address'),
+    ('confirm_date', 'confirm_date'),
+    ('confirm_ip_address', 'confirm_ip_address'),
+    ('last_seen_date', 'last_seen_date'),
+    ('open_rate', 'open_rate'),
+    ('click_rate', 'click_rate'),
+    ('city', 'location__name'),
+    ('country', 'location__country__code'),
+)
+
+SUBSCRIBERS_EXPORT_FIELDS = [column for column, lookup in SUBSCRIBERS_EXPORT_COLUMNS]
+
+
+def get_subscribers_export_queryset(mailing_list_id: int, status: Optional[int] = None) -> QuerySet:
+    """
+    Subscribers of a mailing list, optionally filtered by status, as tuples
+    of the export columns.
+    """
+    queryset = Subscriber.objects.filter(mailing_list_id=mailing_list_id)
+    if status:
+        queryset = queryset.filter(status=status)
+    lookups = [lookup for column, lookup in SUBSCRIBERS_EXPORT_COLUMNS]
+    return queryset.order_by('pk').values_list(*lookups)
+
+
+def get_subscribers_export_audience(mailing_list_id: int,
+                                    status: Optional[int] = None,
+                                    tags: Optional[Iterable[int]] = None) -> Optional[RoaringBitmap]:
+    """
+    Subscribers having any of the `tags`, computed from the tags bitmaps
+    instead of joining the tags table. None if there is no tags filter.
+    """
+    if not tags:
+        return None
+    tags = Tag.objects.filter(mailing_list_id=mailing_list_id, pk__in=list(tags))
+    return get_audience(mailing_list_id, status=status or None, any_tags=tags)
+
+
+def iter_subscribers_export_rows(queryset: QuerySet, audience: Optional[RoaringBitmap] = None) -> Iterator[List]:
+    if audience is None:
+        rows = queryset.iterator(chunk_size=settings.COLOSSUS_EXPORT_CHUNK_SIZE)
+    else:
+        rows = chain.from_iterable(iter_audience_querysets(queryset, audience))
+    status_index = SUBSCRIBERS_EXPORT_FIELDS.index('status')
+    for row in rows:
+        row = list(row)
+        row[status_index] = str(Status.LABELS.get(row[status_index], row[status_index]))
+        yield row
+
+
+def get_subscribers_export_name(mailing_list) -> str:
+    return 'subscribers-%s-%s' % (mailing_list.pk, mailing_list.slug)
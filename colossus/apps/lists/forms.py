@@ -1,19 +1,30 @@
+import json
 from smtplib import SMTPAuthenticationError
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.mail.backends.smtp import EmailBackend
 from django.core.validators import validate_email
-from django.db import transaction
 from django.forms import BoundField
-from django.utils import timezone
 from django.utils.translation import gettext, gettext_lazy as _
 
 from colossus.apps.lists.constants import ImportFields, ImportStatus
-from colossus.apps.lists.tasks import import_subscribers
-from colossus.apps.subscribers.constants import ActivityTypes, Status
-from colossus.apps.subscribers.models import Subscriber
+from colossus.apps.lists.exports import (
+    SUBSCRIBERS_EXPORT_FIELDS, get_subscribers_export_audience,
+    get_subscribers_export_name, get_subscribers_export_queryset,
+    iter_subscribers_export_rows,
+)
+from colossus.apps.lists.importers import SubscriberImporter, import_emails
+from colossus.apps.lists.tasks import (
+    export_subscribers, import_pasted_subscribers, import_subscribers,
+)
+from colossus.apps.subscribers.constants import Status
+from colossus.apps.subscribers.exceptions import InvalidSegmentFilter
+from colossus.apps.subscribers.models import Segment, Subscriber, Tag
+from colossus.apps.subscribers.segments import compile_segment_filters
+from colossus.exports import ExportFormats, get_streaming_export_response
 
 from .models import MailingList, SubscriberImport
 
@@ -185,24 +196,77 @@ class PasteImportSubscribersForm(forms.Form):
         cleaned_data['emails'] = cleaned_emails.values()
         return cleaned_data
 
-    def import_subscribers(self, mailing_list):
-        emails = self.cleaned_data.get('emails')
+    def import_subscribers(self, mailing_list, user=None) -> Optional[SubscriberImporter]:
+        """
+        Import the pasted emails in bulk. If there are more emails than the
+        `COLOSSUS_PASTE_IMPORT_SYNC_LIMIT` setting, the import is placed in a
+        queue to be processed by a Celery task instead.
+
+        :return: The importer with the created/updated counters, or None if the
+                 import was queued.
+        """
+        emails = list(self.cleaned_data.get('emails'))
+        status = int(self.cleaned_data.get('status'))
+        if len(emails) > settings.COLOSSUS_PASTE_IMPORT_SYNC_LIMIT:
+            user_id = user.pk if user is not None else None
+            import_pasted_subscribers.delay(mailing_list.pk, emails, status, user_id)
+            return None
+        return import_emails(mailing_list, emails, status)
+
+
+class ExportSubscribersForm(forms.Form):
+    export_format = forms.ChoiceField(
+        label=_('Format'),
+        choices=ExportFormats.CHOICES,
+        initial=ExportFormats.CSV
+    )
+    status = forms.TypedChoiceField(
+        label=_('Status'),
+        choices=(('', _('All subscribers')),) + Status.CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False
+    )
+    tags = forms.ModelMultipleChoiceField(
+        label=_('Tags'),
+        queryset=Tag.objects.none(),
+        required=False,
+        help_text=_('Export only the subscribers with any of the selected tags.')
+    )
+    background = forms.BooleanField(
+        label=_('Export in the background'),
+        required=False,
+        help_text=_('Recommended for large lists. You will be notified once the file is ready to download.')
+    )
+
+    def __init__(self, mailing_list, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mailing_list = mailing_list
+        self.fields['tags'].queryset = mailing_list.tags.order_by('name')
+
+    def get_tag_ids(self) -> List[int]:
+        return [tag.pk for tag in self.cleaned_data.get('tags', [])]
+
+    def export(self, user):
+        """
+        Either stream the export or place it in a queue to be written to the
+        private storage by a Celery task.
+
+        :return: A StreamingHttpResponse, or None if the export was queued.
+        """
+        export_format = self.cleaned_data.get('export_format')
         status = self.cleaned_data.get('status')
-        with transaction.atomic():
-            for email in emails:
-                subscriber, created = Subscriber.objects.get_or_create(
-                    email__iexact=email,
-                    mailing_list=mailing_list,
-                    defaults={
-                        'email': email,
-                    }
-                )
-                if created:
-                    subscriber.create_activity(ActivityTypes.IMPORTED)
-                subscriber.status = status
-                subscriber.update_date = timezone.now()
-                subscriber.save()
-            mailing_list.update_subscribers_count()
+        if self.cleaned_data.get('background'):
+            export_subscribers.delay(self.mailing_list.pk, user.pk, export_format, status, self.get_tag_ids())
+            return None
+        queryset = get_subscribers_export_queryset(self.mailing_list.pk, status)
+        audience = get_subscribers_export_audience(self.mailing_list.pk, status, self.get_tag_ids())
+        return get_streaming_export_response(
+            get_subscribers_export_name(self.mailing_list),
+            export_format,
+            SUBSCRIBERS_EXPORT_FIELDS,
+            iter_subscribers_export_rows(queryset, audience)
+        )
 
 
 class MailingListSMTPForm(forms.ModelForm):
@@ -232,3 +296,41 @@ class MailingListSMTPForm(forms.ModelForm):
         except SMTPAuthenticationError as err:
             raise ValidationError(str(err), code='auth_error')
         return cleaned_data
+
+
+class SegmentForm(forms.ModelForm):
+    """
+    The filters are edited as a JSON list (see
+    `colossus.apps.subscribers.segments`) and validated by compiling them.
+    """
+    filters = forms.CharField(
+        label=_('Filters'),
+        widget=forms.Textarea(attrs={'rows': 8}),
+        help_text=_('JSON list of filters, e.g. [{"field": "open_rate", "operator": "gte", "value": 0.25}]')
+    )
+
+    class Meta:
+        model = Segment
+        fields = ('name', 'description', 'match', 'filters')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial['filters'] = json.dumps(self.instance.get_filters(), indent=2)
+
+    def clean_filters(self):
+        try:
+            filters = json.loads(self.cleaned_data.get('filters'))
+        except json.JSONDecodeError:
+            raise ValidationError(gettext('Enter a valid JSON list.'), code='invalid_json')
+        if not isinstance(filters, list):
+            raise ValidationError(gettext('Enter a valid JSON list.'), code='invalid_json')
+        try:
+            compile_segment_filters(filters)
+        except InvalidSegmentFilter as err:
+            raise ValidationError(str(err), code='invalid_filter')
+        return filters
+
+    def save(self, commit=True):
+        self.instance.set_filters(self.cleaned_data.get('filters'))
+        return super().save(commit)
@@ -0,0 +1,654 @@
+"""
+Bulk import of subscribers into a mailing list.
+
+Instead of handling the rows one by one (one lookup query plus one or two
+write queries per row), the rows are processed in chunks: the existing
+subscribers of a chunk are fetched with a single query, the domains are
+resolved through an in-memory map, and the subscribers and their IMPORTED
+activities are written with `bulk_create` and `bulk_update`.
+
+On PostgreSQL, the `CopySubscriberImporter` goes one step further and does the
+whole import with a handful of set-based SQL statements (see its docstring).
+It's enabled by setting `COLOSSUS_IMPORT_ENGINE` to "postgresql_copy".
+
+Bulk writes bypass `Subscriber.save`, so callers are responsible for calling
+`MailingList.update_subscribers_count` once the import is done.
+"""
+import logging
+import math
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+import billiard
+
+from colossus.apps.lists.constants import (
+    ImportEngines, ImportFields, ImportStrategies,
+)
+from colossus.apps.lists.utils import (
+    IMPORT_DATE_PATTERN, IMPORT_EMAIL_PATTERN, IMPORT_IPV4_PATTERN,
+    IMPORT_IPV6_PATTERN, count_lines, dialect_from_dict, iter_csv_rows,
+    split_byte_ranges,
+)
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Domain, Subscriber,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_domain_name(email: str) -> str:
+    return '@' + email.rsplit('@', 1)[1].lower()
+
+
+class SubscriberImporter:
+    """
+    Import rows of subscriber data (dicts mapping `Subscriber` field names to
+    already parsed values, always including the `email`) into a mailing list.
+
+    The email address is used to identify the subscribers, ignoring case, and
+    the import `strategy` decides what to do with new and existing subscribers
+    (see `ImportStrategies`). If the same email address shows up more than
+    once, the last row wins, except for the `CREATE` strategy where the first
+    row creates the subscriber and the following ones are skipped.
+
+    The counters `created`, `updated` and `skipped` are incremented as the
+    chunks are processed. An IMPORTED activity is registered for every
+    subscriber written, or only for the ones created if `track_updates` is
+    False.
+    """
+    def __init__(self, mailing_list_id: int, strategy: int, subscriber_status: int, chunk_size: int = None,
+                 track_updates: bool = True):
+        self.mailing_list_id = mailing_list_id
+        self.strategy = strategy
+        self.subscriber_status = subscriber_status
+        self.chunk_size = chunk_size or settings.COLOSSUS_IMPORT_CHUNK_SIZE
+        self.track_updates = track_updates
+        self.domains: Dict[str, int] = dict()
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def import_rows(self, rows: Iterable[Dict]):
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+
+    def import_chunk(self, rows: List[Dict]) -> List[int]:
+        """
+        Import a chunk of rows and return the ids of the subscribers created or
+        updated.
+        """
+        entries: Dict[str, Dict] = dict()
+        for row in rows:
+            email = row.get('email') or ''
+            if '@' not in email:
+                self.skipped += 1
+                continue
+            key = email.upper()
+            data = dict(row, status=self.subscriber_status)
+            if key in entries:
+                if self.strategy == ImportStrategies.CREATE:
+                    self.skipped += 1
+                    continue
+                entries[key]['duplicates'] += 1
+                entries[key]['data'] = data
+            else:
+                entries[key] = {'data': data, 'duplicates': 0}
+
+        existing = self.get_existing_subscribers(entries.keys())
+
+        to_create = list()
+        to_update = list()
+        for key, entry in entries.items():
+            subscriber_id = existing.get(key)
+            if subscriber_id is None:
+                if self.strategy == ImportStrategies.UPDATE:
+                    self.skipped += 1 + entry['duplicates']
+                    continue
+                to_create.append(entry['data'])
+                self.created += 1
+                self.updated += entry['duplicates']
+            else:
+                if self.strategy == ImportStrategies.CREATE:
+                    self.skipped += 1
+                    continue
+                to_update.append((subscriber_id, entry['data']))
+                self.updated += 1 + entry['duplicates']
+
+        created_ids = self.create_subscribers(to_create)
+        updated_ids = self.update_subscribers(to_update)
+        self.create_activities(created_ids + updated_ids if self.track_updates else created_ids)
+        return created_ids + updated_ids
+
+    def get_existing_subscribers(self, keys: Iterable[str]) -> Dict[str, int]:
+        """
+        Map the uppercased email addresses of `keys` to the ids of the
+        subscribers already in the mailing list. Filtering on `Upper('email')`
+        is the same expression `email__iexact` uses, so the query is able to
+        use the same index.
+        """
+        queryset = Subscriber.objects \
+            .annotate(email_upper=Upper('email')) \
+            .filter(mailing_list_id=self.mailing_list_id, email_upper__in=list(keys)) \
+            .values_list('email_upper', 'id')
+        return dict(queryset)
+
+    def resolve_domains(self, names: Iterable[str]) -> Dict[str, int]:
+        missing = set(names) - self.domains.keys()
+        if missing:
+            self.domains.update(Domain.objects.get_pks(missing))
+        return self.domains
+
+    def create_subscribers(self, rows: List[Dict]) -> List[int]:
+        if not rows:
+            return list()
+        domains = self.resolve_domains(get_domain_name(data['email']) for data in rows)
+        subscribers = [
+            Subscriber(
+                mailing_list_id=self.mailing_list_id,
+                domain_id=domains[get_domain_name(data['email'])],
+                **data
+            ) for data in rows
+        ]
+        Subscriber.objects.bulk_create(subscribers)
+        if connection.features.can_return_ids_from_bulk_insert:
+            return [subscriber.pk for subscriber in subscribers]
+        return list(Subscriber.objects.filter(uuid__in=[s.uuid for s in subscribers]).values_list('id', flat=True))
+
+    def update_subscribers(self, rows: List) -> List[int]:
+        if not rows:
+            return list()
+        now = timezone.now()
+        fields = set()
+        subscribers = list()
+        for subscriber_id, data in rows:
+            fields.update(data.keys())
+            subscribers.append(Subscriber(id=subscriber_id, update_date=now, **data))
+        fields.add('update_date')
+        Subscriber.objects.bulk_update(subscribers, sorted(fields))
+        return [subscriber.pk for subscriber in subscribers]
+
+    def create_activities(self, subscribers_ids: List[int]):
+        if not subscribers_ids:
+            return
+        Activity.objects.bulk_create([
+            Activity(subscriber_id=subscriber_id, activity_type=ActivityTypes.IMPORTED)
+            for subscriber_id in subscribers_ids
+        ])
+        DailyActivity.objects.increment(
+            mailing_list_id=self.mailing_list_id,
+            campaign_id=None,
+            day=timezone.localdate(),
+            activity_type=ActivityTypes.IMPORTED,
+            count=len(subscribers_ids)
+        )
+
+
+class CopySubscriberImporter:
+    """
+    PostgreSQL only import engine. The CSV file is streamed with
+    `COPY ... FROM STDIN` into an unlogged staging table, the data is
+    normalized (same rules as the `ImportFields.PARSERS`) and deduplicated
+    in SQL, and then merged into the subscribers table:
+
+    * existing subscribers are matched ignoring case, using the
+      `UPPER(email)` expression index, and updated with `UPDATE ... FROM`
+    * new subscribers are inserted with `INSERT ... ON CONFLICT (email,
+      mailing_list_id)`, which also covers rows inserted concurrently
+    * the IMPORTED activities are inserted in the same statement, from the
+      ids returned by the upsert
+
+    The values are validated in SQL with the same rules as the ORM engine
+    (the `IMPORT_*_PATTERN` of `colossus.apps.lists.utils`), so a malformed
+    value never makes a cast fail the whole import: rows with an invalid email
+    or date are skipped, and invalid IP addresses are imported as NULL.
+
+    The counters `created` and `updated` count subscribers, telling apart the
+    rows inserted by the upsert from the ones that hit a conflict (`xmax` is 0
+    only for the inserted ones); every other row of the file (duplicates,
+    invalid rows, rows ignored by the strategy) is counted as `skipped`.
+    """
+    TEXT_EXPRESSION = "btrim(regexp_replace(coalesce({column}, ''), '\\s+', ' ', 'g'))"
+
+    IP_ADDRESS_EXPRESSION = """
+        CASE WHEN {column} ~ %(ipv4_pattern)s OR {column} ~* %(ipv6_pattern)s THEN {column}::inet END
+    """
+
+    # The CASE expressions are evaluated in order, so the values reaching
+    # `make_date` and `make_timestamp` are always in range.
+    DATE_EXPRESSION = """
+        CASE WHEN {column} ~ %(date_pattern)s THEN (
+            SELECT CASE WHEN y >= 1 AND m BETWEEN 1 AND 12 AND hh < 24 AND mi < 60 AND ss < 60 THEN
+                CASE WHEN d BETWEEN 1 AND extract(day FROM make_date(y, m, 1) + interval '1 month - 1 day') THEN
+                    make_timestamp(y, m, d, hh, mi, ss) AT TIME ZONE 'UTC'
+                END
+            END
+            FROM (
+                SELECT split_part({column}, '-', 1)::integer AS y,
+                       split_part({column}, '-', 2)::integer AS m,
+                       split_part(split_part({column}, ' ', 1), '-', 3)::integer AS d,
+                       split_part(split_part({column}, ' ', 2), ':', 1)::integer AS hh,
+                       split_part(split_part({column}, ' ', 2), ':', 2)::integer AS mi,
+                       split_part(split_part({column}, ' ', 2), ':', 3)::integer AS ss
+            ) parts
+        ) END
+    """
+
+    # Applied to the values normalized with `TEXT_EXPRESSION`.
+    FIELD_EXPRESSIONS = {
+        ImportFields.NAME: '{column}',
+        ImportFields.OPTIN_IP_ADDRESS: IP_ADDRESS_EXPRESSION,
+        ImportFields.CONFIRM_IP_ADDRESS: IP_ADDRESS_EXPRESSION,
+        ImportFields.OPTIN_DATE: DATE_EXPRESSION,
+        ImportFields.CONFIRM_DATE: DATE_EXPRESSION,
+    }
+
+    DATE_FIELDS = (ImportFields.OPTIN_DATE, ImportFields.CONFIRM_DATE)
+
+    # Values used for the NOT NULL columns missing from the columns mapping.
+    INSERT_DEFAULTS = {
+        ImportFields.NAME: "''",
+        ImportFields.OPTIN_DATE: 'now()',
+    }
+
+    def __init__(self, subscriber_import):
+        self.subscriber_import = subscriber_import
+        self.mailing_list_id = subscriber_import.mailing_list_id
+        self.strategy = subscriber_import.strategy
+        self.subscriber_status = subscriber_import.subscriber_status
+        self.columns_mapping = subscriber_import.get_columns_mapping()
+        self.staging_table = 'colossus_import_staging_%s' % subscriber_import.pk
+        self.normalized_table = 'colossus_import_normalized_%s' % subscriber_import.pk
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        return connection.vendor == 'postgresql'
+
+    @property
+    def fields(self) -> List[str]:
+        return [field for field in self.columns_mapping.values() if field != ImportFields.EMAIL]
+
+    def get_email_column(self) -> str:
+        for column_index, field in self.columns_mapping.items():
+            if field == ImportFields.EMAIL:
+                return 'c%s' % column_index
+        raise ValueError('The columns mapping has no email column.')
+
+    def get_copy_sql(self, columns_count: int, dialect) -> str:
+        def literal(value: str) -> str:
+            return "'%s'" % value.replace("'", "''")
+        options = ['FORMAT csv', 'HEADER true', "ENCODING 'UTF8'", 'DELIMITER %s' % literal(dialect.delimiter)]
+        if dialect.quotechar:
+            options.append('QUOTE %s' % literal(dialect.quotechar))
+            if not dialect.doublequote and dialect.escapechar:
+                options.append('ESCAPE %s' % literal(dialect.escapechar))
+        columns = ', '.join('c%s' % index for index in range(columns_count))
+        return 'COPY %s (%s) FROM STDIN WITH (%s)' % (self.staging_table, columns, ', '.join(options))
+
+    def get_normalize_sql(self) -> str:
+        """
+        Build the statement creating the normalized table: one row per valid
+        email address (compared ignoring case), keeping the last occurrence of
+        the file, or the first one for the CREATE strategy. Executed with the
+        `get_patterns` parameters.
+        """
+        email = "regexp_replace(%s, '^\\s+|\\s+$', '', 'g')" % self.get_email_column()
+        columns = [
+            (column_index, field) for column_index, field in self.columns_mapping.items()
+            if field != ImportFields.EMAIL
+        ]
+        texts = ''.join(
+            ', %s AS t%s' % (self.TEXT_EXPRESSION.format(column='c%s' % column_index), column_index)
+            for column_index, field in columns
+        )
+        fields_expressions = ''.join(
+            ', %s AS %s' % (self.FIELD_EXPRESSIONS[field].strip().format(column='t%s' % column_index), field)
+            for column_index, field in columns
+        )
+        # Same as the ORM engine, where `convert_date` fails on blank or invalid dates
+        dates_conditions = ''.join(' AND %s IS NOT NULL' % field for field in self.fields if field in self.DATE_FIELDS)
+        direction = 'ASC' if self.strategy == ImportStrategies.CREATE else 'DESC'
+        return f"""
+            CREATE UNLOGGED TABLE {self.normalized_table} AS
+            SELECT DISTINCT ON (email_upper) *, NULL::integer AS subscriber_id
+            FROM (
+                SELECT row_number,
+                       email_local || '@' || email_domain AS email,
+                       UPPER(email_local || '@' || email_domain) AS email_upper,
+                       '@' || email_domain AS domain_name
+                       {fields_expressions}
+                FROM (
+                    SELECT *,
+                           substring({email} from '^(.*)@[^@]*$') AS email_local,
+                           lower(substring({email} from '@([^@]*)$')) AS email_domain
+                           {texts}
+                    FROM {self.staging_table}
+                ) raw
+                WHERE (email_local || '@' || email_domain) ~ %(email_pattern)s
+            ) normalized
+            WHERE true{dates_conditions}
+            ORDER BY email_upper, row_number {direction}
+        """
+
+    @staticmethod
+    def get_patterns() -> Dict[str, str]:
+        return {
+            'email_pattern': IMPORT_EMAIL_PATTERN,
+            'date_pattern': IMPORT_DATE_PATTERN,
+            'ipv4_pattern': IMPORT_IPV4_PATTERN,
+            'ipv6_pattern': IMPORT_IPV6_PATTERN,
+        }
+
+    def get_update_sql(self) -> str:
+        assignments = ''.join(
+            ', %s = coalesce(n.%s, s.%s)' % (field, field, field) if field in self.INSERT_DEFAULTS
+            else ', %s = n.%s' % (field, field)
+            for field in self.fields
+        )
+        return f"""
+            WITH updated AS (
+                UPDATE colossus_subscribers s
+                SET email = n.email, status = %(status)s, update_date = now(){assignments}
+                FROM {self.normalized_table} n
+                WHERE n.subscriber_id = s.id
+                RETURNING s.id
+            ), activities AS (
+                INSERT INTO colossus_activities (activity_type, date, description, subscriber_id)
+                SELECT %(activity_type)s, now(), '', id FROM updated
+                RETURNING 1
+            )
+            SELECT count(*) FROM activities
+        """
+
+    def get_insert_sql(self) -> str:
+        fields = self.fields
+        columns = fields + [field for field in self.INSERT_DEFAULTS.keys() if field not in fields]
+        values = [
+            'coalesce(n.%s, %s)' % (field, self.INSERT_DEFAULTS[field]) if field in self.INSERT_DEFAULTS
+            else 'n.%s' % field
+            for field in fields
+        ]
+        values += [self.INSERT_DEFAULTS[field] for field in columns[len(fields):]]
+        if self.strategy == ImportStrategies.UPDATE_OR_CREATE:
+            assignments = ''.join(', %s = EXCLUDED.%s' % (field, field) for field in fields)
+            on_conflict = 'DO UPDATE SET status = EXCLUDED.status, update_date = now()%s' % assignments
+        else:
+            on_conflict = 'DO NOTHING'
+        return f"""
+            WITH upserted AS (
+                INSERT INTO colossus_subscribers (
+                    uuid, email, domain_id, mailing_list_id, open_rate, click_rate, update_date, status,
+                    {', '.join(columns)}
+                )
+                SELECT md5(random()::text || clock_timestamp()::text || n.row_number::text)::uuid,
+                       n.email, d.id, %(mailing_list_id)s, 0, 0, now(), %(status)s,
+                       {', '.join(values)}
+                FROM {self.normalized_table} n
+                INNER JOIN colossus_domains d ON d.name = n.domain_name
+                WHERE n.subscriber_id IS NULL
+                ON CONFLICT (email, mailing_list_id) {on_conflict}
+                RETURNING id, (xmax = 0) AS inserted
+            ), activities AS (
+                INSERT INTO colossus_activities (activity_type, date, description, subscriber_id)
+                SELECT %(activity_type)s, now(), '', id FROM upserted
+                RETURNING 1
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+        """
+
+    def import_file(self):
+        params = {
+            'mailing_list_id': self.mailing_list_id,
+            'status': self.subscriber_status,
+            'activity_type': ActivityTypes.IMPORTED,
+        }
+        dialect = self.subscriber_import.get_dialect()
+        columns_count = len(self.subscriber_import.get_headings())
+        with open(self.subscriber_import.file.path, 'r', encoding='utf-8', newline='') as csvfile:
+            with transaction.atomic(), connection.cursor() as cursor:
+                columns = ', '.join('c%s text' % index for index in range(columns_count))
+                cursor.execute('CREATE UNLOGGED TABLE %s (%s, row_number bigserial)' % (self.staging_table, columns))
+                cursor.copy_expert(self.get_copy_sql(columns_count, dialect), csvfile)
+                cursor.execute('SELECT count(*) FROM %s' % self.staging_table)
+                rows_count = cursor.fetchone()[0]
+
+                cursor.execute(self.get_normalize_sql(), self.get_patterns())
+                cursor.execute('DROP TABLE %s' % self.staging_table)
+                cursor.execute('ANALYZE %s' % self.normalized_table)
+
+                cursor.execute(f"""
+                    INSERT INTO colossus_domains (name)
+                    SELECT DISTINCT domain_name FROM {self.normalized_table}
+                    ON CONFLICT (name) DO NOTHING
+                """)
+                cursor.execute(f"""
+                    UPDATE {self.normalized_table} n
+                    SET subscriber_id = s.id
+                    FROM colossus_subscribers s
+                    WHERE s.mailing_list_id = %(mailing_list_id)s AND UPPER(s.email::text) = n.email_upper
+                """, params)
+
+                if self.strategy in (ImportStrategies.UPDATE, ImportStrategies.UPDATE_OR_CREATE):
+                    cursor.execute(self.get_update_sql(), params)
+                    self.updated = cursor.fetchone()[0]
+
+                if self.strategy in (ImportStrategies.CREATE, ImportStrategies.UPDATE_OR_CREATE):
+                    cursor.execute(self.get_insert_sql(), params)
+                    created, updated = cursor.fetchone()
+                    self.created = created
+                    # Rows inserted concurrently since the subscribers were matched hit the ON CONFLICT clause
+                    self.updated += updated
+
+                cursor.execute('DROP TABLE %s' % self.normalized_table)
+
+                self.skipped = rows_count - self.created - self.updated
+                if self.created or self.updated:
+                    DailyActivity.objects.increment(
+                        mailing_list_id=self.mailing_list_id,
+                        campaign_id=None,
+                        day=timezone.localdate(),
+                        activity_type=ActivityTypes.IMPORTED,
+                        count=self.created + self.updated
+                    )
+
+
+def import_emails(mailing_list, emails: Iterable[str], status: int) -> SubscriberImporter:
+    """
+    Add a list of already validated email addresses to a mailing list, or
+    set the `status` of the ones already in it, and update the subscribers
+    count once at the end.
+    """
+    importer = SubscriberImporter(
+        mailing_list_id=mailing_list.pk,
+        strategy=ImportStrategies.UPDATE_OR_CREATE,
+        subscriber_status=status,
+        track_updates=False
+    )
+    with transaction.atomic():
+        importer.import_rows({'email': email} for email in emails)
+        mailing_list.update_subscribers_count()
+    return importer
+
+
+def parse_row(row: List[str], columns_mapping: Dict[int, str]) -> Optional[Dict]:
+    """
+    Parse the mapped columns of a CSV row with the `ImportFields.PARSERS`.
+    Returns None if the row is malformed (missing columns or invalid dates).
+    """
+    try:
+        return {
+            field_name: ImportFields.PARSERS[field_name](row[column_index])
+            for column_index, field_name in columns_mapping.items()
+        }
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_csv_range(path: str, start: int, end: int, dialect_data: Dict,
+                    columns_mapping: Dict[int, str]) -> List[Tuple[Optional[Dict], int]]:
+    """
+    Parse the CSV rows between the byte offsets `start` and `end`. Runs in the
+    worker processes of the parallel import, so it only takes picklable
+    arguments. Returns the parsed rows (None for the malformed ones) along
+    with the position in the file right after each of them.
+    """
+    dialect = dialect_from_dict(dialect_data)
+    return [
+        (parse_row(row, columns_mapping), byte_offset)
+        for row, byte_offset in iter_csv_rows(path, start, dialect=dialect, end_offset=end)
+    ]
+
+
+def can_parse_in_parallel(subscriber_import) -> bool:
+    """
+    The file can only be split in byte ranges if every row fits in a single
+    line, i.e. no quoted value spans many lines.
+    """
+    return count_lines(subscriber_import.file.path) == subscriber_import.size
+
+
+def iter_parsed_rows(subscriber_import) -> Iterator[Tuple[Optional[Dict], int]]:
+    """
+    Parse the file of a SubscriberImport from its `byte_offset`, yielding the
+    parsed rows (None for the malformed ones) along with the position in the
+    file right after each of them.
+    """
+    columns_mapping = subscriber_import.get_columns_mapping()
+    dialect = subscriber_import.get_dialect()
+    for row, byte_offset in iter_csv_rows(subscriber_import.file.path, subscriber_import.byte_offset,
+                                          dialect=dialect):
+        yield parse_row(row, columns_mapping), byte_offset
+
+
+def iter_parsed_rows_in_parallel(subscriber_import, workers: int,
+                                 chunk_size: int) -> Iterator[Tuple[Optional[Dict], int]]:
+    """
+    Same as `iter_parsed_rows`, but parsing the file in a pool of `workers`
+    processes. The file is split in newline-aligned byte ranges of about
+    `chunk_size` rows, parsed by the workers and yielded in file order. At
+    most two ranges per worker are parsed ahead of the consumer, so the memory
+    used doesn't depend on the size of the file.
+
+    The pool is a billiard pool: Celery prefork workers are daemonic
+    processes, which the multiprocessing module doesn't allow to have
+    children.
+    """
+    path = subscriber_import.file.path
+    byte_offset = subscriber_import.byte_offset
+    file_size = os.path.getsize(path)
+    remaining_rows = subscriber_import.size * (file_size - byte_offset) // max(file_size, 1)
+    ranges = iter(split_byte_ranges(path, max(workers, math.ceil(remaining_rows / chunk_size)), byte_offset))
+    dialect_data = subscriber_import.get_manifest()['dialect']
+    columns_mapping = subscriber_import.get_columns_mapping()
+
+    # Forked workers inherit the loaded Django apps, so they can use the ImportFields.PARSERS
+    pool = billiard.get_context('fork').Pool(processes=workers)
+    try:
+        pending = deque(
+            pool.apply_async(parse_csv_range, (path, start, end, dialect_data, columns_mapping))
+            for start, end in islice(ranges, workers * 2)
+        )
+        while pending:
+            rows = pending.popleft().get()
+            for start, end in islice(ranges, 1):
+                pending.append(pool.apply_async(parse_csv_range, (path, start, end, dialect_data, columns_mapping)))
+            yield from rows
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def save_progress(subscriber_import, importer, rows_count: int, byte_offset: int, rows_per_second: float):
+    subscriber_import.rows_processed += rows_count
+    subscriber_import.byte_offset = byte_offset
+    subscriber_import.created_count = importer.created
+    subscriber_import.updated_count = importer.updated
+    subscriber_import.skipped_count = importer.skipped
+    subscriber_import.rows_per_second = rows_per_second
+    subscriber_import.last_progress_date = timezone.now()
+    subscriber_import.save(update_fields=[
+        'rows_processed', 'byte_offset', 'created_count', 'updated_count', 'skipped_count', 'rows_per_second',
+        'last_progress_date'
+    ])
+
+
+def import_subscriber_import_file(subscriber_import):
+    """
+    Import the file of a SubscriberImport using the engine defined by the
+    `COLOSSUS_IMPORT_ENGINE` setting. The COPY engine falls back to the ORM
+    engine if the database is not PostgreSQL.
+
+    The ORM engine commits each chunk along with the import progress (counters
+    and the position in the file). If the import is interrupted, calling this
+    function again resumes it from the chunk following the last committed one.
+    The COPY engine imports the whole file in a single transaction.
+
+    If `COLOSSUS_IMPORT_WORKERS` is greater than one, the ORM engine parses
+    the file in parallel (see `iter_parsed_rows_in_parallel`), unless a
+    quoted value spans many lines. The chunks are still imported and
+    committed one at a time, in file order.
+
+    :return: The importer instance, with the created/updated/skipped counters.
+    """
+    start_time = time.monotonic()
+
+    if settings.COLOSSUS_IMPORT_ENGINE == ImportEngines.POSTGRESQL_COPY and CopySubscriberImporter.is_supported():
+        importer = CopySubscriberImporter(subscriber_import)
+        importer.import_file()
+        rows_count = importer.created + importer.updated + importer.skipped
+        rows_per_second = rows_count / max(time.monotonic() - start_time, 0.001)
+        save_progress(subscriber_import, importer, rows_count, subscriber_import.file.size, rows_per_second)
+        return importer
+
+    importer = SubscriberImporter(
+        mailing_list_id=subscriber_import.mailing_list_id,
+        strategy=subscriber_import.strategy,
+        subscriber_status=subscriber_import.subscriber_status
+    )
+
+    importer.created = subscriber_import.created_count
+    importer.updated = subscriber_import.updated_count
+    importer.skipped = subscriber_import.skipped_count
+
+    workers = settings.COLOSSUS_IMPORT_WORKERS
+    if workers > 1 and can_parse_in_parallel(subscriber_import):
+        rows = iter_parsed_rows_in_parallel(subscriber_import, workers, importer.chunk_size)
+    else:
+        rows = iter_parsed_rows(subscriber_import)
+    rows_count = 0
+    try:
+        for chunk in chunked(rows, importer.chunk_size):
+            valid_rows = [row for row, byte_offset in chunk if row is not None]
+            with transaction.atomic():
+                importer.skipped += len(chunk) - len(valid_rows)
+                importer.import_chunk(valid_rows)
+                rows_count += len(chunk)
+                rows_per_second = rows_count / max(time.monotonic() - start_time, 0.001)
+                save_progress(subscriber_import, importer, len(chunk), chunk[-1][1], rows_per_second)
+    finally:
+        rows.close()
+    return importer
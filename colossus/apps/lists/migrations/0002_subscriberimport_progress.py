@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='byte_offset',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Position in the file right after the last imported row.', verbose_name='byte offset'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='created_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='created'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='last_progress_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='last progress date'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='rows_per_second',
+            field=models.FloatField(default=0.0, editable=False, verbose_name='rows per second'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='rows_processed',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='rows processed'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='skipped_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='skipped'),
+        ),
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='updated_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='updated'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0002_subscriberimport_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriberimport',
+            name='manifest',
+            field=models.TextField(blank=True, editable=False, verbose_name='manifest'),
+        ),
+    ]
@@ -1,14 +1,21 @@
-import csv
+import datetime
 import json
 import uuid
+from itertools import islice
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Avg
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from colossus.apps.lists.constants import ImportStatus, ImportStrategies
+from colossus.apps.lists.utils import (
+    build_csv_manifest, dialect_from_dict, iter_csv_rows,
+)
 from colossus.apps.subscribers.constants import Status, TemplateKeys
 from colossus.storage import PrivateMediaStorage
 
@@ -73,10 +80,28 @@ class MailingList(models.Model):
         return self.subscribers.filter(status=Status.SUBSCRIBED)
 
     def update_subscribers_count(self) -> int:
+        """
+        Called after bulk changes to the subscribers, so it also drops the
+        status bitmaps of the list, which are rebuilt on the next read.
+        """
         self.subscribers_count = self.get_active_subscribers().count()
         self.save(update_fields=['subscribers_count'])
+        self.audience_bitmaps.filter(tag=None).delete()
         return self.subscribers_count
 
+    def get_subscribers_total(self) -> int:
+        """
+        Number of subscribers of the list, regardless of their status. Counting
+        a large list is a full scan of its rows, so the total is cached for
+        `COLOSSUS_SUBSCRIBERS_TOTAL_CACHE_TIMEOUT` seconds and may lag behind.
+        """
+        key = 'colossus:subscribers_total:%s' % self.pk
+        total = cache.get(key)
+        if total is None:
+            total = self.subscribers.count()
+            cache.set(key, total, settings.COLOSSUS_SUBSCRIBERS_TOTAL_CACHE_TIMEOUT)
+        return total
+
     def update_click_rate(self) -> float:
         qs = self.get_active_subscribers() \
             .exclude(last_sent=None) \
@@ -176,8 +201,21 @@ class SubscriberImport(models.Model):
         help_text=_('The email address will be used as the main subscriber identifier to determine if they are '
                     'already on the list.')
     )
+    rows_processed = models.PositiveIntegerField(_('rows processed'), default=0, editable=False)
+    created_count = models.PositiveIntegerField(_('created'), default=0, editable=False)
+    updated_count = models.PositiveIntegerField(_('updated'), default=0, editable=False)
+    skipped_count = models.PositiveIntegerField(_('skipped'), default=0, editable=False)
+    byte_offset = models.BigIntegerField(
+        _('byte offset'),
+        default=0,
+        editable=False,
+        help_text=_('Position in the file right after the last imported row.')
+    )
+    rows_per_second = models.FloatField(_('rows per second'), default=0.0, editable=False)
+    last_progress_date = models.DateTimeField(_('last progress date'), null=True, blank=True, editable=False)
+    manifest = models.TextField(_('manifest'), blank=True, editable=False)
 
-    __cached_headings = None
+    __manifest = None
 
     class Meta:
         verbose_name = _('subscribers import')
@@ -198,41 +236,78 @@ class SubscriberImport(models.Model):
             columns_mapping = dict()
         return {int(key): value for key, value in columns_mapping.items()}
 
+    def set_manifest(self, manifest):
+        self.manifest = json.dumps(manifest)
+        self.__manifest = manifest
+
+    def get_manifest(self) -> dict:
+        """
+        Return the description of the CSV file built by `build_manifest`. The
+        manifest is built on demand for imports uploaded before it existed.
+        """
+        if self.__manifest is None:
+            try:
+                self.__manifest = json.loads(self.manifest)
+            except (TypeError, json.JSONDecodeError):
+                self.build_manifest(save=self.pk is not None)
+        return self.__manifest
+
+    def build_manifest(self, save=True):
+        """
+        Read the whole CSV file once to describe it (see `build_csv_manifest`)
+        and set its size, so the preview and the mapping forms don't have to
+        read the file again.
+        """
+        manifest = build_csv_manifest(self.file.path)
+        self.set_manifest(manifest)
+        self.size = manifest['size']
+        if save:
+            self.save(update_fields=['manifest', 'size'])
+
+    def get_dialect(self):
+        return dialect_from_dict(self.get_manifest()['dialect'])
+
     def get_headings(self):
-        if self.__cached_headings is None:
-            with open(self.file.path, 'r') as csvfile:
-                dialect = csv.Sniffer().sniff(csvfile.read(1024))
-                csvfile.seek(0)
-                reader = csv.reader(csvfile, dialect)
-                csv_headings = next(reader)
-                self.__cached_headings = csv_headings
-        return self.__cached_headings
+        return self.get_manifest()['headings']
 
     def get_str_headings(self):
         return ', '.join(self.get_headings())
 
     def get_rows(self, limit=None):
-        rows = list()
-        with open(self.file.path, 'r') as csvfile:
-            dialect = csv.Sniffer().sniff(csvfile.read(1024))
-            csvfile.seek(0)
-            reader = csv.reader(csvfile, dialect)
-            # skip header
-            next(reader)
-            for index, row in enumerate(reader):
-                if index == limit:
-                    break
-                rows.append(row)
-        return rows
+        rows = iter_csv_rows(self.file.path, dialect=self.get_dialect())
+        return [row for row, byte_offset in islice(rows, limit)]
 
     def get_preview(self):
-        return self.get_rows(limit=10)
-
-    def set_size(self, save=True):
-        with open(self.file.path, 'r') as csvfile:
-            dialect = csv.Sniffer().sniff(csvfile.read(1024))
-            csvfile.seek(0)
-            reader = csv.reader(csvfile, dialect)
-            self.size = sum(1 for row in reader)
-        if save:
-            self.save(update_fields=['size'])
+        return self.get_manifest()['preview']
+
+    @property
+    def is_resumable(self) -> bool:
+        """
+        An import can be resumed from the last imported chunk if it failed, or
+        if it's stuck in the importing status (e.g. the worker was killed)
+        without making any progress for a while.
+        """
+        if self.status == ImportStatus.ERRORED:
+            return True
+        if self.status == ImportStatus.IMPORTING:
+            last_activity = self.last_progress_date or self.upload_date
+            return last_activity < timezone.now() - datetime.timedelta(minutes=30)
+        return False
+
+    def get_progress(self) -> dict:
+        total_rows = max(self.size - 1, 0)  # the size includes the header row
+        try:
+            percent = min(round(self.rows_processed / total_rows * 100, 1), 100.0)
+        except ZeroDivisionError:
+            percent = 100.0 if self.status == ImportStatus.COMPLETED else 0.0
+        return {
+            'status': self.status,
+            'status_display': str(self.get_status_display()),
+            'total_rows': total_rows,
+            'rows_processed': self.rows_processed,
+            'percent': percent,
+            'created': self.created_count,
+            'updated': self.updated_count,
+            'skipped': self.skipped_count,
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
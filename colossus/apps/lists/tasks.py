@@ -1,10 +1,10 @@
 """
 Collection of Celery tasks for the lists app.
 """
-import csv
 import json
 import logging
-from typing import Union
+from itertools import islice
+from typing import Dict, List, Optional, Set, Union
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -13,63 +13,160 @@ from django.utils import timezone
 
 from celery import shared_task
 
-from colossus.apps.lists.constants import (
-    ImportFields, ImportStatus, ImportStrategies,
-)
+from colossus.apps.lists.constants import ImportStatus
 from colossus.apps.notifications.constants import Actions
 from colossus.apps.notifications.models import Notification
-from colossus.apps.subscribers.constants import ActivityTypes, Status
-from colossus.apps.subscribers.models import Subscriber
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, Status, SuppressionReasons,
+)
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Subscriber, Suppression,
+)
+from colossus.exports import save_export
+from colossus.storage import PrivateMediaStorage
+from colossus.utils import get_max_batch_size
 
+from . import bounces
+from .exports import (
+    SUBSCRIBERS_EXPORT_FIELDS, get_subscribers_export_audience,
+    get_subscribers_export_name, get_subscribers_export_queryset,
+    iter_subscribers_export_rows,
+)
+from .importers import import_emails, import_subscriber_import_file
 from .models import MailingList, SubscriberImport
+from .utils import suspend_subscribers_count
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+def get_bounced_emails() -> Set[str]:
+    """
+    Read all the pages of the hard bounces once, as normalized email addresses.
+    """
+    # TODO: Find a better way to determine what email backend is in use
+    if not settings.MAILGUN_API_KEY:
+        return set()
+    from colossus.apps.core.mailgun import Mailgun
+    return {Subscriber.objects.normalize_email(bounce['address']) for bounce in Mailgun().bounces()}
+
+
+def clean_bounced_subscribers(bounced_emails: Set[str],
+                              mailing_lists_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """
+    Mark the active subscribers whose email address bounced as cleaned, with
+    one UPDATE and one bulk INSERT of activities per batch of subscribers, and
+    notify the cleaning once per mailing list.
+
+    :param bounced_emails: Normalized email addresses
+    :param mailing_lists_ids: Restrict the cleaning to these mailing lists
+    :return: Number of cleaned subscribers per mailing list ID
+    """
+    batch_size = settings.COLOSSUS_IMPORT_CHUNK_SIZE
+    query_batch_size = get_max_batch_size(batch_size)
+    active_subscribers = Subscriber.objects.filter(status=Status.SUBSCRIBED)
+    if mailing_lists_ids is not None:
+        active_subscribers = active_subscribers.filter(mailing_list_id__in=mailing_lists_ids)
+
+    subscribers_by_list: Dict[int, List[int]] = dict()
+    emails = iter(sorted(bounced_emails))
+    while True:
+        batch = list(islice(emails, query_batch_size))
+        if not batch:
+            break
+        for pk, mailing_list_id in active_subscribers.filter(email__in=batch).values_list('pk', 'mailing_list_id'):
+            subscribers_by_list.setdefault(mailing_list_id, list()).append(pk)
+
+    users = list(User.objects.filter(is_superuser=True, is_active=True))
+    cleaned = dict()
+    for mailing_list in MailingList.objects.filter(pk__in=subscribers_by_list.keys()):
+        pks = subscribers_by_list[mailing_list.pk]
+        now = timezone.now()
+        with suspend_subscribers_count(mailing_list), transaction.atomic():
+            for start in range(0, len(pks), query_batch_size):
+                batch = pks[start:start + query_batch_size]
+                Subscriber.objects.filter(pk__in=batch).update(status=Status.CLEANED, update_date=now)
+                Activity.objects.bulk_create([
+                    Activity(subscriber_id=pk, activity_type=ActivityTypes.CLEANED) for pk in batch
+                ], batch_size=batch_size)
+            DailyActivity.objects.increment(mailing_list.pk, None, timezone.localdate(now), ActivityTypes.CLEANED,
+                                            len(pks))
+        cleaned[mailing_list.pk] = len(pks)
+        text = json.dumps({'mailing_list_id': mailing_list.pk, 'cleaned': len(pks)})
+        # FIXME: Once there's a better user management associated to a given list, update the code below
+        Notification.objects.bulk_create([
+            Notification(user=user, action=Actions.LIST_CLEANED, text=text) for user in users
+        ])
+    return cleaned
+
+
 @shared_task
 def clean_list_task(mailing_list_id):
-    try:
-        mailing_list = MailingList.objects.get(pk=mailing_list_id)
-        data = {
-            'mailing_list_id': mailing_list_id,
-            'cleaned': 0
-        }
-        # TODO: Find a better way to determine what email backend is in use
-        if settings.MAILGUN_API_KEY:
-            from colossus.apps.core.mailgun import Mailgun
-            client = Mailgun()
-            # TODO: Handle pagination from Mailgun Bounces API
-            bounces = client.bounces()
-            if 'items' in bounces:
-                for bounce in bounces['items']:
-                    email_address = bounce['address']
-                    if mailing_list.get_active_subscribers().filter(email=email_address).exists():
-                        subscriber = mailing_list.subscribers.get(email=email_address)
-                        subscriber.status = Status.CLEANED
-                        subscriber.update_date = timezone.now()
-                        with transaction.atomic():
-                            subscriber.save(update_fields=['status', 'update_date'])
-                            subscriber.create_activity(ActivityTypes.CLEANED)
-                        data['cleaned'] += 1
-
-        if data['cleaned'] > 0:
-            text = json.dumps(data)
-            # FIXME: Once there's a better user management associated to a given list, update the code below
-            for user in User.objects.filter(is_superuser=True, is_active=True):
-                Notification.objects.create(user=user, action=Actions.LIST_CLEANED, text=text)
-
-        return 'Cleaned %(cleaned)s emails from mailing list %(mailing_list_id)s' % data
-
-    except MailingList.DoesNotExist:
+    if not MailingList.objects.filter(pk=mailing_list_id).exists():
         return 'Mailing list with id "%s" does not exist.' % mailing_list_id
+    cleaned = clean_bounced_subscribers(get_bounced_emails(), [mailing_list_id])
+    return 'Cleaned %s emails from mailing list %s' % (cleaned.get(mailing_list_id, 0), mailing_list_id)
 
 
 @shared_task
 def clean_lists_hard_bounces_task():
-    mailing_lists_ids = MailingList.objects.values_list('id', flat=True)
-    for id in mailing_lists_ids:
-        clean_list_task.delay(id)
+    """
+    Read the bounces once, add them to the suppression list and clean all the
+    mailing lists in a single pass.
+    """
+    bounced_emails = get_bounced_emails()
+    Suppression.objects.suppress(bounced_emails, SuppressionReasons.BOUNCED)
+    cleaned = clean_bounced_subscribers(bounced_emails)
+    return 'Cleaned %s emails from %s mailing lists (%s bounces)' % (
+        sum(cleaned.values()), len(cleaned), len(bounced_emails)
+    )
+
+
+def process_bounces_mailbox(path: str, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Read the new bounce messages of a Maildir directory or mbox file, add the
+    hard bounced addresses to the suppression list and clean them from all
+    the mailing lists, `batch_size` messages at a time. The position in the
+    mailbox is committed after each batch, so an interrupted run resumes
+    where it stopped.
+
+    :return: Number of messages read, hard bounces and cleaned subscribers
+    """
+    maildir = bounces.is_maildir(path)
+    if maildir:
+        messages = bounces.iter_maildir_bounces(path)
+    else:
+        messages = bounces.iter_mbox_bounces(path, bounces.get_mbox_offset(path))
+    summary = {'messages': 0, 'hard_bounces': 0, 'cleaned': 0}
+    while True:
+        batch = list(islice(messages, batch_size))
+        if not batch:
+            break
+        bounced_emails = {
+            Subscriber.objects.normalize_email(email)
+            for failed_recipients, position in batch
+            for email, status in failed_recipients if bounces.is_hard_bounce(status)
+        }
+        if bounced_emails:
+            Suppression.objects.suppress(bounced_emails, SuppressionReasons.BOUNCED)
+            cleaned = clean_bounced_subscribers(bounced_emails)
+            summary['cleaned'] += sum(cleaned.values())
+        if maildir:
+            bounces.mark_maildir_messages_seen(path, [position for failed_recipients, position in batch])
+        else:
+            bounces.set_mbox_offset(path, batch[-1][1])
+        summary['messages'] += len(batch)
+        summary['hard_bounces'] += len(bounced_emails)
+    return summary
+
+
+@shared_task
+def process_bounces_mailbox_task():
+    if not settings.COLOSSUS_BOUNCES_MAILBOX:
+        return 'No bounces mailbox configured.'
+    summary = process_bounces_mailbox(settings.COLOSSUS_BOUNCES_MAILBOX)
+    return 'Read %(messages)s bounce messages: %(hard_bounces)s hard bounces, ' \
+           '%(cleaned)s subscribers cleaned' % summary
 
 
 @shared_task
@@ -90,78 +187,20 @@ def import_subscribers(subscriber_import_id: Union[str, int]) -> str:
 
             import_status: int
             notification_action: int
+            notification_data = {'mailing_list_id': subscriber_import.mailing_list_id}
             output_message = ''
 
             try:
-                columns_mapping = subscriber_import.get_columns_mapping()
-                subscriber_created = 0
-                subscriber_updated = 0
-                subscriber_skipped = 0
-
-                with open(subscriber_import.file.path, 'r') as csvfile:
-                    dialect = csv.Sniffer().sniff(csvfile.read(1024))
-                    csvfile.seek(0)
-                    reader = csv.reader(csvfile, dialect)
-
-                    # FIXME: determine if needs to skip the first line or not
-                    if True:
-                        next(reader)
-
-                    with transaction.atomic():
-                        for row in reader:
-                            subscriber = None
-
-                            defaults = {'status': subscriber_import.subscriber_status}
-                            for column_index, subscriber_field_name in columns_mapping.items():
-                                field_parser = ImportFields.PARSERS[subscriber_field_name]
-                                cleaned_field_data = field_parser(row[column_index])
-                                defaults[subscriber_field_name] = cleaned_field_data
-
-                            subscriber_queryset = Subscriber.objects.filter(
-                                email__iexact=defaults['email'],
-                                mailing_list_id=subscriber_import.mailing_list_id,
-                            )
-                            subscriber_exists = subscriber_queryset.exists()
-
-                            if subscriber_import.strategy == ImportStrategies.CREATE:
-                                if not subscriber_exists:
-                                    subscriber = Subscriber.objects.create(
-                                        mailing_list_id=subscriber_import.mailing_list_id,
-                                        **defaults
-                                    )
-                                    subscriber_created += 1
-                                else:
-                                    subscriber_skipped += 1
-
-                            elif subscriber_import.strategy == ImportStrategies.UPDATE:
-                                if subscriber_exists:
-                                    subscriber_queryset.update(update_date=timezone.now(), **defaults)
-                                    subscriber = subscriber_queryset.get()
-                                else:
-                                    subscriber_skipped += 1
-
-                            elif subscriber_import.strategy == ImportStrategies.UPDATE_OR_CREATE:
-                                subscriber, created = Subscriber.objects.update_or_create(
-                                    email__iexact=defaults['email'],
-                                    mailing_list_id=subscriber_import.mailing_list_id,
-                                    defaults=defaults
-                                )
-                                if created:
-                                    subscriber_created += 1
-                                else:
-                                    subscriber.update_date = timezone.now()
-                                    subscriber.save(update_fields=['update_date'])
-                                    subscriber_updated += 1
-
-                            if subscriber is not None:
-                                subscriber.create_activity(ActivityTypes.IMPORTED)
-
+                # Resumes from the last committed chunk if the import was interrupted before
+                importer = import_subscriber_import_file(subscriber_import)
                 subscriber_import.mailing_list.update_subscribers_count()
                 import_status = ImportStatus.COMPLETED
                 notification_action = Actions.IMPORT_COMPLETED
+                notification_data.update(created=importer.created, updated=importer.updated,
+                                         ignored=importer.skipped)
                 output_message = 'The subscriber import "%s" completed with success. %s created, %s updated, ' \
-                                 '%s skipped.' % (subscriber_import_id, subscriber_created, subscriber_updated,
-                                                  subscriber_skipped)
+                                 '%s skipped.' % (subscriber_import_id, importer.created, importer.updated,
+                                                  importer.skipped)
             except Exception:
                 import_status = ImportStatus.ERRORED
                 notification_action = Actions.IMPORT_ERRORED
@@ -171,9 +210,81 @@ def import_subscribers(subscriber_import_id: Union[str, int]) -> str:
                 subscriber_import.status = import_status
                 subscriber_import.save(update_fields=['status'])
                 Notification.objects.create(user=subscriber_import.user, action=notification_action,
-                                            text=output_message)
+                                            text=json.dumps(notification_data))
                 return output_message
         else:
             return 'The subscriber import file "%s" was not queued to be imported.' % subscriber_import_id
     except SubscriberImport.DoesNotExist:
         return 'Subscriber import file "%s" does not exist.' % subscriber_import_id
+
+
+@shared_task
+def import_pasted_subscribers(mailing_list_id: int, emails: List[str], status: int,
+                              user_id: Optional[int] = None) -> str:
+    """
+    Import a list of pasted email addresses too large to be imported within
+    the request.
+
+    :param mailing_list_id: MailingList instance ID
+    :param emails: Email addresses already normalized and validated
+    :param status: Status assigned to the subscribers
+    :param user_id: ID of the user to be notified once the import is done
+    :return: Message with the status of the import process
+    """
+    try:
+        mailing_list = MailingList.objects.get(pk=mailing_list_id)
+    except MailingList.DoesNotExist:
+        return 'Mailing list with id "%s" does not exist.' % mailing_list_id
+
+    importer = import_emails(mailing_list, emails, status)
+    if user_id is not None:
+        text = json.dumps({
+            'mailing_list_id': mailing_list_id,
+            'created': importer.created,
+            'updated': importer.updated,
+            'ignored': importer.skipped
+        })
+        Notification.objects.create(user_id=user_id, action=Actions.IMPORT_COMPLETED, text=text)
+    return 'Imported %s emails to mailing list %s. %s created, %s updated.' % (
+        len(emails), mailing_list_id, importer.created, importer.updated
+    )
+
+
+@shared_task
+def export_subscribers(mailing_list_id: int, user_id: int, export_format: str, status: Optional[int] = None,
+                       tags: Optional[List[int]] = None) -> str:
+    """
+    Write the subscribers of a mailing list to a file in the private media
+    storage and notify the user once it's ready to be downloaded.
+
+    :param mailing_list_id: MailingList instance ID
+    :param user_id: ID of the user to be notified
+    :param export_format: One of the `ExportFormats`
+    :param status: Export only the subscribers with this status
+    :param tags: Export only the subscribers with any of these tags IDs
+    :return: Name of the exported file in the storage
+    """
+    try:
+        mailing_list = MailingList.objects.get(pk=mailing_list_id)
+    except MailingList.DoesNotExist:
+        return 'Mailing list with id "%s" does not exist.' % mailing_list_id
+
+    queryset = get_subscribers_export_queryset(mailing_list_id, status)
+    audience = get_subscribers_export_audience(mailing_list_id, status, tags)
+    rows_count = 0
+
+    def iter_rows():
+        nonlocal rows_count
+        for row in iter_subscribers_export_rows(queryset, audience):
+            rows_count += 1
+            yield row
+
+    name = 'exports/%s' % get_subscribers_export_name(mailing_list)
+    file_name = save_export(PrivateMediaStorage(), name, export_format, SUBSCRIBERS_EXPORT_FIELDS, iter_rows())
+    text = json.dumps({
+        'mailing_list_id': mailing_list_id,
+        'file_name': file_name.split('/')[-1],
+        'rows': rows_count
+    })
+    Notification.objects.create(user_id=user_id, action=Actions.SUBSCRIBERS_EXPORTED, text=text)
+    return file_name
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+
+from colossus.apps.lists import bounces
+from colossus.apps.lists.tasks import process_bounces_mailbox
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.constants import Status
+from colossus.apps.subscribers.models import Subscriber, Suppression
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.test.testcases import TestCase
+
+DSN_TEMPLATE = '''From: Mail Delivery System <MAILER-DAEMON@mx.example.com>
+To: bounces@colossus.example.com
+Subject: Undelivered Mail Returned to Sender
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="BOUNDARY"
+
+--BOUNDARY
+Content-Type: text/plain
+
+This is the mail system at host mx.example.com.
+
+--BOUNDARY
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mx.example.com
+Arrival-Date: Mon, 15 Oct 2018 10:00:00 +0000
+
+Final-Recipient: rfc822; %(recipient)s
+Original-Recipient: rfc822;%(recipient)s
+Action: %(action)s
+Status: %(status)s
+Diagnostic-Code: smtp; 550 5.1.1 User unknown
+
+--BOUNDARY
+Content-Type: message/rfc822
+
+From: newsletter@colossus.example.com
+To: %(recipient)s
+Subject: Newsletter
+
+Hi there!
+
+--BOUNDARY--
+'''
+
+
+def make_dsn(recipient, action='failed', status='5.1.1'):
+    return DSN_TEMPLATE % {'recipient': recipient, 'action': action, 'status': status}
+
+
+class GetFailedRecipientsTests(TestCase):
+    def test_hard_bounce(self):
+        message = bounces.parse_message(make_dsn('john@example.com').encode('utf-8'))
+        self.assertEqual([('john@example.com', '5.1.1')], bounces.get_failed_recipients(message))
+
+    def test_delayed_and_delivered_ignored(self):
+        for action, status in (('delayed', '4.4.1'), ('delivered', '2.0.0')):
+            with self.subTest(action=action):
+                message = bounces.parse_message(make_dsn('john@example.com', action, status).encode('utf-8'))
+                self.assertEqual([], bounces.get_failed_recipients(message))
+
+    def test_not_a_dsn(self):
+        message = bounces.parse_message(b'From: john@example.com\nSubject: Hello\n\nfailed 5.1.1\n')
+        self.assertEqual([], bounces.get_failed_recipients(message))
+
+
+class ProcessBouncesMailboxTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        mailing_list = MailingListFactory()
+        other_mailing_list = MailingListFactory()
+        self.bounced = SubscriberFactory(mailing_list=mailing_list, email='bounced@example.com')
+        self.bounced_other_list = Subscriber.objects.create(
+            mailing_list=other_mailing_list,
+            email='bounced@example.com',
+            domain=self.bounced.domain,
+            status=Status.SUBSCRIBED
+        )
+        self.delayed = SubscriberFactory(mailing_list=mailing_list, email='delayed@example.com')
+        self.messages = [
+            make_dsn('bounced@Example.com'),
+            make_dsn('delayed@example.com', 'delayed', '4.2.2'),
+            'From: john@example.com\nSubject: Out of office\n\nBack next week.\n',
+        ]
+
+    def assertCleaned(self):
+        for subscriber, status in ((self.bounced, Status.CLEANED),
+                                   (self.bounced_other_list, Status.CLEANED),
+                                   (self.delayed, Status.SUBSCRIBED)):
+            with self.subTest(subscriber=subscriber):
+                subscriber.refresh_from_db()
+                self.assertEqual(status, subscriber.status)
+        self.assertTrue(Suppression.objects.is_suppressed('bounced@example.com'))
+        self.assertFalse(Suppression.objects.is_suppressed('delayed@example.com'))
+
+    def test_maildir(self):
+        for name in ('new', 'cur', 'tmp'):
+            os.mkdir(os.path.join(self.directory, name))
+        for index, message in enumerate(self.messages):
+            with open(os.path.join(self.directory, 'new', '%s.mx' % index), 'w') as message_file:
+                message_file.write(message)
+        summary = process_bounces_mailbox(self.directory, batch_size=2)
+        self.assertEqual({'messages': 3, 'hard_bounces': 1, 'cleaned': 2}, summary)
+        self.assertCleaned()
+        self.assertEqual([], os.listdir(os.path.join(self.directory, 'new')))
+        self.assertEqual(['0.mx:2,S', '1.mx:2,S', '2.mx:2,S'], sorted(os.listdir(os.path.join(self.directory, 'cur'))))
+        self.assertEqual(0, process_bounces_mailbox(self.directory)['messages'])
+
+    def test_mbox_resumes_from_offset(self):
+        path = os.path.join(self.directory, 'bounces.mbox')
+        with open(path, 'w') as mbox:
+            for message in self.messages[:2]:
+                mbox.write('From MAILER-DAEMON Mon Oct 15 10:00:00 2018\n%s\n' % message)
+        summary = process_bounces_mailbox(path, batch_size=1)
+        self.assertEqual({'messages': 2, 'hard_bounces': 1, 'cleaned': 2}, summary)
+        self.assertCleaned()
+        self.assertEqual(os.path.getsize(path), bounces.get_mbox_offset(path))
+
+        with open(path, 'a') as mbox:
+            mbox.write('From john@example.com Mon Oct 15 11:00:00 2018\n%s\n' % self.messages[2])
+        self.assertEqual({'messages': 1, 'hard_bounces': 0, 'cleaned': 0}, process_bounces_mailbox(path))
+
+    def test_mbox_truncated(self):
+        path = os.path.join(self.directory, 'bounces.mbox')
+        with open(path, 'w') as mbox:
+            mbox.write('From MAILER-DAEMON Mon Oct 15 10:00:00 2018\n%s\n' % self.messages[0])
+        bounces.set_mbox_offset(path, os.path.getsize(path) + 100)
+        self.assertEqual(0, bounces.get_mbox_offset(path))
+
+    def test_command(self):
+        path = os.path.join(self.directory, 'bounces.mbox')
+        with open(path, 'w') as mbox:
+            mbox.write('From MAILER-DAEMON Mon Oct 15 10:00:00 2018\n%s\n' % self.messages[0])
+        stdout = StringIO()
+        call_command('processbounces', path, stdout=stdout)
+        self.assertIn('1 hard bounces, 2 subscribers cleaned', stdout.getvalue())
+        self.assertCleaned()
@@ -0,0 +1,37 @@
+from colossus.apps.lists.forms import SegmentForm
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.constants import SegmentMatch
+from colossus.apps.subscribers.models import Segment
+from colossus.test.testcases import TestCase
+
+
+class SegmentFormTests(TestCase):
+    def setUp(self):
+        self.segment = Segment(mailing_list=MailingListFactory())
+
+    def get_form(self, filters):
+        return SegmentForm(instance=self.segment, data={
+            'name': 'Segment',
+            'match': SegmentMatch.ALL,
+            'filters': filters,
+        })
+
+    def test_valid_filters(self):
+        form = self.get_form('[{"field": "tags", "operator": "in", "value": [1]}, '
+                             '{"field": "country", "operator": "not_in", "value": ["BR"]}]')
+        self.assertTrue(form.is_valid())
+
+    def test_invalid_list_values(self):
+        invalid_filters = (
+            '[{"field": "tags", "operator": "in", "value": ["abc"]}]',
+            '[{"field": "tags", "operator": "in", "value": [true]}]',
+            '[{"field": "city", "operator": "in", "value": ["abc"]}]',
+            '[{"field": "city", "operator": "not_in", "value": [1.5]}]',
+            '[{"field": "country", "operator": "in", "value": [1]}]',
+            '[{"field": "domain", "operator": "in", "value": [null]}]',
+        )
+        for filters in invalid_filters:
+            with self.subTest(filters=filters):
+                form = self.get_form(filters)
+                self.assertFalse(form.is_valid())
+                self.assertEqual(['invalid_filter'], [error.code for error in form.errors.as_data()['filters']])
@@ -0,0 +1,277 @@
+import csv
+from unittest import mock, skipUnless
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from colossus.apps.lists.constants import ImportEngines, ImportStrategies
+from colossus.apps.lists.importers import (
+    CopySubscriberImporter, SubscriberImporter, can_parse_in_parallel,
+    import_subscriber_import_file, iter_parsed_rows,
+    iter_parsed_rows_in_parallel, save_progress,
+)
+from colossus.apps.lists.models import SubscriberImport
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.lists.utils import split_byte_ranges
+from colossus.apps.subscribers.constants import ActivityTypes, Status
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Domain, Subscriber,
+)
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.test.testcases import TestCase
+
+
+class SubscriberImporterTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.existing = SubscriberFactory(
+            email='John@example.com',
+            name='John',
+            mailing_list=self.mailing_list,
+            status=Status.UNSUBSCRIBED
+        )
+        self.rows = [
+            {'email': 'john@example.com', 'name': 'John Doe'},
+            {'email': 'mary@example.com', 'name': 'Mary'},
+            {'email': 'mary@example.com', 'name': 'Mary Jane'},
+            {'email': 'invalid', 'name': 'Invalid'},
+            {'email': 'peter@colossus.test', 'name': 'Peter'},
+        ]
+
+    def run_import(self, strategy, chunk_size=2):
+        importer = SubscriberImporter(self.mailing_list.pk, strategy, Status.SUBSCRIBED, chunk_size=chunk_size)
+        importer.import_rows(self.rows)
+        return importer
+
+    def test_create(self):
+        importer = self.run_import(ImportStrategies.CREATE)
+        self.assertEqual((2, 0, 3), (importer.created, importer.updated, importer.skipped))
+        self.assertEqual('Mary', Subscriber.objects.get(email='mary@example.com').name)
+        self.existing.refresh_from_db()
+        self.assertEqual('John', self.existing.name)
+        self.assertEqual(Status.UNSUBSCRIBED, self.existing.status)
+
+    def test_update(self):
+        importer = self.run_import(ImportStrategies.UPDATE)
+        self.assertEqual((0, 1, 4), (importer.created, importer.updated, importer.skipped))
+        self.assertEqual(1, Subscriber.objects.count())
+        self.existing.refresh_from_db()
+        self.assertEqual('John Doe', self.existing.name)
+        self.assertEqual(Status.SUBSCRIBED, self.existing.status)
+
+    def test_update_or_create(self):
+        importer = self.run_import(ImportStrategies.UPDATE_OR_CREATE, chunk_size=10)
+        self.assertEqual((2, 2, 1), (importer.created, importer.updated, importer.skipped))
+        self.assertEqual(3, Subscriber.objects.count())
+        self.assertEqual('Mary Jane', Subscriber.objects.get(email='mary@example.com').name)
+        self.existing.refresh_from_db()
+        self.assertEqual('John Doe', self.existing.name)
+
+    def test_domains_resolved(self):
+        self.run_import(ImportStrategies.CREATE)
+        peter = Subscriber.objects.get(email='peter@colossus.test')
+        self.assertEqual('@colossus.test', peter.domain.name)
+        self.assertEqual(1, Domain.objects.filter(name='@example.com').count())
+
+    def test_imported_activities(self):
+        self.run_import(ImportStrategies.UPDATE_OR_CREATE, chunk_size=10)
+        self.assertEqual(3, Activity.objects.filter(activity_type=ActivityTypes.IMPORTED).count())
+        self.assertEqual(3, DailyActivity.objects.get(activity_type=ActivityTypes.IMPORTED).count)
+
+    def test_number_of_queries_does_not_grow_with_rows(self):
+        self.rows = [{'email': 'subscriber_%s@example.com' % i, 'name': ''} for i in range(200)]
+        with CaptureQueriesContext(connection) as context:
+            self.run_import(ImportStrategies.UPDATE_OR_CREATE, chunk_size=500)
+        self.assertEqual(200, Subscriber.objects.filter(email__startswith='subscriber_').count())
+        self.assertLess(len(context.captured_queries), 20)
+
+
+class CopySubscriberImporterTests(TestCase):
+    def setUp(self):
+        self.subscriber_import = SubscriberImport(
+            pk=1,
+            mailing_list=MailingListFactory(),
+            strategy=ImportStrategies.CREATE
+        )
+        self.subscriber_import.set_columns_mapping({'0': 'email', '2': 'name', '3': 'optin_date'})
+
+    def test_keep_first_row_on_create(self):
+        importer = CopySubscriberImporter(self.subscriber_import)
+        self.assertIn('row_number ASC', importer.get_normalize_sql())
+        self.assertIn('DO NOTHING', importer.get_insert_sql())
+
+    def test_keep_last_row_on_update_or_create(self):
+        self.subscriber_import.strategy = ImportStrategies.UPDATE_OR_CREATE
+        importer = CopySubscriberImporter(self.subscriber_import)
+        self.assertIn('row_number DESC', importer.get_normalize_sql())
+        self.assertIn('DO UPDATE SET status = EXCLUDED.status', importer.get_insert_sql())
+
+    def test_mapped_columns(self):
+        importer = CopySubscriberImporter(self.subscriber_import)
+        normalize_sql = importer.get_normalize_sql()
+        self.assertIn("lower(substring(regexp_replace(c0, ", normalize_sql)
+        self.assertIn("coalesce(c2, '')", normalize_sql)
+        self.assertIn("coalesce(n.optin_date, now())", importer.get_insert_sql())
+
+    def test_copy_options(self):
+        class Dialect(csv.excel):
+            delimiter = ';'
+        importer = CopySubscriberImporter(self.subscriber_import)
+        self.assertEqual(
+            "COPY colossus_import_staging_1 (c0, c1, c2, c3) FROM STDIN WITH "
+            "(FORMAT csv, HEADER true, ENCODING 'UTF8', DELIMITER ';', QUOTE '\"')",
+            importer.get_copy_sql(4, Dialect)
+        )
+
+    @override_settings(COLOSSUS_IMPORT_ENGINE=ImportEngines.POSTGRESQL_COPY)
+    def test_fallback_to_orm_engine(self):
+        content = b'email,ip,name,optin_date\na@b.com,,A,2018-08-01 10:00:00\n'
+        self.subscriber_import.file.save('test_copy_fallback.csv', ContentFile(content))
+        try:
+            importer = import_subscriber_import_file(self.subscriber_import)
+        finally:
+            self.subscriber_import.file.delete(save=False)
+        self.assertIsInstance(importer, SubscriberImporter)
+        self.assertEqual(1, importer.created)
+
+
+class ImportValidationTests(TestCase):
+    """
+    Both import engines apply the same validation rules to the same file.
+    """
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.existing = SubscriberFactory(
+            email='John@example.com',
+            name='John',
+            mailing_list=self.mailing_list,
+            status=Status.UNSUBSCRIBED
+        )
+        content = (
+            'email,name,ip,optin_date\n'
+            'john@EXAMPLE.com,John Doe,10.0.0.1,2018-08-01 10:00:00\n'
+            'Mary@Example.com,Mary,999.1.1.1,2018-08-01 10:00:00\n'
+            ' MARY@example.com ,Mary Jane,::1,2018-08-01 11:00:00\n'
+            'invalid,Invalid,,2018-08-01 10:00:00\n'
+            'peter@localhost,Peter,,2018-08-01 10:00:00\n'
+            'ann@example.com,Ann,10.0.0.2,2018-02-30 10:00:00\n'
+            'bob@example.com,Bob,not an ip,2018-08-01 10:00:00\n'
+        )
+        self.subscriber_import = SubscriberImport(
+            mailing_list=self.mailing_list,
+            strategy=ImportStrategies.UPDATE_OR_CREATE,
+            subscriber_status=Status.SUBSCRIBED
+        )
+        self.subscriber_import.set_columns_mapping({'0': 'email', '1': 'name', '2': 'optin_ip_address',
+                                                    '3': 'optin_date'})
+        self.subscriber_import.file.save('test_import_validation.csv', ContentFile(content.encode('utf-8')))
+        self.subscriber_import.build_manifest()
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def assertImported(self):
+        subscribers = Subscriber.objects.filter(mailing_list=self.mailing_list).order_by('name')
+        self.assertEqual(
+            [
+                ('bob@example.com', 'Bob', None),
+                ('john@example.com', 'John Doe', '10.0.0.1'),
+                ('MARY@example.com', 'Mary Jane', '::1'),
+            ],
+            [(s.email, s.name, s.optin_ip_address) for s in subscribers]
+        )
+        self.assertEqual(
+            3,
+            Activity.objects.filter(subscriber__in=subscribers, activity_type=ActivityTypes.IMPORTED).count()
+        )
+        self.assertEqual(3, DailyActivity.objects.get(activity_type=ActivityTypes.IMPORTED).count)
+
+    def test_orm_engine(self):
+        importer = import_subscriber_import_file(self.subscriber_import)
+        self.assertIsInstance(importer, SubscriberImporter)
+        # The ORM engine counts the duplicates of a row as updates
+        self.assertEqual((2, 2, 3), (importer.created, importer.updated, importer.skipped))
+        self.assertImported()
+
+    @skipUnless(connection.vendor == 'postgresql', 'The COPY import engine requires PostgreSQL.')
+    @override_settings(COLOSSUS_IMPORT_ENGINE=ImportEngines.POSTGRESQL_COPY)
+    def test_copy_engine(self):
+        importer = import_subscriber_import_file(self.subscriber_import)
+        self.assertIsInstance(importer, CopySubscriberImporter)
+        self.assertEqual((2, 1, 4), (importer.created, importer.updated, importer.skipped))
+        self.assertImported()
+
+
+class ParallelImportTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        lines = ['email,name'] + ['subscriber%s@example.com,Subscriber %s' % (i, i) for i in range(100)]
+        lines += ['SUBSCRIBER0@example.com,Last Row', 'invalid,Invalid']
+        self.content = ('\n'.join(lines) + '\n').encode('utf-8')
+        self.subscriber_import = SubscriberImport(
+            mailing_list=self.mailing_list,
+            strategy=ImportStrategies.UPDATE_OR_CREATE,
+            subscriber_status=Status.SUBSCRIBED
+        )
+        self.subscriber_import.set_columns_mapping({'0': 'email', '1': 'name'})
+        self.subscriber_import.file.save('test_parallel_import.csv', ContentFile(self.content))
+        self.subscriber_import.build_manifest()
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def test_byte_ranges_aligned_to_lines(self):
+        ranges = split_byte_ranges(self.subscriber_import.file.path, 4)
+        self.assertEqual(4, len(ranges))
+        self.assertEqual(0, ranges[0][0])
+        self.assertEqual(len(self.content), ranges[-1][1])
+        for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(b'\n', self.content[end - 1:end])
+
+    def test_parse_in_parallel(self):
+        rows = list(iter_parsed_rows_in_parallel(self.subscriber_import, 3, 10))
+        self.assertEqual(list(iter_parsed_rows(self.subscriber_import)), rows)
+        self.assertEqual(102, len(rows))
+        self.assertEqual('subscriber0@example.com', rows[0][0]['email'])
+        self.assertEqual('SUBSCRIBER0@example.com', rows[100][0]['email'])
+        self.assertEqual(len(self.content), rows[-1][1])
+
+    def test_multiline_values_parsed_sequentially(self):
+        self.assertTrue(can_parse_in_parallel(self.subscriber_import))
+        self.subscriber_import.file.save('test_parallel_import.csv', ContentFile(
+            self.content + b'multiline@example.com,"Multi\nLine"\n'
+        ))
+        self.subscriber_import.build_manifest()
+        self.assertFalse(can_parse_in_parallel(self.subscriber_import))
+
+    @override_settings(COLOSSUS_IMPORT_WORKERS=3)
+    def test_last_row_wins(self):
+        importer = import_subscriber_import_file(self.subscriber_import)
+        self.assertEqual((100, 1, 1), (importer.created, importer.updated, importer.skipped))
+        self.assertEqual('Last Row', self.mailing_list.subscribers.get(email__iexact='subscriber0@example.com').name)
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(102, self.subscriber_import.rows_processed)
+
+    @override_settings(COLOSSUS_IMPORT_WORKERS=3, COLOSSUS_IMPORT_CHUNK_SIZE=10)
+    def test_progress_saved_per_chunk(self):
+        with mock.patch('colossus.apps.lists.importers.save_progress', wraps=save_progress) as progress:
+            importer = import_subscriber_import_file(self.subscriber_import)
+        self.assertEqual(11, progress.call_count)
+        self.assertEqual((100, 1, 1), (importer.created, importer.updated, importer.skipped))
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(102, self.subscriber_import.rows_processed)
+        self.assertEqual(len(self.content), self.subscriber_import.byte_offset)
+
+    @override_settings(COLOSSUS_IMPORT_WORKERS=3, COLOSSUS_IMPORT_CHUNK_SIZE=10)
+    def test_resume_in_parallel(self):
+        rows = list(iter_parsed_rows(self.subscriber_import))
+        self.subscriber_import.byte_offset = rows[49][1]
+        self.subscriber_import.rows_processed = 50
+        importer = import_subscriber_import_file(self.subscriber_import)
+        self.assertEqual((51, 0, 1), (importer.created, importer.updated, importer.skipped))
+        self.assertEqual(['subscriber50@example.com', 'subscriber99@example.com'], [
+            subscriber.email for subscriber in self.mailing_list.subscribers.order_by('pk')[::49]
+        ])
@@ -1,4 +1,7 @@
-from colossus.apps.lists.models import MailingList
+from django.core.files.base import ContentFile
+
+from colossus.apps.accounts.tests.factories import UserFactory
+from colossus.apps.lists.models import MailingList, SubscriberImport
 from colossus.apps.subscribers.constants import Status
 from colossus.apps.subscribers.tests.factories import SubscriberFactory
 from colossus.test.testcases import TestCase
@@ -71,3 +74,39 @@ class MailingListUpdateClickRateTests(TestCase):
     def test_round_percentage(self):
         SubscriberFactory(mailing_list=self.mailing_list, click_rate=0.0)
         self.assertEqual(0.3333, self.mailing_list.update_click_rate())
+
+
+class SubscriberImportManifestTests(TestCase):
+    def setUp(self):
+        content = 'Name;E-mail\n' + ''.join('Subscriber %s;subscriber%s@example.com\n' % (i, i) for i in range(15))
+        content += 'Invalid;not an email\nDuplicate;SUBSCRIBER0@example.com\n'
+        self.subscriber_import = SubscriberImport(mailing_list=MailingListFactory(), user=UserFactory())
+        self.subscriber_import.file.save('test_manifest.csv', ContentFile(content.encode('utf-8')))
+        self.subscriber_import.build_manifest()
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def test_manifest(self):
+        manifest = SubscriberImport.objects.get(pk=self.subscriber_import.pk).get_manifest()
+        self.assertEqual(';', manifest['dialect']['delimiter'])
+        self.assertEqual(['Name', 'E-mail'], manifest['headings'])
+        self.assertEqual(18, manifest['size'])
+        self.assertEqual(10, len(manifest['preview']))
+        self.assertEqual(1, manifest['email_column'])
+        self.assertEqual(1, manifest['invalid_emails'])
+        self.assertEqual(1, manifest['duplicate_emails'])
+
+    def test_size(self):
+        self.assertEqual(18, SubscriberImport.objects.get(pk=self.subscriber_import.pk).size)
+
+    def test_preview_does_not_read_file(self):
+        subscriber_import = SubscriberImport.objects.get(pk=self.subscriber_import.pk)
+        self.subscriber_import.file.delete(save=False)
+        self.assertEqual(['Name', 'E-mail'], subscriber_import.get_headings())
+        self.assertEqual(['Subscriber 0', 'subscriber0@example.com'], subscriber_import.get_preview()[0])
+
+    def test_get_rows_uses_stored_dialect(self):
+        rows = self.subscriber_import.get_rows(limit=2)
+        self.assertEqual([['Subscriber 0', 'subscriber0@example.com'], ['Subscriber 1', 'subscriber1@example.com']],
+                         rows)
@@ -0,0 +1,203 @@
+import json
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+
+import billiard
+
+from colossus.apps.accounts.tests.factories import UserFactory
+from colossus.apps.lists.constants import ImportStatus, ImportStrategies
+from colossus.apps.lists.models import SubscriberImport
+from colossus.apps.lists.tasks import (
+    clean_lists_hard_bounces_task, import_subscribers,
+)
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.lists.utils import iter_csv_rows
+from colossus.apps.notifications.constants import Actions
+from colossus.apps.notifications.models import Notification
+from colossus.apps.subscribers.constants import ActivityTypes, Status
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Subscriber, Suppression,
+)
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.test.testcases import TestCase
+
+CSV_CONTENT = '''email,name,optin_date
+john@example.com,John,2018-08-01 10:00:00
+MARY@example.com,Mary,2018-08-02 10:00:00
+peter@example.com,Peter,2018-08-03 10:00:00
+'''
+
+
+def run_import_subscribers(subscriber_import_id):
+    return import_subscribers(subscriber_import_id)
+
+
+class ImportSubscribersTaskTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.subscriber_import = SubscriberImport(
+            mailing_list=self.mailing_list,
+            user=UserFactory(),
+            status=ImportStatus.QUEUED,
+            subscriber_status=Status.SUBSCRIBED,
+            strategy=ImportStrategies.UPDATE_OR_CREATE
+        )
+        self.subscriber_import.set_columns_mapping({'0': 'email', '1': 'name', '2': 'optin_date'})
+        self.subscriber_import.file.save('test_import.csv', ContentFile(CSV_CONTENT.encode('utf-8')))
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def test_import_completed(self):
+        import_subscribers(self.subscriber_import.pk)
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(ImportStatus.COMPLETED, self.subscriber_import.status)
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+
+    def test_existing_subscribers_updated(self):
+        subscriber = SubscriberFactory(email='mary@example.com', mailing_list=self.mailing_list, status=Status.PENDING)
+        import_subscribers(self.subscriber_import.pk)
+        subscriber.refresh_from_db()
+        self.assertEqual('Mary', subscriber.name)
+        self.assertEqual(Status.SUBSCRIBED, subscriber.status)
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+
+    def test_subscribers_count_updated(self):
+        import_subscribers(self.subscriber_import.pk)
+        self.mailing_list.refresh_from_db()
+        self.assertEqual(3, self.mailing_list.subscribers_count)
+
+    def test_completed_notification_data(self):
+        import_subscribers(self.subscriber_import.pk)
+        notification = self.subscriber_import.user.notifications.get()
+        self.assertEqual(Actions.IMPORT_COMPLETED, notification.action)
+        self.assertEqual({'mailing_list_id': self.mailing_list.pk, 'created': 3, 'updated': 0, 'ignored': 0},
+                         json.loads(notification.text))
+
+    @override_settings(COLOSSUS_IMPORT_CHUNK_SIZE=2)
+    def test_progress_saved(self):
+        import_subscribers(self.subscriber_import.pk)
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(3, self.subscriber_import.rows_processed)
+        self.assertEqual(3, self.subscriber_import.created_count)
+        self.assertEqual(self.subscriber_import.file.size, self.subscriber_import.byte_offset)
+        self.assertIsNotNone(self.subscriber_import.last_progress_date)
+
+    def test_resume_from_byte_offset(self):
+        """
+        Test an import interrupted after the first row resumes from the second row
+        """
+        row, byte_offset = next(iter_csv_rows(self.subscriber_import.file.path))
+        SubscriberFactory(email='john@example.com', mailing_list=self.mailing_list)
+        self.subscriber_import.byte_offset = byte_offset
+        self.subscriber_import.rows_processed = 1
+        self.subscriber_import.created_count = 1
+        self.subscriber_import.save()
+        import_subscribers(self.subscriber_import.pk)
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(3, self.subscriber_import.rows_processed)
+        self.assertEqual(3, self.subscriber_import.created_count)
+        self.assertEqual(0, self.subscriber_import.updated_count)
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+
+    @override_settings(COLOSSUS_IMPORT_WORKERS=2, COLOSSUS_IMPORT_CHUNK_SIZE=2)
+    def test_parallel_import_in_daemonic_worker(self):
+        """
+        Test the parallel import runs in a daemonic process, as the Celery
+        prefork workers are
+        """
+        pool = billiard.Pool(processes=1)
+        try:
+            message = pool.apply(run_import_subscribers, (self.subscriber_import.pk,))
+        finally:
+            pool.close()
+            pool.join()
+        self.assertIn('completed with success. 3 created, 0 updated, 0 skipped', message)
+
+    def test_malformed_rows_skipped(self):
+        self.subscriber_import.file.save('test_import.csv', ContentFile(
+            CSV_CONTENT.encode('utf-8') + b'invalid@example.com,Invalid,not a date\n'
+        ))
+        import_subscribers(self.subscriber_import.pk)
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(ImportStatus.COMPLETED, self.subscriber_import.status)
+        self.assertEqual(1, self.subscriber_import.skipped_count)
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+
+
+@override_settings(MAILGUN_API_KEY='key')
+class CleanListsHardBouncesTaskTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory(is_superuser=True)
+        self.mailing_list = MailingListFactory()
+        self.other_mailing_list = MailingListFactory()
+        self.bounced = SubscriberFactory(mailing_list=self.mailing_list, email='bounced@example.com')
+        self.bounced_other_list = Subscriber.objects.create(
+            mailing_list=self.other_mailing_list,
+            email='bounced@example.com',
+            domain=self.bounced.domain,
+            status=Status.SUBSCRIBED
+        )
+        self.unsubscribed = SubscriberFactory(
+            mailing_list=self.mailing_list,
+            email='gone@example.com',
+            status=Status.UNSUBSCRIBED
+        )
+        self.active = SubscriberFactory(mailing_list=self.mailing_list, email='active@example.com')
+        self.mailing_list.update_subscribers_count()
+        bounces = [{'address': 'bounced@example.com'}, {'address': 'gone@example.com'}]
+        patcher = mock.patch('colossus.apps.core.mailgun.Mailgun.bounces', return_value=iter(bounces))
+        self.mailgun_bounces = patcher.start()
+        self.addCleanup(patcher.stop)
+        clean_lists_hard_bounces_task.delay()
+
+    def test_bounces_read_once(self):
+        self.mailgun_bounces.assert_called_once_with()
+
+    def test_subscribers_cleaned(self):
+        for subscriber, status in ((self.bounced, Status.CLEANED),
+                                   (self.bounced_other_list, Status.CLEANED),
+                                   (self.unsubscribed, Status.UNSUBSCRIBED),
+                                   (self.active, Status.SUBSCRIBED)):
+            with self.subTest(subscriber=subscriber):
+                subscriber.refresh_from_db()
+                self.assertEqual(status, subscriber.status)
+        self.mailing_list.refresh_from_db()
+        self.assertEqual(1, self.mailing_list.subscribers_count)
+
+    def test_activities_created(self):
+        self.assertEqual(2, Activity.objects.filter(activity_type=ActivityTypes.CLEANED).count())
+        daily_activity = DailyActivity.objects.get(mailing_list=self.mailing_list, activity_type=ActivityTypes.CLEANED)
+        self.assertEqual(1, daily_activity.count)
+
+    def test_bounced_emails_suppressed(self):
+        self.assertTrue(Suppression.objects.is_suppressed('bounced@example.com'))
+        self.assertTrue(Suppression.objects.is_suppressed('gone@example.com'))
+        self.assertFalse(Suppression.objects.is_suppressed('active@example.com'))
+
+    def test_one_notification_per_list(self):
+        notifications = Notification.objects.filter(user=self.user, action=Actions.LIST_CLEANED)
+        self.assertEqual(2, notifications.count())
+        data = json.loads(notifications.get(text__contains='"mailing_list_id": %s,' % self.mailing_list.pk).text)
+        self.assertEqual(1, data['cleaned'])
+
+
+class IterCsvRowsTests(TestCase):
+    def setUp(self):
+        self.file = ContentFile(CSV_CONTENT.encode('utf-8'))
+        self.subscriber_import = SubscriberImport(mailing_list=MailingListFactory(), user=UserFactory())
+        self.subscriber_import.file.save('test_import.csv', self.file)
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def test_header_skipped(self):
+        rows = [row for row, byte_offset in iter_csv_rows(self.subscriber_import.file.path)]
+        self.assertEqual(['john@example.com', 'MARY@example.com', 'peter@example.com'], [row[0] for row in rows])
+
+    def test_resume_from_byte_offset(self):
+        rows = list(iter_csv_rows(self.subscriber_import.file.path))
+        resumed_rows = list(iter_csv_rows(self.subscriber_import.file.path, rows[0][1]))
+        self.assertEqual(rows[1:], resumed_rows)
@@ -0,0 +1,301 @@
+import datetime
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from colossus.apps.campaigns.constants import CampaignStatus
+from colossus.apps.campaigns.tests.factories import CampaignFactory
+from colossus.apps.lists.constants import ImportStatus
+from colossus.apps.lists.models import SubscriberImport
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.notifications.constants import Actions
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, SegmentMatch, Status,
+)
+from colossus.apps.subscribers.models import Segment, Subscriber, Tag
+from colossus.apps.subscribers.tests.factories import (
+    ActivityFactory, SubscriberFactory,
+)
+from colossus.storage import PrivateMediaStorage
+from colossus.test.testcases import AuthenticatedTestCase
+
+
+class SubscriberDetailViewTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.subscriber = SubscriberFactory()
+        ActivityFactory.create_batch(55, subscriber=self.subscriber, activity_type=ActivityTypes.IMPORTED)
+        self.url = reverse('lists:subscriber', kwargs={
+            'pk': self.subscriber.mailing_list_id,
+            'subscriber_pk': self.subscriber.pk
+        })
+
+    def test_first_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(50, len(response.context['activities']))
+        self.assertTrue(response.context['activities_page'].has_next())
+
+    def test_next_page(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, {'cursor': response.context['activities_page'].next_cursor})
+        self.assertEqual(5, len(response.context['activities']))
+        self.assertFalse(response.context['activities_page'].has_next())
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEqual(404, response.status_code)
+
+
+class SubscriberListViewTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.mailing_list = MailingListFactory()
+        SubscriberFactory.create_batch(105, mailing_list=self.mailing_list)
+        self.url = reverse('lists:subscribers', kwargs={'pk': self.mailing_list.pk})
+
+    def test_first_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(100, len(response.context['subscribers']))
+        self.assertTrue(response.context['subscribers_page'].has_next())
+
+    def test_next_page(self):
+        response = self.client.get(self.url)
+        first_page = list(response.context['subscribers'])
+        response = self.client.get(self.url, {'cursor': response.context['subscribers_page'].next_cursor})
+        self.assertEqual(5, len(response.context['subscribers']))
+        self.assertFalse(response.context['subscribers_page'].has_next())
+        self.assertFalse(set(first_page) & set(response.context['subscribers']))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEqual(404, response.status_code)
+
+    def test_search(self):
+        subscriber = SubscriberFactory(mailing_list=self.mailing_list, email='needle@example.com')
+        response = self.client.get(self.url, {'q': 'NEEDLE'})
+        self.assertEqual([subscriber], list(response.context['subscribers']))
+
+    def test_search_substring(self):
+        subscriber = SubscriberFactory(mailing_list=self.mailing_list, email='a.needle@example.com')
+        response = self.client.get(self.url, {'q': 'needle'})
+        self.assertEqual([subscriber], list(response.context['subscribers']))
+
+    def test_total_count_is_cached_per_list(self):
+        SubscriberFactory.create_batch(3)
+        response = self.client.get(self.url)
+        self.assertEqual(105, response.context['total_count'])
+        SubscriberFactory(mailing_list=self.mailing_list)
+        response = self.client.get(self.url)
+        self.assertEqual(105, response.context['total_count'])
+
+
+class SegmentViewsTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        self.subscriber = SubscriberFactory(mailing_list=self.mailing_list)
+        Subscriber.objects.filter(pk=self.subscriber.pk).update(open_rate=0.5)
+        SubscriberFactory.create_batch(2, mailing_list=self.mailing_list)
+        self.url = reverse('lists:new_segment', kwargs={'pk': self.mailing_list.pk})
+
+    def test_create_segment_refreshes_members(self):
+        response = self.client.post(self.url, {
+            'name': 'Engaged',
+            'match': SegmentMatch.ALL,
+            'filters': '[{"field": "open_rate", "operator": "gte", "value": 0.25}]'
+        })
+        self.assertRedirects(response, reverse('lists:segments', kwargs={'pk': self.mailing_list.pk}))
+        segment = Segment.objects.get()
+        self.assertEqual(self.mailing_list, segment.mailing_list)
+        self.assertEqual(1, segment.members_count)
+        response = self.client.get(
+            reverse('lists:subscribers', kwargs={'pk': self.mailing_list.pk}),
+            {'segment': segment.pk}
+        )
+        self.assertEqual([self.subscriber], list(response.context['subscribers']))
+
+    def test_invalid_filters(self):
+        response = self.client.post(self.url, {
+            'name': 'Engaged',
+            'match': SegmentMatch.ALL,
+            'filters': '[{"field": "open_rate", "operator": "in", "value": 0.25}]'
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertIn('filters', response.context['form'].errors)
+        self.assertFalse(Segment.objects.exists())
+
+    def test_delete_segment(self):
+        segment = Segment.objects.create(mailing_list=self.mailing_list, name='Engaged')
+        CampaignFactory(mailing_list=self.mailing_list, segment=segment, status=CampaignStatus.SENT)
+        url = reverse('lists:delete_segment', kwargs={'pk': self.mailing_list.pk, 'segment_pk': segment.pk})
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('lists:segments', kwargs={'pk': self.mailing_list.pk}))
+        self.assertFalse(Segment.objects.exists())
+
+    def test_delete_segment_with_unsent_campaigns(self):
+        segment = Segment.objects.create(mailing_list=self.mailing_list, name='Engaged')
+        campaign = CampaignFactory(mailing_list=self.mailing_list, segment=segment, status=CampaignStatus.SCHEDULED)
+        url = reverse('lists:delete_segment', kwargs={'pk': self.mailing_list.pk, 'segment_pk': segment.pk})
+        response = self.client.get(url)
+        self.assertEqual([campaign], list(response.context['unsent_campaigns']))
+        response = self.client.post(url)
+        self.assertRedirects(response, url)
+        campaign.refresh_from_db()
+        self.assertEqual(segment, campaign.segment)
+
+
+class SubscriberImportProgressTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.subscriber_import = SubscriberImport(
+            mailing_list=MailingListFactory(),
+            user=self.user,
+            status=ImportStatus.IMPORTING,
+            size=101,
+            rows_processed=25,
+            created_count=20,
+            updated_count=5,
+            rows_per_second=1234.56,
+            last_progress_date=timezone.now()
+        )
+        self.subscriber_import.file.save('test_import.csv', ContentFile(b'email\n'))
+        self.kwargs = {'pk': self.subscriber_import.mailing_list_id, 'import_pk': self.subscriber_import.pk}
+
+    def tearDown(self):
+        self.subscriber_import.file.delete(save=False)
+
+    def test_progress(self):
+        response = self.client.get(reverse('lists:import_progress', kwargs=self.kwargs))
+        data = response.json()
+        self.assertEqual(100, data['total_rows'])
+        self.assertEqual(25, data['rows_processed'])
+        self.assertEqual(25.0, data['percent'])
+        self.assertEqual(1234.6, data['rows_per_second'])
+
+    @mock.patch('colossus.apps.lists.views.import_subscribers')
+    def test_resume_active_import(self, import_subscribers):
+        self.client.post(reverse('lists:import_resume', kwargs=self.kwargs))
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(ImportStatus.IMPORTING, self.subscriber_import.status)
+        import_subscribers.delay.assert_not_called()
+
+    @mock.patch('colossus.apps.lists.views.import_subscribers')
+    def test_resume_stalled_import(self, import_subscribers):
+        self.subscriber_import.last_progress_date = timezone.now() - datetime.timedelta(hours=1)
+        self.subscriber_import.save()
+        self.client.post(reverse('lists:import_resume', kwargs=self.kwargs))
+        self.subscriber_import.refresh_from_db()
+        self.assertEqual(ImportStatus.QUEUED, self.subscriber_import.status)
+        import_subscribers.delay.assert_called_once_with(self.subscriber_import.pk)
+
+
+class PasteEmailsImportSubscribersViewTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        self.existing = SubscriberFactory(email='john@example.com', mailing_list=self.mailing_list,
+                                          status=Status.UNSUBSCRIBED)
+        self.url = reverse('lists:paste_import_subscribers', kwargs={'pk': self.mailing_list.pk})
+        self.data = {'emails': 'JOHN@example.com, mary@example.com\npeter@example.com', 'status': Status.SUBSCRIBED}
+
+    def test_import(self):
+        self.client.post(self.url, self.data)
+        self.existing.refresh_from_db()
+        self.mailing_list.refresh_from_db()
+        self.assertEqual(Status.SUBSCRIBED, self.existing.status)
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+        self.assertEqual(3, self.mailing_list.subscribers_count)
+
+    def test_activities_only_for_created_subscribers(self):
+        self.client.post(self.url, self.data)
+        self.assertFalse(self.existing.activities.filter(activity_type=ActivityTypes.IMPORTED).exists())
+        self.assertEqual(1, self.mailing_list.subscribers.get(email='mary@example.com').activities.count())
+
+    @override_settings(COLOSSUS_PASTE_IMPORT_SYNC_LIMIT=2)
+    def test_large_paste_imported_in_background(self):
+        with mock.patch('colossus.apps.lists.forms.import_pasted_subscribers') as import_pasted_subscribers:
+            self.client.post(self.url, self.data)
+        import_pasted_subscribers.delay.assert_called_once_with(
+            self.mailing_list.pk,
+            ['JOHN@example.com', 'mary@example.com', 'peter@example.com'],
+            Status.SUBSCRIBED,
+            self.user.pk
+        )
+        self.assertEqual(1, self.mailing_list.subscribers.count())
+
+    @override_settings(COLOSSUS_PASTE_IMPORT_SYNC_LIMIT=2)
+    def test_background_import_notification(self):
+        self.client.post(self.url, self.data)
+        notification = self.user.notifications.get()
+        self.assertEqual(Actions.IMPORT_COMPLETED, notification.action)
+        self.assertEqual(2, notification.data['created'])
+        self.assertEqual(3, self.mailing_list.subscribers.count())
+
+
+class ExportSubscribersViewTests(AuthenticatedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mailing_list = MailingListFactory()
+        self.tag = Tag.objects.create(name='vip', mailing_list=self.mailing_list)
+        self.subscribed = SubscriberFactory(email='john@example.com', mailing_list=self.mailing_list,
+                                            status=Status.SUBSCRIBED)
+        self.subscribed.tags.add(self.tag)
+        SubscriberFactory(email='mary@example.com', mailing_list=self.mailing_list, status=Status.UNSUBSCRIBED)
+        SubscriberFactory(email='other@example.com')
+        self.url = reverse('lists:export_subscribers', kwargs={'pk': self.mailing_list.pk})
+
+    def export(self, **data):
+        response = self.client.post(self.url, dict({'export_format': 'csv'}, **data))
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv(self):
+        lines = self.export().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith('uuid,email,name,status'))
+        self.assertIn('john@example.com', lines[1])
+        self.assertIn('Subscribed', lines[1])
+        self.assertIn('mary@example.com', lines[2])
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.export(export_format='jsonl').splitlines()]
+        self.assertEqual(['john@example.com', 'mary@example.com'], [row['email'] for row in rows])
+        self.assertEqual(str(self.subscribed.uuid), rows[0]['uuid'])
+
+    def test_filter_by_status(self):
+        lines = self.export(status=Status.UNSUBSCRIBED).splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertIn('mary@example.com', lines[1])
+
+    def test_filter_by_tags(self):
+        self.subscribed.tags.add(Tag.objects.create(name='customer', mailing_list=self.mailing_list))
+        lines = self.export(tags=list(self.mailing_list.tags.values_list('pk', flat=True))).splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertIn('john@example.com', lines[1])
+
+    def test_background_export(self):
+        response = self.client.post(self.url, {'export_format': 'csv', 'background': 'on'})
+        self.assertRedirects(response, reverse('lists:subscribers', kwargs={'pk': self.mailing_list.pk}))
+        notification = self.user.notifications.get()
+        self.assertEqual(Actions.SUBSCRIBERS_EXPORTED, notification.action)
+        self.assertEqual(2, notification.data['rows'])
+        self.assertIn('Download file', notification.render())
+        download_url = reverse('lists:download_subscribers_export', kwargs={
+            'pk': self.mailing_list.pk,
+            'file_name': notification.data['file_name']
+        })
+        try:
+            response = self.client.get(download_url)
+            content = b''.join(response.streaming_content).decode('utf-8')
+            self.assertIn('john@example.com', content)
+        finally:
+            PrivateMediaStorage().delete('exports/%s' % notification.data['file_name'])
+
+    def test_download_other_list_export(self):
+        url = reverse('lists:download_subscribers_export', kwargs={'pk': self.mailing_list.pk, 'file_name': 'x.csv'})
+        self.assertEqual(404, self.client.get(url).status_code)
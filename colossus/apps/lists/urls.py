@@ -18,9 +18,13 @@ urlpatterns = [
     path('<int:pk>/subscribers/import/csv/', views.SubscriberImportView.as_view(), name='csv_import_subscribers'),
     path('<int:pk>/subscribers/import/csv/<int:import_pk>/', views.SubscriberImportPreviewView.as_view(), name='import_preview'),
     path('<int:pk>/subscribers/import/csv/<int:import_pk>/queued/', views.SubscriberImportQueuedView.as_view(), name='import_queued'),
+    path('<int:pk>/subscribers/import/csv/<int:import_pk>/progress/', views.subscriber_import_progress, name='import_progress'),
+    path('<int:pk>/subscribers/import/csv/<int:import_pk>/resume/', views.resume_subscriber_import, name='import_resume'),
     path('<int:pk>/subscribers/import/csv/<int:import_pk>/download/', views.download_subscriber_import, name='download_subscriber_import'),
     path('<int:pk>/subscribers/import/csv/<int:import_pk>/delete/', views.SubscriberImportDeleteView.as_view(), name='delete_subscriber_import'),
     path('<int:pk>/subscribers/import/paste/', views.PasteEmailsImportSubscribersView.as_view(), name='paste_import_subscribers'),
+    path('<int:pk>/subscribers/export/', views.ExportSubscribersView.as_view(), name='export_subscribers'),
+    path('<int:pk>/subscribers/export/<str:file_name>/', views.download_subscribers_export, name='download_subscribers_export'),
     path('<int:pk>/subscribers/<int:subscriber_pk>/', views.SubscriberDetailView.as_view(), name='subscriber'),
     path('<int:pk>/subscribers/<int:subscriber_pk>/edit/', views.SubscriberUpdateView.as_view(), name='edit_subscriber'),
     path('<int:pk>/subscribers/<int:subscriber_pk>/delete/', views.SubscriberDeleteView.as_view(), name='delete_subscriber'),
@@ -30,6 +34,12 @@ urlpatterns = [
     path('<int:pk>/tags/<int:tag_pk>/edit/', views.TagUpdateView.as_view(), name='edit_tag'),
     path('<int:pk>/tags/<int:tag_pk>/delete/', views.TagDeleteView.as_view(), name='delete_tag'),
 
+    path('<int:pk>/segments/', views.SegmentListView.as_view(), name='segments'),
+    path('<int:pk>/segments/add/', views.SegmentCreateView.as_view(), name='new_segment'),
+    path('<int:pk>/segments/<int:segment_pk>/edit/', views.SegmentUpdateView.as_view(), name='edit_segment'),
+    path('<int:pk>/segments/<int:segment_pk>/refresh/', views.refresh_segment, name='refresh_segment'),
+    path('<int:pk>/segments/<int:segment_pk>/delete/', views.SegmentDeleteView.as_view(), name='delete_segment'),
+
     path('<int:pk>/forms/', views.SubscriptionFormsView.as_view(), name='subscription_forms'),
     path('<int:pk>/forms/editor/', views.FormsEditorView.as_view(), name='forms_editor'),
     path('<int:pk>/forms/editor/design/', views.CustomizeDesignView.as_view(), name='customize_design'),
@@ -1,7 +1,61 @@
+import csv
+import os
+import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db.models import Q
 
 import pytz
 
+_subscribers_count_state = threading.local()
+
+DIALECT_ATTRIBUTES = (
+    'delimiter', 'quotechar', 'escapechar', 'doublequote', 'skipinitialspace', 'lineterminator', 'quoting'
+)
+
+
+# Validation rules of the imported values, written as regular expressions valid both in Python and in
+# PostgreSQL, so the ORM and the COPY import engines accept exactly the same values.
+IMPORT_EMAIL_PATTERN = r'^[^@\s]+@[^@\s.]+(\.[^@\s.]+)+$'
+
+IMPORT_DATE_PATTERN = r'^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2} [0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}$'
+
+_IPV4_OCTET = '(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+_IPV4 = r'(%s\.){3}%s' % (_IPV4_OCTET, _IPV4_OCTET)
+_IPV6_GROUP = '[0-9a-f]{1,4}'
+
+
+def _build_ipv6_pattern() -> str:
+    """
+    Match the IPv6 addresses, compressed (with "::") or not, optionally ending
+    with an embedded IPv4 address. Case insensitive.
+    """
+    alternatives = ['(%s:){7}%s' % (_IPV6_GROUP, _IPV6_GROUP), '(%s:){6}%s' % (_IPV6_GROUP, _IPV4)]
+    for groups, tail in ((8, ''), (6, _IPV4)):
+        # "::" stands for at least one group, so at most `groups - 1` are written around it
+        for left in range(groups):
+            if left > 1:
+                left_part = '(%s:){%s}%s' % (_IPV6_GROUP, left - 1, _IPV6_GROUP)
+            else:
+                left_part = _IPV6_GROUP * left
+            right_max = groups - 1 - left
+            if tail:
+                right_part = '(%s:){0,%s}' % (_IPV6_GROUP, right_max) if right_max else ''
+            else:
+                right_part = '(%s(:%s){0,%s})?' % (_IPV6_GROUP, _IPV6_GROUP, right_max - 1) if right_max else ''
+            alternatives.append(left_part + '::' + right_part + tail)
+    return '^(%s)$' % '|'.join(alternatives)
+
+
+IMPORT_IPV4_PATTERN = '^%s$' % _IPV4
+
+IMPORT_IPV6_PATTERN = _build_ipv6_pattern()
+
 
 def convert_date(str_date: str) -> datetime:
     date = datetime.strptime(str_date.strip(), '%Y-%m-%d %H:%M:%S')
@@ -13,9 +67,212 @@ def normalize_email(email: str) -> str:
     return Subscriber.objects.normalize_email(email)
 
 
+def parse_email(email: str) -> str:
+    """
+    :raises ValueError: If the normalized email address is invalid
+    """
+    email = normalize_email(email)
+    if not re.match(IMPORT_EMAIL_PATTERN, email):
+        raise ValueError('Invalid email address "%s".' % email)
+    return email
+
+
+def parse_ip_address(ip_address: str) -> Optional[str]:
+    """
+    Normalize the text of an IP address. Invalid addresses are discarded
+    (None) instead of failing the whole row.
+    """
+    ip_address = normalize_text(ip_address)
+    if re.match(IMPORT_IPV4_PATTERN, ip_address) or re.match(IMPORT_IPV6_PATTERN, ip_address, re.IGNORECASE):
+        return ip_address
+    return None
+
+
 def normalize_text(text: str) -> str:
     if text is None:
         return ''
     text = str(text)
     text = ' '.join(text.split())
     return text
+
+
+def sniff_dialect(sample: str) -> Type[csv.Dialect]:
+    return csv.Sniffer().sniff(sample)
+
+
+def dialect_to_dict(dialect: Type[csv.Dialect]) -> Dict:
+    return {attribute: getattr(dialect, attribute) for attribute in DIALECT_ATTRIBUTES}
+
+
+def dialect_from_dict(data: Dict) -> Type[csv.Dialect]:
+    return type('StoredDialect', (csv.Dialect,), dict(data))
+
+
+def iter_csv_rows(path: str,
+                  byte_offset: int = 0,
+                  skip_header: bool = True,
+                  dialect: Optional[Type[csv.Dialect]] = None,
+                  end_offset: Optional[int] = None) -> Iterator[Tuple[List[str], int]]:
+    """
+    Read a CSV file, yielding each row along with the position in the file
+    right after it. Passing that position back as `byte_offset` resumes the
+    reading from the following row. The header is only skipped when reading
+    from the beginning of the file. The dialect is sniffed from the beginning
+    of the file if not informed. If `end_offset` is informed, the reading
+    stops at the first row ending at or after it.
+
+    The file is read in binary mode line by line (a quoted value may span
+    many lines), so the position can be taken from the file itself instead
+    of relying on the character count of the decoded text.
+    """
+    with open(path, 'rb') as csvfile:
+        if dialect is None:
+            dialect = sniff_dialect(csvfile.read(1024).decode('utf-8', errors='ignore'))
+        csvfile.seek(byte_offset)
+        lines = (line.decode('utf-8') for line in iter(csvfile.readline, b''))
+        reader = csv.reader(lines, dialect)
+        if byte_offset == 0 and skip_header:
+            next(reader, None)
+        for row in reader:
+            position = csvfile.tell()
+            yield row, position
+            if end_offset is not None and position >= end_offset:
+                return
+
+
+def split_byte_ranges(path: str, parts: int, byte_offset: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split a file, from `byte_offset` to its end, in up to `parts` ranges of
+    roughly the same size. Each range ends right after a newline so every
+    range starts at the beginning of a line.
+
+    Note that a quoted CSV value spanning many lines may still be cut in two,
+    so callers must make sure the file has one row per line (see
+    `count_lines`) before parsing the ranges separately.
+    """
+    size = os.path.getsize(path)
+    boundaries = [byte_offset]
+    with open(path, 'rb') as file:
+        for index in range(1, parts):
+            position = byte_offset + (size - byte_offset) * index // parts
+            if position <= boundaries[-1]:
+                continue
+            file.seek(position - 1)
+            file.readline()
+            boundary = file.tell()
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def count_lines(path: str, byte_offset: int = 0) -> int:
+    """
+    Count the lines of a file from `byte_offset` to its end, including a last
+    line without a trailing newline, without decoding it.
+    """
+    lines = 0
+    last_byte = b'\n'
+    with open(path, 'rb') as file:
+        file.seek(byte_offset)
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+            last_byte = block[-1:]
+    return lines if last_byte == b'\n' else lines + 1
+
+
+def get_email_column(headings: List[str]) -> Optional[int]:
+    """
+    Guess which column holds the email address from the CSV headings, e.g.
+    "Email", "E-mail", "email_address" or "Subscriber Email".
+    """
+    keys = [normalize_text(heading).lower().replace('-', '').replace('_', '').replace(' ', '') for heading in headings]
+    for index, key in enumerate(keys):
+        if key in ('email', 'emailaddress'):
+            return index
+    for index, key in enumerate(keys):
+        if 'email' in key:
+            return index
+    return None
+
+
+def build_csv_manifest(path: str, preview_size: int = 10, sample_size: int = 10000) -> Dict:
+    """
+    Read a CSV file once and describe it: the sniffed dialect, the headings,
+    the number of rows (including the header), the first `preview_size` rows
+    and, for the first `sample_size` rows, how many emails are invalid or
+    repeated. The email column is guessed from the headings.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as csvfile:
+        dialect = sniff_dialect(csvfile.read(1024))
+        csvfile.seek(0)
+        reader = csv.reader(csvfile, dialect)
+        headings = next(reader, [])
+        email_column = get_email_column(headings)
+        preview = list()
+        seen_emails = set()
+        invalid_emails = 0
+        duplicate_emails = 0
+        size = 1 if headings else 0
+        for index, row in enumerate(reader):
+            size += 1
+            if index < preview_size:
+                preview.append(row)
+            if email_column is not None and index < sample_size:
+                email = row[email_column].strip() if email_column < len(row) else ''
+                try:
+                    validate_email(email)
+                except ValidationError:
+                    invalid_emails += 1
+                    continue
+                email_key = email.upper()
+                if email_key in seen_emails:
+                    duplicate_emails += 1
+                else:
+                    seen_emails.add(email_key)
+
+    return {
+        'dialect': dialect_to_dict(dialect),
+        'headings': headings,
+        'size': size,
+        'preview': preview,
+        'email_column': email_column,
+        'sample_size': min(max(size - 1, 0), sample_size) if email_column is not None else 0,
+        'invalid_emails': invalid_emails,
+        'duplicate_emails': duplicate_emails,
+    }
+
+
+def get_subscribers_search_filter(query: str) -> Q:
+    """
+    Match the subscribers whose email or name contain the `query`. On
+    PostgreSQL, the substring searches are backed by trigram indexes.
+    """
+    return Q(email__icontains=query) | Q(name__icontains=query)
+
+
+def is_subscribers_count_suspended(mailing_list_id: int) -> bool:
+    suspended = getattr(_subscribers_count_state, 'suspended', None)
+    return bool(suspended and suspended.get(mailing_list_id))
+
+
+@contextmanager
+def suspend_subscribers_count(mailing_list):
+    """
+    Stop `Subscriber.save` from adjusting the subscribers count of a mailing
+    list for every status change within the block, and recount the active
+    subscribers once at the end instead. Meant for code changing the status of
+    many subscribers in a loop. Blocks may be nested; the count is only
+    updated when the outermost one exits.
+    """
+    if getattr(_subscribers_count_state, 'suspended', None) is None:
+        _subscribers_count_state.suspended = dict()
+    suspended = _subscribers_count_state.suspended
+    suspended[mailing_list.pk] = suspended.get(mailing_list.pk, 0) + 1
+    try:
+        yield mailing_list
+    finally:
+        suspended[mailing_list.pk] -= 1
+        if not suspended[mailing_list.pk]:
+            del suspended[mailing_list.pk]
+            mailing_list.update_subscribers_count()
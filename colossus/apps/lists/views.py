@@ -4,40 +4,52 @@ from typing import Any, Dict
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Count, Q
+from django.db.models import Count, ProtectedError, Q, Sum
+from django.db.models.functions import Coalesce
 from django.forms import modelform_factory
-from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.http import (
+    FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext, gettext_lazy as _
+from django.views.decorators.http import require_POST
 from django.views.generic import (
     CreateView, DeleteView, DetailView, FormView, ListView, TemplateView,
     UpdateView, View,
 )
 
 from colossus.apps.core.models import Country
+from colossus.apps.subscribers.activities import render_activities
 from colossus.apps.subscribers.constants import (
     ActivityTypes, Status, TemplateKeys, Workflows,
 )
 from colossus.apps.subscribers.models import (
-    Activity, Subscriber, SubscriptionFormTemplate, Tag,
+    AudienceBitmap, Segment, Subscriber, SubscriptionFormTemplate, Tag,
 )
 from colossus.apps.subscribers.subscription_settings import (
     SUBSCRIPTION_FORM_TEMPLATE_SETTINGS,
 )
+from colossus.apps.subscribers.tasks import refresh_segment_members
+from colossus.pagination import InvalidCursor, KeysetPaginator
+from colossus.storage import PrivateMediaStorage
 from colossus.utils import get_absolute_url, is_uuid
 
 from .charts import (
     ListDomainsChart, ListLocationsChart, SubscriptionsSummaryChart,
 )
+from .constants import ImportStatus
+from .exports import get_subscribers_export_name
 from .forms import (
-    ConfirmSubscriberImportForm, MailingListSMTPForm,
-    PasteImportSubscribersForm,
+    ConfirmSubscriberImportForm, ExportSubscribersForm, MailingListSMTPForm,
+    PasteImportSubscribersForm, SegmentForm,
 )
 from .mixins import FormTemplateMixin, MailingListMixin
 from .models import MailingList, SubscriberImport
+from .tasks import import_subscribers
+from .utils import get_subscribers_search_filter
 
 
 @method_decorator(login_required, name='dispatch')
@@ -83,12 +95,12 @@ class MailingListDetailView(DetailView):
             .annotate(total=Count('domain__name')) \
             .order_by('-total')[:10]
 
-        thirty_days_ago = timezone.now() - datetime.timedelta(30)
-        subscribed_expression = Count('id', filter=Q(activity_type=ActivityTypes.SUBSCRIBED))
-        unsubscribed_expression = Count('id', filter=Q(activity_type=ActivityTypes.UNSUBSCRIBED))
-        cleaned_expression = Count('id', filter=Q(activity_type=ActivityTypes.CLEANED))
-        summary_last_30_days = Activity.objects \
-            .filter(subscriber__mailing_list=self.object, date__gte=thirty_days_ago) \
+        thirty_days_ago = timezone.localdate() - datetime.timedelta(29)
+        subscribed_expression = Coalesce(Sum('count', filter=Q(activity_type=ActivityTypes.SUBSCRIBED)), 0)
+        unsubscribed_expression = Coalesce(Sum('count', filter=Q(activity_type=ActivityTypes.UNSUBSCRIBED)), 0)
+        cleaned_expression = Coalesce(Sum('count', filter=Q(activity_type=ActivityTypes.CLEANED)), 0)
+        summary_last_30_days = self.object.daily_activities \
+            .filter(day__gte=thirty_days_ago) \
             .aggregate(subscribed=subscribed_expression,
                        unsubscribed=unsubscribed_expression,
                        cleaned=cleaned_expression)
@@ -135,13 +147,22 @@ class MailingListCountryReportView(MailingListMixin, DetailView):
 class SubscriberListView(MailingListMixin, ListView):
     model = Subscriber
     context_object_name = 'subscribers'
-    paginate_by = 100
+    subscribers_per_page = 100
     template_name = 'lists/subscriber_list.html'
 
     def get_context_data(self, **kwargs):
+        paginator = KeysetPaginator(self.object_list, ('optin_date', 'id'), self.subscribers_per_page)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404(_('Invalid page.'))
+        first_page_query = self.request.GET.copy()
+        first_page_query.pop('cursor', None)
         kwargs['submenu'] = 'subscribers'
-        kwargs['total_count'] = self.model.objects.count()
-        return super().get_context_data(**kwargs)
+        kwargs['subscribers_page'] = page
+        kwargs['first_page_querystring'] = first_page_query.urlencode()
+        kwargs['total_count'] = self.mailing_list.get_subscribers_total()
+        return super().get_context_data(object_list=page.object_list, **kwargs)
 
     def get_queryset(self):
         queryset = self.model.objects.filter(mailing_list_id=self.kwargs.get('pk'))
@@ -150,20 +171,56 @@ class SubscriberListView(MailingListMixin, ListView):
         if tags_filter:
             queryset = queryset.filter(tags__in=tags_filter)
 
+        segment_filter = self.request.GET.get('segment')
+        if segment_filter:
+            queryset = queryset.filter(segment_memberships__segment_id=segment_filter)
+
         if self.request.GET.get('q', ''):
             query = self.request.GET.get('q').strip()
 
             if is_uuid(query):
                 queryset = queryset.filter(uuid=query)
             else:
-                queryset = queryset.filter(Q(email__icontains=query) | Q(name__icontains=query))
+                queryset = queryset.filter(get_subscribers_search_filter(query))
 
             self.extra_context = {
                 'is_filtered': True,
                 'query': query
             }
 
-        return queryset.order_by('optin_date')
+        return queryset
+
+
+@method_decorator(login_required, name='dispatch')
+class ExportSubscribersView(MailingListMixin, FormView):
+    form_class = ExportSubscribersForm
+    template_name = 'lists/export_subscribers_form.html'
+    extra_context = {'title': _('Export Subscribers')}
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['mailing_list'] = self.mailing_list
+        return kwargs
+
+    def form_valid(self, form):
+        response = form.export(self.request.user)
+        if response is None:
+            messages.info(self.request, gettext('The export will be written in the background. You will be '
+                                                'notified once the file is ready.'))
+            return redirect('lists:subscribers', pk=self.mailing_list.pk)
+        return response
+
+
+@login_required
+def download_subscribers_export(request, pk, file_name):
+    mailing_list = get_object_or_404(MailingList, pk=pk)
+    if not file_name.startswith(get_subscribers_export_name(mailing_list)):
+        raise Http404
+    storage = PrivateMediaStorage()
+    name = 'exports/%s' % file_name
+    if not storage.exists(name):
+        raise Http404
+    return FileResponse(storage.open(name), as_attachment=True, filename=file_name)
 
 
 @method_decorator(login_required, name='dispatch')
@@ -186,6 +243,17 @@ class SubscriberDetailView(MailingListMixin, DetailView):
     pk_url_kwarg = 'subscriber_pk'
     template_name = 'lists/subscriber_detail.html'
     context_object_name = 'subscriber'
+    activities_per_page = 50
+
+    def get_context_data(self, **kwargs):
+        paginator = KeysetPaginator(self.object.get_activities(), ('-date', '-id'), self.activities_per_page)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404(_('Invalid page.'))
+        kwargs['activities'] = render_activities(page)
+        kwargs['activities_page'] = page
+        return super().get_context_data(**kwargs)
 
 
 @method_decorator(login_required, name='dispatch')
@@ -229,7 +297,15 @@ class PasteEmailsImportSubscribersView(MailingListMixin, FormView):
         try:
             mailing_list_id = self.kwargs.get('pk')
             mailing_list = MailingList.objects.only('pk').get(pk=mailing_list_id)
-            form.import_subscribers(mailing_list)
+            importer = form.import_subscribers(mailing_list, self.request.user)
+            if importer is None:
+                messages.info(self.request, gettext('The emails will be imported in the background. You will be '
+                                                    'notified once it is done.'))
+            else:
+                messages.success(self.request, gettext('%(created)s subscribers created and %(updated)s updated.') % {
+                    'created': importer.created,
+                    'updated': importer.updated
+                })
             return redirect('lists:subscribers', pk=mailing_list_id)
         except MailingList.DoesNotExist:
             raise Http404
@@ -276,9 +352,16 @@ class TagListView(TagMixin, MailingListMixin, ListView):
                 'query': query
             })
 
-        queryset = queryset.annotate(subscribers_count=Count('subscribers'))
         return queryset.order_by('name')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tags = context['tags'] = context['object_list'] = list(context['tags'])
+        cardinalities = AudienceBitmap.objects.get_tags_cardinalities(tags)
+        for tag in tags:
+            tag.subscribers_count = cardinalities[tag.pk]
+        return context
+
 
 @method_decorator(login_required, name='dispatch')
 class TagCreateView(TagMixin, MailingListMixin, CreateView):
@@ -314,6 +397,86 @@ class TagDeleteView(TagMixin, MailingListMixin, DeleteView):
         return reverse('lists:tags', kwargs={'pk': self.kwargs.get('pk')})
 
 
+class SegmentMixin:
+    model = Segment
+    extra_context = {'submenu': 'segments'}
+    pk_url_kwarg = 'segment_pk'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(mailing_list_id=self.kwargs.get('pk'))
+
+
+@method_decorator(login_required, name='dispatch')
+class SegmentListView(SegmentMixin, MailingListMixin, ListView):
+    context_object_name = 'segments'
+    paginate_by = 100
+    template_name = 'lists/segment_list.html'
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('name')
+
+
+@method_decorator(login_required, name='dispatch')
+class SegmentCreateView(SegmentMixin, MailingListMixin, CreateView):
+    form_class = SegmentForm
+    context_object_name = 'segment'
+    template_name = 'lists/segment_form.html'
+
+    def form_valid(self, form):
+        segment = form.save(commit=False)
+        segment.mailing_list_id = self.kwargs.get('pk')
+        segment.save()
+        refresh_segment_members.delay(segment.pk)
+        messages.success(self.request, _('Segment "%(name)s" created with success.') % form.cleaned_data)
+        return redirect('lists:segments', pk=self.kwargs.get('pk'))
+
+
+@method_decorator(login_required, name='dispatch')
+class SegmentUpdateView(SuccessMessageMixin, SegmentMixin, MailingListMixin, UpdateView):
+    form_class = SegmentForm
+    context_object_name = 'segment'
+    template_name = 'lists/segment_form.html'
+    success_message = _('Segment "%(name)s" updated with success.')
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        refresh_segment_members.delay(self.object.pk)
+        return response
+
+    def get_success_url(self):
+        return reverse('lists:segments', kwargs={'pk': self.kwargs.get('pk')})
+
+
+@method_decorator(login_required, name='dispatch')
+class SegmentDeleteView(SegmentMixin, MailingListMixin, DeleteView):
+    context_object_name = 'segment'
+    template_name = 'lists/segment_confirm_delete.html'
+
+    def get_context_data(self, **kwargs):
+        kwargs['unsent_campaigns'] = self.object.get_unsent_campaigns().order_by('name')
+        return super().get_context_data(**kwargs)
+
+    def delete(self, request, *args, **kwargs):
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ProtectedError:
+            messages.error(request, gettext('The segment "%s" is targeted by campaigns that were not sent yet. '
+                                            'Change their recipients before deleting it.') % self.object.name)
+            return redirect('lists:delete_segment', pk=self.kwargs.get('pk'), segment_pk=self.object.pk)
+
+    def get_success_url(self):
+        return reverse('lists:segments', kwargs={'pk': self.kwargs.get('pk')})
+
+
+@login_required
+@require_POST
+def refresh_segment(request, pk, segment_pk):
+    segment = get_object_or_404(Segment, pk=segment_pk, mailing_list_id=pk)
+    refresh_segment_members.delay(segment.pk)
+    messages.info(request, gettext('The segment "%s" is being refreshed.') % segment.name)
+    return redirect('lists:segments', pk=pk)
+
+
 @method_decorator(login_required, name='dispatch')
 class AbstractSettingsView(UpdateView):
     model = MailingList
@@ -446,7 +609,7 @@ class SubscriberImportView(MailingListMixin, CreateView):
         subscriber_import.user = self.request.user
         subscriber_import.mailing_list_id = mailing_list_id
         subscriber_import.save()
-        subscriber_import.set_size()
+        subscriber_import.build_manifest()
         return redirect('lists:import_preview', pk=mailing_list_id, import_pk=subscriber_import.pk)
 
 
@@ -471,6 +634,29 @@ class SubscriberImportQueuedView(MailingListMixin, DetailView):
     template_name = 'lists/import_queued.html'
     pk_url_kwarg = 'import_pk'
     context_object_name = 'subscriber_import'
+    extra_context = {'import_status': ImportStatus}
+
+
+@login_required
+def subscriber_import_progress(request, pk, import_pk):
+    subscriber_import = get_object_or_404(SubscriberImport, pk=import_pk, mailing_list_id=pk)
+    return JsonResponse(subscriber_import.get_progress())
+
+
+@login_required
+@require_POST
+def resume_subscriber_import(request, pk, import_pk):
+    subscriber_import = get_object_or_404(SubscriberImport, pk=import_pk, mailing_list_id=pk)
+    if subscriber_import.is_resumable:
+        subscriber_import.status = ImportStatus.QUEUED
+        subscriber_import.save(update_fields=['status'])
+        import_subscribers.delay(subscriber_import.pk)
+        messages.success(request, _('The import will resume from row %(rows)s.') % {
+            'rows': subscriber_import.rows_processed + 1
+        })
+    else:
+        messages.warning(request, _('This import cannot be resumed.'))
+    return redirect('lists:import_queued', pk=pk, import_pk=import_pk)
 
 
 @method_decorator(login_required, name='dispatch')
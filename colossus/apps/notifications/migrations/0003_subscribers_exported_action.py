@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_auto_20180825_0042'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='action',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Subscribers import completed'), (2, 'Subscribers import failed'), (3, 'Campaign sent'), (4, 'List cleaned'), (5, 'Subscribers export ready')], verbose_name='action'),
+        ),
+    ]
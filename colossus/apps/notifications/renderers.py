@@ -1,3 +1,4 @@
+from django.urls import reverse
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
@@ -41,3 +42,16 @@ def render_list_cleaned(notification):
     data['mailing_list_name'] = escape(mailing_list['name'])
     message = _('<strong>Cleaned</strong> %(cleaned)s emails from list %(mailing_list_name)s.') % data
     return mark_safe(message)
+
+
+def render_subscribers_exported(notification):
+    data = notification.data
+    mailing_list = MailingList.objects.values('id', 'name').get(pk=data['mailing_list_id'])
+    data['mailing_list_name'] = escape(mailing_list['name'])
+    data['url'] = reverse('lists:download_subscribers_export', kwargs={
+        'pk': data['mailing_list_id'],
+        'file_name': data['file_name']
+    })
+    message = _('<strong>Export ready.</strong> %(rows)s subscribers from list %(mailing_list_name)s were exported. '
+                '<a href="%(url)s">Download file</a>') % data
+    return mark_safe(message)
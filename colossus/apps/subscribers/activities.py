@@ -1,3 +1,5 @@
+from django.db.models import prefetch_related_objects
+
 from .constants import ActivityTypes
 
 SUBSCRIBED_TEMPLATE = '''
@@ -23,6 +25,12 @@ IMPORTED_TEMPLATE = '<small class="text-muted">%s</small> <strong>Imported</stro
 
 CLEANED_TEMPLATE = '<small class="text-muted">%s</small> <strong>Cleaned</strong> from the List.'
 
+DELIVERED_TEMPLATE = '''<small class="text-muted">%s</small> <strong>Was delivered</strong>
+                        the email <a href="%s">%s</a>.'''
+
+FAILED_TEMPLATE = '''<small class="text-muted">%s</small> <strong>Could not be delivered</strong>
+                     the email <a href="%s">%s</a>.'''
+
 
 def render_unsubscribe_activity(activity):
     if activity.campaign is not None:
@@ -33,6 +41,49 @@ def render_unsubscribe_activity(activity):
         return UNSUBSCRIBED_TEMPLATE % activity.get_formatted_date()
 
 
+RENDERERS = {
+    ActivityTypes.SUBSCRIBED: lambda a: SUBSCRIBED_TEMPLATE % (
+        a.subscriber.mailing_list.name,
+        a.get_formatted_date()
+    ),
+    ActivityTypes.UNSUBSCRIBED: render_unsubscribe_activity,
+    ActivityTypes.SENT: lambda a: SENT_TEMPLATE % (
+        a.get_formatted_date(),
+        a.email.campaign.get_absolute_url(),
+        a.email.campaign.name
+    ),
+    ActivityTypes.OPENED: lambda a: OPENED_TEMPLATE % (
+        a.get_formatted_date(),
+        a.email.campaign.get_absolute_url(),
+        a.email.campaign.name
+    ),
+    ActivityTypes.CLICKED: lambda a: CLICKED_TEMPLATE % (
+        a.get_formatted_date(),
+        a.link.url,
+        a.link.email.campaign.get_absolute_url(),
+        a.link.email.campaign.name
+    ),
+    ActivityTypes.IMPORTED: lambda a: IMPORTED_TEMPLATE % (
+        a.get_formatted_date(),
+        a.subscriber.mailing_list.name,
+    ),
+    ActivityTypes.CLEANED: lambda a: CLEANED_TEMPLATE % a.get_formatted_date(),
+    ActivityTypes.DELIVERED: lambda a: DELIVERED_TEMPLATE % (
+        a.get_formatted_date(),
+        a.email.campaign.get_absolute_url(),
+        a.email.campaign.name
+    ),
+    ActivityTypes.FAILED: lambda a: FAILED_TEMPLATE % (
+        a.get_formatted_date(),
+        a.email.campaign.get_absolute_url(),
+        a.email.campaign.name
+    ),
+}
+
+# Relations walked by the renderers above.
+RENDERERS_RELATED_LOOKUPS = ('subscriber__mailing_list', 'campaign', 'email__campaign', 'link__email__campaign')
+
+
 def render_activity(activity):
     """
     This module is responsible for defining the templates and the rendering
@@ -42,7 +93,7 @@ def render_activity(activity):
     Maybe not the winner of the best-engineering-solution-award, but that is what
     we have for the time being.
 
-    New keys are added to the `renderers` dict as needed. The key should
+    New keys are added to the `RENDERERS` dict as needed. The key should
     be the same string as defined on `Activity.activity_type` field. The value of
     the dict is an anonymous function (lambda function) that takes an Activity
     instance as argument (defined as `a`) and use its attributes and methods to
@@ -52,34 +103,21 @@ def render_activity(activity):
     The `html` output is used in the template to list the latest activities of the
     subscriber.
     """
-    renderers = {
-        ActivityTypes.SUBSCRIBED: lambda a: SUBSCRIBED_TEMPLATE % (
-            a.subscriber.mailing_list.name,
-            a.get_formatted_date()
-        ),
-        ActivityTypes.UNSUBSCRIBED: render_unsubscribe_activity,
-        ActivityTypes.SENT: lambda a: SENT_TEMPLATE % (
-            a.get_formatted_date(),
-            a.email.campaign.get_absolute_url(),
-            a.email.campaign.name
-        ),
-        ActivityTypes.OPENED: lambda a: OPENED_TEMPLATE % (
-            a.get_formatted_date(),
-            a.email.campaign.get_absolute_url(),
-            a.email.campaign.name
-        ),
-        ActivityTypes.CLICKED: lambda a: CLICKED_TEMPLATE % (
-            a.get_formatted_date(),
-            a.link.url,
-            a.link.email.campaign.get_absolute_url(),
-            a.link.email.campaign.name
-        ),
-        ActivityTypes.IMPORTED: lambda a: IMPORTED_TEMPLATE % (
-            a.get_formatted_date(),
-            a.subscriber.mailing_list.name,
-        ),
-        ActivityTypes.CLEANED: lambda a: CLEANED_TEMPLATE % a.get_formatted_date()
-    }
-    renderer = renderers[activity.activity_type]
+    renderer = RENDERERS[activity.activity_type]
     html = renderer(activity)
     return html
+
+
+def render_activities(activities):
+    """
+    Render a batch of activities (e.g. a page of the subscriber timeline).
+    The related objects used by the renderers are fetched in bulk, with one
+    query per relation for the whole batch instead of a few queries per
+    activity. The `html` is cached in the activities, so it can be accessed
+    via `Activity.as_html`.
+    """
+    activities = list(activities)
+    prefetch_related_objects(activities, *RENDERERS_RELATED_LOOKUPS)
+    for activity in activities:
+        activity.as_html  # renders and caches the html
+    return activities
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SubscribersConfig(AppConfig):
     name = 'colossus.apps.subscribers'
+
+    def ready(self):
+        import colossus.apps.subscribers.signals  # noqa F401
@@ -0,0 +1,57 @@
+"""
+Set algebra over the subscribers of a mailing list using the tag and status
+bitmaps (see `AudienceBitmap`), e.g. the subscribed members having the tags
+A and B but not C::
+
+    get_audience(mailing_list.pk, all_tags=[a, b], exclude_tags=[c])
+
+The result is a `RoaringBitmap` of primary keys: its length is the audience
+size, and `iter_audience_querysets` turns it back into subscribers, to export
+them or to send them a campaign (see `send_campaign`).
+"""
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+
+from colossus.apps.subscribers.constants import Status
+from colossus.apps.subscribers.models import AudienceBitmap
+from colossus.bitmaps import RoaringBitmap
+from colossus.utils import get_max_batch_size
+
+
+def get_audience(mailing_list_id: int,
+                 status: Optional[int] = Status.SUBSCRIBED,
+                 all_tags: Iterable = (),
+                 any_tags: Iterable = (),
+                 exclude_tags: Iterable = ()) -> RoaringBitmap:
+    """
+    :param status: Keep only the subscribers with this status. If None, the
+    subscribers of all statuses are considered.
+    :param all_tags: Keep only the subscribers having all these tags
+    :param any_tags: Keep only the subscribers having at least one of these tags
+    :param exclude_tags: Remove the subscribers having any of these tags
+    """
+    statuses = [status] if status is not None else [choice for choice, label in Status.CHOICES]
+    audience = RoaringBitmap.union(*[
+        AudienceBitmap.objects.get_status_bitmap(mailing_list_id, value) for value in statuses
+    ])
+    for tag in all_tags:
+        audience = audience & AudienceBitmap.objects.get_tag_bitmap(tag)
+    any_tags = list(any_tags)
+    if any_tags:
+        audience = audience & RoaringBitmap.union(*[AudienceBitmap.objects.get_tag_bitmap(tag) for tag in any_tags])
+    for tag in exclude_tags:
+        audience = audience - AudienceBitmap.objects.get_tag_bitmap(tag)
+    return audience
+
+
+def iter_audience_querysets(queryset: QuerySet, audience: RoaringBitmap, batch_size: int = None) -> Iterator[QuerySet]:
+    """
+    Split the `queryset` into querysets of at most `batch_size` subscribers
+    of the `audience`, in ascending primary key order. The batches are kept
+    within the database's limit of query parameters.
+    """
+    batch_size = get_max_batch_size(batch_size or settings.COLOSSUS_EXPORT_CHUNK_SIZE)
+    for pks in audience.chunks(batch_size):
+        yield queryset.filter(pk__in=pks)
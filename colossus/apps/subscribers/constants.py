@@ -39,6 +39,8 @@ class ActivityTypes:
     CLICKED = 5
     IMPORTED = 6
     CLEANED = 7
+    DELIVERED = 8
+    FAILED = 9
 
     LABELS = {
         SUBSCRIBED: _('Subscribed'),
@@ -48,6 +50,20 @@ class ActivityTypes:
         CLICKED: _('Clicked'),
         IMPORTED: _('Imported'),
         CLEANED: _('Cleaned'),
+        DELIVERED: _('Was delivered'),
+        FAILED: _('Delivery failed'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+
+class ArchiveFormats:
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+    LABELS = {
+        CSV: _('CSV'),
+        JSONL: _('JSON Lines'),
     }
 
     CHOICES = tuple(LABELS.items())
@@ -113,3 +129,76 @@ class TemplateKeys:
     }
 
     CHOICES = tuple(LABELS.items())
+
+
+class SegmentMatch:
+    ALL = 1
+    ANY = 2
+
+    LABELS = {
+        ALL: _('Subscribers matching all the conditions'),
+        ANY: _('Subscribers matching any of the conditions'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+
+class SegmentFields:
+    TAGS = 'tags'
+    DOMAIN = 'domain'
+    CITY = 'city'
+    COUNTRY = 'country'
+    OPEN_RATE = 'open_rate'
+    CLICK_RATE = 'click_rate'
+    LAST_SEEN_DATE = 'last_seen_date'
+    OPTIN_DATE = 'optin_date'
+
+    LABELS = {
+        TAGS: _('Tags'),
+        DOMAIN: _('Email domain'),
+        CITY: _('City'),
+        COUNTRY: _('Country'),
+        OPEN_RATE: _('Open rate'),
+        CLICK_RATE: _('Click rate'),
+        LAST_SEEN_DATE: _('Last seen date'),
+        OPTIN_DATE: _('Opt-in date'),
+    }
+
+    OPERATORS = {
+        TAGS: ('in', 'not_in'),
+        DOMAIN: ('in', 'not_in'),
+        CITY: ('in', 'not_in'),
+        COUNTRY: ('in', 'not_in'),
+        OPEN_RATE: ('gte', 'lte'),
+        CLICK_RATE: ('gte', 'lte'),
+        LAST_SEEN_DATE: ('before', 'after', 'within_days', 'not_within_days'),
+        OPTIN_DATE: ('before', 'after', 'within_days', 'not_within_days'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+
+class SuppressionReasons:
+    BOUNCED = 1
+    COMPLAINED = 2
+    UNSUBSCRIBED = 3
+    MANUAL = 4
+
+    LABELS = {
+        BOUNCED: _('Hard bounce'),
+        COMPLAINED: _('Spam complaint'),
+        UNSUBSCRIBED: _('Unsubscribed from all lists'),
+        MANUAL: _('Manually suppressed'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+
+class WebhookProviders:
+    MAILGUN = 'mailgun'
+
+    LABELS = {
+        MAILGUN: _('Mailgun'),
+    }
+
+    CHOICES = tuple(LABELS.items())
@@ -0,0 +1,247 @@
+"""
+Fold the message events reported by Mailgun (deliveries, permanent failures,
+opens and clicks) into the subscribers' activities.
+
+The campaign emails carry the uuids of the email and of the subscriber in the
+`X-Mailgun-Variables` header (see `send_campaign_email`), which Mailgun hands
+back as the `user-variables` of each event. A batch of events is resolved
+with one query per related table and saved with a single `bulk_create`. The
+Mailgun event id is kept in `Activity.external_id`, so an event read twice is
+only recorded once.
+
+Opens and clicks are tracked by Colossus itself as well, so the ones reported
+by Mailgun are only recorded when Colossus has no record of them, e.g. when
+the tracking pixel was blocked.
+"""
+import datetime
+import re
+import time
+import uuid
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from colossus.apps.campaigns.models import Email, Link
+from colossus.apps.core.mailgun import Mailgun
+from colossus.apps.core.models import Option
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Subscriber,
+)
+from colossus.apps.subscribers.tasks import update_rates_after_events
+
+MAILGUN_EVENTS_TYPES = {
+    'delivered': ActivityTypes.DELIVERED,
+    'failed': ActivityTypes.FAILED,
+    'opened': ActivityTypes.OPENED,
+    'clicked': ActivityTypes.CLICKED,
+}
+
+CHECKPOINT_OPTION_KEY = 'mailgun_events_checkpoint'
+
+TRACK_CLICK_PATH_RE = re.compile(r'/track/click/(?P<uuid>[0-9a-f-]{36})/')
+
+
+def get_checkpoint() -> Optional[float]:
+    """
+    Timestamp up to which the Mailgun events were ingested, if any.
+    """
+    value = Option.objects.filter(key=CHECKPOINT_OPTION_KEY).values_list('value', flat=True).first()
+    return float(value) if value else None
+
+
+def set_checkpoint(timestamp: float):
+    Option.objects.update_or_create(key=CHECKPOINT_OPTION_KEY, defaults={'value': repr(float(timestamp))})
+
+
+def parse_uuid(value) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _get_link_uuid(url: str) -> Optional[uuid.UUID]:
+    match = TRACK_CLICK_PATH_RE.search(url)
+    return parse_uuid(match.group('uuid')) if match is not None else None
+
+
+def build_activities(events: Iterable[Dict]) -> List[Activity]:
+    """
+    Turn the `events` into unsaved activities. The events which can't be
+    traced back to a campaign email, or which were already recorded, are
+    skipped.
+    """
+    parsed = list()
+    for event in events:
+        activity_type = MAILGUN_EVENTS_TYPES.get(event.get('event'))
+        if activity_type is None or not event.get('id'):
+            continue
+        if activity_type == ActivityTypes.FAILED and event.get('severity') != 'permanent':
+            # Temporary failures are retried by Mailgun
+            continue
+        variables = event.get('user-variables') or dict()
+        email_uuid = parse_uuid(variables.get('colossus_email'))
+        subscriber_uuid = parse_uuid(variables.get('colossus_subscriber'))
+        if email_uuid is not None and subscriber_uuid is not None:
+            parsed.append((event, activity_type, email_uuid, subscriber_uuid))
+    if not parsed:
+        return list()
+
+    recorded = set(Activity.objects.filter(
+        external_id__in={event['id'] for event, activity_type, email_uuid, subscriber_uuid in parsed}
+    ).values_list('external_id', flat=True))
+    emails = {
+        email_uuid: email_id for email_uuid, email_id in Email.objects.filter(
+            uuid__in={email_uuid for event, activity_type, email_uuid, subscriber_uuid in parsed}
+        ).values_list('uuid', 'pk')
+    }
+    subscribers = {
+        subscriber_uuid: (subscriber_id, location_id) for subscriber_uuid, subscriber_id, location_id in
+        Subscriber.objects.filter(
+            uuid__in={subscriber_uuid for event, activity_type, email_uuid, subscriber_uuid in parsed}
+        ).values_list('uuid', 'pk', 'location_id')
+    }
+
+    # Clicks are matched either by the Colossus tracking URL or by the URL of the link
+    clicked_urls = [event.get('url') or '' for event, activity_type, email_uuid, subscriber_uuid in parsed
+                    if activity_type == ActivityTypes.CLICKED]
+    links_by_uuid = dict()
+    links_by_url = dict()
+    if clicked_urls:
+        links_uuids = {_get_link_uuid(url) for url in clicked_urls} - {None}
+        links_by_uuid = {
+            link_uuid: (email_id, link_id) for link_uuid, email_id, link_id in
+            Link.objects.filter(uuid__in=links_uuids).values_list('uuid', 'email_id', 'pk')
+        }
+        links_by_url = {
+            (email_id, url): link_id for email_id, url, link_id in
+            Link.objects.filter(email_id__in=emails.values(), url__in=set(clicked_urls)).values_list(
+                'email_id', 'url', 'pk'
+            )
+        }
+
+    # Opens and clicks Colossus already knows of, keyed by (type, subscriber, email, link)
+    tracked = {
+        (activity_type, subscriber_id, email_id, link_id if activity_type == ActivityTypes.CLICKED else None)
+        for activity_type, subscriber_id, email_id, link_id in Activity.objects.filter(
+            activity_type__in=(ActivityTypes.OPENED, ActivityTypes.CLICKED),
+            subscriber_id__in=[subscriber_id for subscriber_id, location_id in subscribers.values()],
+            email_id__in=emails.values(),
+        ).values_list('activity_type', 'subscriber_id', 'email_id', 'link_id')
+    }
+
+    activities = list()
+    for event, activity_type, email_uuid, subscriber_uuid in parsed:
+        if event['id'] in recorded or email_uuid not in emails or subscriber_uuid not in subscribers:
+            continue
+        email_id = emails[email_uuid]
+        subscriber_id, location_id = subscribers[subscriber_uuid]
+        activity = Activity(
+            activity_type=activity_type,
+            subscriber_id=subscriber_id,
+            email_id=email_id,
+            date=datetime.datetime.fromtimestamp(event['timestamp'], tz=timezone.utc),
+            external_id=event['id']
+        )
+        if activity_type in (ActivityTypes.OPENED, ActivityTypes.CLICKED):
+            if activity_type == ActivityTypes.CLICKED:
+                url = event.get('url') or ''
+                link_email_id, activity.link_id = links_by_uuid.get(_get_link_uuid(url), (None, None))
+                if link_email_id != email_id:
+                    activity.link_id = links_by_url.get((email_id, url))
+                if activity.link_id is None:
+                    continue
+            key = (activity_type, subscriber_id, email_id, activity.link_id)
+            if key in tracked:
+                continue
+            tracked.add(key)
+            activity.ip_address = event.get('ip') or None
+            activity.location_id = location_id
+        elif activity_type == ActivityTypes.FAILED:
+            activity.description = (event.get('delivery-status') or dict()).get('message') or ''
+        recorded.add(event['id'])
+        activities.append(activity)
+    return activities
+
+
+def ingest_events(events: Iterable[Dict], checkpoint: Optional[float] = None) -> int:
+    """
+    Record a batch of Mailgun events in a single transaction. If informed, the
+    `checkpoint` is saved in the same transaction, so it only moves forward
+    once the activities are committed.
+
+    :return: Number of activities created
+    """
+    events = list(events)
+    with transaction.atomic():
+        # Serialize the ingesters, so the same event is never inserted twice
+        Option.objects.select_for_update().get_or_create(key=CHECKPOINT_OPTION_KEY)
+        activities = build_activities(events)
+        Activity.objects.bulk_create(activities)
+        if activities:
+            mailing_lists = dict(
+                Subscriber.objects.filter(pk__in={activity.subscriber_id for activity in activities})
+                .values_list('pk', 'mailing_list_id')
+            )
+            campaigns = dict(
+                Email.objects.filter(pk__in={activity.email_id for activity in activities})
+                .values_list('pk', 'campaign_id')
+            )
+            counts = Counter(
+                (mailing_lists[activity.subscriber_id], campaigns[activity.email_id],
+                 timezone.localdate(activity.date), activity.activity_type)
+                for activity in activities
+            )
+            for (mailing_list_id, campaign_id, day, activity_type), count in counts.items():
+                DailyActivity.objects.increment(mailing_list_id, campaign_id, day, activity_type, count)
+        if checkpoint is not None:
+            set_checkpoint(checkpoint)
+
+    engagement = [activity for activity in activities
+                  if activity.activity_type in (ActivityTypes.OPENED, ActivityTypes.CLICKED)]
+    if engagement:
+        update_rates_after_events.delay(
+            sorted({activity.subscriber_id for activity in engagement}),
+            sorted({activity.email_id for activity in engagement}),
+            sorted({activity.link_id for activity in engagement if activity.link_id is not None})
+        )
+    return len(activities)
+
+
+def poll_mailgun_events(batch_size: int = 300) -> int:
+    """
+    Read the Mailgun events since the last checkpoint, one batch at a time.
+    Mailgun may still add events with a past timestamp for a while, so only
+    the events older than `MAILGUN_EVENTS_SETTLE_TIME` seconds are read.
+
+    :return: Number of activities created
+    """
+    now = time.time()
+    begin = get_checkpoint()
+    if begin is None:
+        begin = now - settings.MAILGUN_EVENTS_INITIAL_LOOKBACK
+    end = now - settings.MAILGUN_EVENTS_SETTLE_TIME
+    if begin >= end:
+        return 0
+    params = {
+        'begin': begin,
+        'end': end,
+        'ascending': 'yes',
+        'event': ' OR '.join(MAILGUN_EVENTS_TYPES.keys()),
+    }
+    events = Mailgun().events(params, limit=batch_size)
+    activities_count = 0
+    while True:
+        batch = list(islice(events, batch_size))
+        if not batch:
+            break
+        checkpoint = max(event['timestamp'] for event in batch)
+        activities_count += ingest_events(batch, checkpoint)
+    # Every event up to `end` was read, even if the last batches were empty
+    set_checkpoint(end)
+    return activities_count
@@ -4,3 +4,7 @@ class FormTemplateIsNotEmail(Exception):
 
 class FormTemplateIsNotForm(Exception):
     pass
+
+
+class InvalidSegmentFilter(Exception):
+    pass
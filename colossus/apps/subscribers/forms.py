@@ -46,10 +46,8 @@ class SubscribeForm(forms.ModelForm):
 
         email_name, domain_part = email.rsplit('@', 1)
         domain_name = '@' + domain_part
-        email_domain, created = Domain.objects.get_or_create(name=domain_name)
-
         subscriber, created = Subscriber.objects.get_or_create(email=email, mailing_list=self.mailing_list, defaults={
-            'domain': email_domain
+            'domain_id': Domain.objects.get_pk(domain_name)
         })
         subscriber.status = Status.PENDING
         subscriber.optin_ip_address = get_client_ip(request)
@@ -0,0 +1,70 @@
+"""
+Expression indexes that can't be declared using Django's `Meta.indexes`.
+
+Django's PostgreSQL backend translates case-insensitive lookups such as
+`email__iexact` into `UPPER("email"::text) = UPPER(...)`, which can only use
+an index built on the very same expression. Those indexes are PostgreSQL only;
+on other databases the functions below do nothing.
+
+The same goes for `email__icontains`, translated into
+`UPPER("email"::text) LIKE UPPER('%...%')`: a trigram GIN index on that
+expression lets PostgreSQL answer substring searches without a sequential
+scan. The trigram operator class comes from the `pg_trgm` extension, which is
+created along with the indexes that need it. Creating an extension usually
+requires superuser rights: without them, the trigram indexes are skipped with
+a warning. The searches still work, only without an index; once a superuser
+ran `CREATE EXTENSION pg_trgm`, the indexes can be created with the statements
+below.
+
+The indexes are referenced by name from the migrations, so new entries can be
+added here without changing what the older migrations create.
+"""
+import logging
+from typing import Dict
+
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+EXPRESSION_INDEXES: Dict[str, str] = {
+    'colossus_sub_upper_email_idx': 'CREATE INDEX IF NOT EXISTS colossus_sub_upper_email_idx '
+                                    'ON colossus_subscribers (mailing_list_id, UPPER(email::text))',
+    'colossus_sub_email_trgm_idx': 'CREATE INDEX IF NOT EXISTS colossus_sub_email_trgm_idx '
+                                   'ON colossus_subscribers USING gin (UPPER(email::text) gin_trgm_ops)',
+    'colossus_sub_name_trgm_idx': 'CREATE INDEX IF NOT EXISTS colossus_sub_name_trgm_idx '
+                                  'ON colossus_subscribers USING gin (UPPER(name::text) gin_trgm_ops)',
+}
+
+INDEX_EXTENSIONS: Dict[str, str] = {
+    'colossus_sub_email_trgm_idx': 'pg_trgm',
+    'colossus_sub_name_trgm_idx': 'pg_trgm',
+}
+
+
+def create_extension(schema_editor, extension: str) -> bool:
+    """
+    :return: False if the extension doesn't exist and can't be created, e.g.
+    because the database user isn't a superuser
+    """
+    try:
+        # The savepoint keeps the migration's transaction usable after an error
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS %s' % extension)
+    except DatabaseError as error:
+        logger.warning('Could not create the "%s" PostgreSQL extension: %s', extension, error)
+        return False
+    return True
+
+
+def create_expression_index(schema_editor, name: str):
+    if schema_editor.connection.vendor == 'postgresql':
+        extension = INDEX_EXTENSIONS.get(name)
+        if extension is not None and not create_extension(schema_editor, extension):
+            logger.warning('Skipped the index "%s", which requires the "%s" extension.', name, extension)
+            return
+        schema_editor.execute(EXPRESSION_INDEXES[name])
+
+
+def drop_expression_index(schema_editor, name: str):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % schema_editor.quote_name(name))
@@ -0,0 +1,178 @@
+"""
+Bulk resolution of the location of the subscribers and of their activities,
+used by the `updatelocation` command.
+
+The IP addresses are deduplicated before any lookup, so each address is
+looked up once however many rows share it. The lookups in the GeoLite2
+database are CPU bound and independent of each other, so they can be spread
+over a pool of processes. The workers only read the GeoIP database and hand
+back the raw country/city names: the matching `Country` and `City` rows are
+fetched or created by the parent process, through the shared `GeoIPLocator`.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.contrib.gis.geoip2 import GeoIP2
+from django.db.models import QuerySet
+from django.db.models.functions import Coalesce
+
+from geoip2.errors import AddressNotFoundError
+
+from colossus.apps.subscribers.models import Activity, Subscriber
+from colossus.utils import get_geoip_locator, get_max_batch_size
+
+# (ip address, country code, country name, city name)
+GeoData = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+_geoip2 = None
+_geoip2_pid = None
+
+
+def get_geoip2() -> GeoIP2:
+    """
+    Return the GeoIP2 reader of the current process. Forked workers open the
+    database again instead of sharing the file handle of the parent.
+    """
+    global _geoip2, _geoip2_pid
+    if _geoip2 is None or _geoip2_pid != os.getpid():
+        _geoip2, _geoip2_pid = GeoIP2(), os.getpid()
+    return _geoip2
+
+
+def lookup_ip_addresses(ip_addresses: List[str]) -> List[GeoData]:
+    """
+    Look up the country and city of the `ip_addresses` in the GeoIP database.
+    Runs in the worker processes, so it doesn't touch the database.
+    """
+    geoip2 = get_geoip2()
+    results = list()
+    for ip_address in ip_addresses:
+        try:
+            geodata = geoip2.city(ip_address)
+        except AddressNotFoundError:
+            results.append((ip_address, None, None, None))
+        else:
+            results.append((ip_address, geodata.get('country_code'), geodata.get('country_name'), geodata.get('city')))
+    return results
+
+
+def chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk = list()
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+def get_subscribers_queryset(update_all: bool = False) -> QuerySet:
+    """
+    Subscribers with a known IP address, annotated with the address used to
+    locate them: the last seen one, or else the one they confirmed from.
+    """
+    queryset = Subscriber.objects \
+        .annotate(location_ip_address=Coalesce('last_seen_ip_address', 'confirm_ip_address')) \
+        .exclude(location_ip_address=None) \
+        .order_by()
+    if not update_all:
+        queryset = queryset.filter(location=None)
+    return queryset
+
+
+def get_activities_queryset() -> QuerySet:
+    return Activity.objects.filter(location=None).exclude(ip_address=None).order_by()
+
+
+def get_distinct_ip_addresses(subscribers: QuerySet, activities: QuerySet, chunk_size: int) -> List[str]:
+    ip_addresses = set(
+        subscribers.values_list('location_ip_address', flat=True).distinct().iterator(chunk_size=chunk_size)
+    )
+    ip_addresses.update(activities.values_list('ip_address', flat=True).distinct().iterator(chunk_size=chunk_size))
+    return sorted(ip_addresses)
+
+
+def resolve_ip_addresses(ip_addresses: List[str], workers: int, chunk_size: int,
+                         progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+    """
+    Look up the `ip_addresses` in chunks of `chunk_size`, spread over a pool of
+    `workers` processes (or in this process if `workers` is 1), and map them
+    to the primary keys of their cities. The addresses without a known city
+    are left out.
+
+    :param progress: Called with the number of addresses of each resolved chunk
+    """
+    ip_chunks = list(chunks(ip_addresses, chunk_size))
+    if workers > 1 and len(ip_chunks) > 1:
+        # The workers only read the GeoIP database, so they don't need a database connection
+        context = multiprocessing.get_context('fork')
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(ip_chunks)), mp_context=context)
+        results = executor.map(lookup_ip_addresses, ip_chunks)
+    else:
+        executor = None
+        results = map(lookup_ip_addresses, ip_chunks)
+
+    locator = get_geoip_locator()
+    locations = dict()
+    try:
+        for geodata in results:
+            for ip_address, country_code, country_name, city_name in geodata:
+                if country_code is not None and city_name is not None:
+                    country_id = locator.get_country_id(country_code, country_name)
+                    locations[ip_address] = locator.get_city_id(country_id, city_name)
+            if progress is not None:
+                progress(len(geodata))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return locations
+
+
+def update_subscribers_locations(subscribers: QuerySet, locations: Dict[str, int], chunk_size: int,
+                                 progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Set the location of the `subscribers` (annotated by
+    `get_subscribers_queryset`) with one `bulk_update` per chunk. The rows
+    are read with a server-side cursor where the database supports it.
+
+    :param progress: Called with the number of subscribers of each chunk
+    :return: Number of updated subscribers
+    """
+    updated = 0
+    rows = subscribers.values_list('pk', 'location_ip_address', 'location_id').iterator(chunk_size=chunk_size)
+    for chunk in chunks(rows, chunk_size):
+        changed = [
+            Subscriber(pk=pk, location_id=locations[ip_address])
+            for pk, ip_address, location_id in chunk
+            if ip_address in locations and locations[ip_address] != location_id
+        ]
+        Subscriber.objects.bulk_update(changed, ['location'], batch_size=get_max_batch_size(chunk_size))
+        updated += len(changed)
+        if progress is not None:
+            progress(len(chunk))
+    return updated
+
+
+def update_activities_locations(activities: QuerySet, locations: Dict[str, int], chunk_size: int,
+                                progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Set the location of the `activities` with one UPDATE per city and chunk
+    of IP addresses.
+
+    :param progress: Called with the number of IP addresses of each chunk
+    :return: Number of updated activities
+    """
+    ip_addresses_by_city: Dict[int, List[str]] = dict()
+    for ip_address, city_id in locations.items():
+        ip_addresses_by_city.setdefault(city_id, list()).append(ip_address)
+
+    updated = 0
+    for city_id, ip_addresses in ip_addresses_by_city.items():
+        for chunk in chunks(ip_addresses, get_max_batch_size(chunk_size)):
+            updated += activities.filter(ip_address__in=chunk).update(location_id=city_id)
+            if progress is not None:
+                progress(len(chunk))
+    return updated
@@ -0,0 +1,133 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import tempfile
+
+from django.core.files import File
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from colossus.apps.subscribers import partitions
+from colossus.apps.subscribers.constants import ArchiveFormats
+from colossus.apps.subscribers.models import Activity, ActivityArchive
+
+ARCHIVE_FIELDS = (
+    'id', 'activity_type', 'date', 'description', 'ip_address', 'location_id', 'subscriber_id', 'campaign_id',
+    'email_id', 'link_id',
+)
+
+
+def month_datetime(month: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(month, datetime.time.min).replace(tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = 'Move activities older than the given number of months to compressed files in the private media ' \
+           'storage, keeping a summary of the archived activities in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=12,
+            help='Number of months (including the current one) to keep in the database. Defaults to 12.',
+        )
+        parser.add_argument(
+            '--format', choices=list(ArchiveFormats.LABELS.keys()), default=ArchiveFormats.CSV,
+            help='Archive file format. Defaults to csv.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of rows fetched from the database at a time.',
+        )
+
+    def handle(self, *args, **options):
+        months = max(options['months'], 1)
+        file_format = options['format']
+        chunk_size = options['chunk_size']
+
+        cutoff = partitions.add_months(partitions.month_start(datetime.date.today()), -(months - 1))
+        oldest_date = Activity.objects.filter(date__lt=month_datetime(cutoff)).order_by('date') \
+            .values_list('date', flat=True) \
+            .first()
+
+        if oldest_date is None:
+            self.stdout.write(self.style.WARNING('There are no activities older than %s.' % cutoff.isoformat()))
+            return
+
+        attached_partitions = set(partitions.get_partitions())
+        month = partitions.month_start(oldest_date.date())
+        while month < cutoff:
+            archive = self.archive_month(month, file_format, chunk_size, month in attached_partitions)
+            if archive is not None:
+                self.stdout.write(self.style.SUCCESS(
+                    'Archived %s activities from %s to "%s".' % (archive.rows_count, archive, archive.file.name)
+                ))
+            month = partitions.add_months(month, 1)
+
+    def archive_month(self, month, file_format, chunk_size, is_partition):
+        queryset = Activity.objects.filter(
+            date__gte=month_datetime(month),
+            date__lt=month_datetime(partitions.add_months(month, 1))
+        )
+
+        if not queryset.exists():
+            if is_partition:
+                partitions.detach_partition(month)
+            return None
+
+        summary = queryset \
+            .annotate(campaign_key=Coalesce('campaign_id', 'email__campaign_id')) \
+            .values('activity_type', 'campaign_key', mailing_list_id=F('subscriber__mailing_list_id')) \
+            .annotate(total=Count('id')) \
+            .order_by('mailing_list_id', 'campaign_key', 'activity_type')
+
+        with tempfile.TemporaryFile() as archive_file:
+            with gzip.GzipFile(fileobj=archive_file, mode='wb') as gzip_file:
+                text_file = io.TextIOWrapper(gzip_file, encoding='utf-8', newline='')
+                rows_count = self.write_rows(text_file, queryset, file_format, chunk_size)
+                text_file.flush()
+                text_file.detach()
+            archive_file.seek(0)
+
+            with transaction.atomic():
+                archive = ActivityArchive(period=month, file_format=file_format, rows_count=rows_count)
+                archive.set_summary([
+                    {
+                        'mailing_list_id': entry['mailing_list_id'],
+                        'campaign_id': entry['campaign_key'],
+                        'activity_type': entry['activity_type'],
+                        'total': entry['total'],
+                    } for entry in summary
+                ])
+                filename = 'activities_%s.%s.gz' % (month.strftime('%Y_%m'), file_format)
+                archive.file.save(filename, File(archive_file), save=False)
+                archive.save()
+
+                if is_partition:
+                    partitions.detach_partition(month)
+                else:
+                    queryset.delete()
+
+        return archive
+
+    def write_rows(self, text_file, queryset, file_format, chunk_size):
+        rows = queryset.order_by('id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size)
+        rows_count = 0
+        if file_format == ArchiveFormats.CSV:
+            writer = csv.writer(text_file)
+            writer.writerow(ARCHIVE_FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                rows_count += 1
+        else:
+            for row in rows:
+                entry = dict(zip(ARCHIVE_FIELDS, row))
+                entry['date'] = entry['date'].isoformat()
+                text_file.write(json.dumps(entry))
+                text_file.write('\n')
+                rows_count += 1
+        return rows_count
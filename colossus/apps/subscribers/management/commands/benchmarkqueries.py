@@ -0,0 +1,166 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from colossus.apps.campaigns.models import Campaign, Email
+from colossus.apps.lists.models import MailingList
+from colossus.apps.subscribers.constants import ActivityTypes, Status
+from colossus.apps.subscribers.indexes import (
+    EXPRESSION_INDEXES, create_expression_index, drop_expression_index,
+)
+from colossus.apps.subscribers.models import Activity, Domain, Subscriber
+
+STATUSES = (Status.SUBSCRIBED, Status.SUBSCRIBED, Status.SUBSCRIBED, Status.UNSUBSCRIBED, Status.CLEANED)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed a large dataset and print the query plans and timings of the hot activity/subscriber queries ' \
+           'with and without the indexes. All the seeded data is rolled back at the end.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=5, help='Number of mailing lists to create.')
+        parser.add_argument('--subscribers', type=int, default=20000, help='Number of subscribers per list.')
+        parser.add_argument('--activities', type=int, default=5, help='Number of activities per subscriber.')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of times each query is executed.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Batch size used to seed the data.')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        # SQLite can only alter the schema inside a transaction when the foreign key checks are disabled
+        connection.disable_constraint_checking()
+        try:
+            with transaction.atomic():
+                self.seed(options['lists'], options['subscribers'], options['activities'], options['batch_size'])
+                queries = self.get_queries()
+                with connection.schema_editor(atomic=False) as schema_editor:
+                    self.drop_indexes(schema_editor)
+                before = self.run_queries(queries)
+                with connection.schema_editor(atomic=False) as schema_editor:
+                    self.create_indexes(schema_editor)
+                after = self.run_queries(queries)
+                self.report(queries, before, after)
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('Seeded data rolled back.'))
+        finally:
+            connection.enable_constraint_checking()
+
+    def seed(self, lists_count, subscribers_count, activities_count, batch_size):
+        self.stdout.write('Seeding %s lists with %s subscribers and %s activities each...' % (
+            lists_count, subscribers_count, subscribers_count * activities_count
+        ))
+        domain, created = Domain.objects.get_or_create(name='@benchmark.colossus')
+        self.mailing_lists = [
+            MailingList.objects.create(name='Benchmark %s' % index, slug='benchmark-%s-%s' % (index, time.time()))
+            for index in range(lists_count)
+        ]
+        self.campaign = Campaign.objects.create(name='Benchmark', mailing_list=self.mailing_lists[0])
+        self.email = Email.objects.create(campaign=self.campaign, from_email='benchmark@benchmark.colossus')
+
+        for mailing_list in self.mailing_lists:
+            subscribers = [
+                Subscriber(
+                    email='subscriber_%s_%s@benchmark.colossus' % (mailing_list.pk, index),
+                    domain=domain,
+                    mailing_list=mailing_list,
+                    status=STATUSES[index % len(STATUSES)]
+                ) for index in range(subscribers_count)
+            ]
+            Subscriber.objects.bulk_create(subscribers)
+
+        activity_types = (ActivityTypes.SENT, ActivityTypes.OPENED, ActivityTypes.CLICKED, ActivityTypes.SUBSCRIBED)
+        activities = list()
+        for subscriber_id in Subscriber.objects.filter(domain=domain).values_list('pk', flat=True).iterator():
+            for index in range(activities_count):
+                activity_type = activity_types[index % len(activity_types)]
+                activities.append(Activity(
+                    subscriber_id=subscriber_id,
+                    activity_type=activity_type,
+                    email=self.email if activity_type != ActivityTypes.SUBSCRIBED else None
+                ))
+            if len(activities) >= batch_size:
+                Activity.objects.bulk_create(activities)
+                activities = list()
+        Activity.objects.bulk_create(activities)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE colossus_subscribers')
+                cursor.execute('ANALYZE colossus_activities')
+
+    def get_queries(self):
+        mailing_list = self.mailing_lists[0]
+        subscriber = mailing_list.subscribers.order_by('pk').last()
+        thirty_days_ago = timezone.now() - timezone.timedelta(30)
+        return [
+            ('Activities by type and email (send_campaign)', lambda: subscriber.activities.filter(
+                activity_type=ActivityTypes.SENT,
+                email=self.email
+            )[:1]),
+            ('Campaign opens per subscriber (CampaignReportsView)', lambda: Activity.objects.filter(
+                email__campaign_id=self.campaign.pk,
+                activity_type=ActivityTypes.OPENED
+            ).values('subscriber__id', 'subscriber__email').annotate(total=Count('id')).order_by('-total')[:10]),
+            ('List activities of the last 30 days (SubscriptionsSummaryChart)', lambda: Activity.objects.filter(
+                subscriber__mailing_list=mailing_list,
+                date__gte=thirty_days_ago
+            ).values('date__date').annotate(
+                subscribed=Count('id', filter=Q(activity_type=ActivityTypes.SUBSCRIBED))
+            ).order_by('date__date')),
+            ('Active subscribers count (get_active_subscribers)', lambda: mailing_list.get_active_subscribers()
+                .values('mailing_list_id')
+                .annotate(total=Count('id'))),
+            ('Subscriber by email (email__iexact)', lambda: Subscriber.objects.filter(
+                email__iexact=subscriber.email.upper(),
+                mailing_list=mailing_list
+            )),
+        ]
+
+    def get_model_indexes(self):
+        for model in (Activity, Subscriber):
+            for index in model._meta.indexes:
+                yield model, index
+
+    def drop_indexes(self, schema_editor):
+        for model, index in self.get_model_indexes():
+            schema_editor.remove_index(model, index)
+        for name in EXPRESSION_INDEXES.keys():
+            drop_expression_index(schema_editor, name)
+
+    def create_indexes(self, schema_editor):
+        for model, index in self.get_model_indexes():
+            schema_editor.add_index(model, index)
+        for name in EXPRESSION_INDEXES.keys():
+            create_expression_index(schema_editor, name)
+        if connection.vendor == 'postgresql':
+            schema_editor.execute('ANALYZE colossus_subscribers')
+            schema_editor.execute('ANALYZE colossus_activities')
+
+    def run_queries(self, queries):
+        results = list()
+        for label, get_queryset in queries:
+            timings = list()
+            for i in range(self.repeat):
+                queryset = get_queryset()
+                start = time.perf_counter()
+                list(queryset)
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append((statistics.median(timings), get_queryset().explain()))
+        return results
+
+    def report(self, queries, before, after):
+        for (label, get_queryset), (before_time, before_plan), (after_time, after_plan) in zip(queries, before, after):
+            self.stdout.write(self.style.MIGRATE_HEADING('\n%s' % label))
+            self.stdout.write('-- without indexes: %.2f ms' % before_time)
+            self.stdout.write(before_plan)
+            self.stdout.write('-- with indexes: %.2f ms' % after_time)
+            self.stdout.write(after_plan)
+            self.stdout.write(self.style.SUCCESS('-- %.1fx' % (before_time / after_time if after_time else 0)))
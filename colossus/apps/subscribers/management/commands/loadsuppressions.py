@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand, CommandError
+
+from colossus.apps.lists.utils import get_email_column, iter_csv_rows
+from colossus.apps.subscribers.constants import SuppressionReasons
+from colossus.apps.subscribers.models import Suppression
+
+REASONS = {
+    'bounced': SuppressionReasons.BOUNCED,
+    'complained': SuppressionReasons.COMPLAINED,
+    'unsubscribed': SuppressionReasons.UNSUBSCRIBED,
+    'manual': SuppressionReasons.MANUAL,
+}
+
+
+class Command(BaseCommand):
+    help = 'Add the email addresses of a CSV file to the global suppression list. The email column is detected ' \
+           'from the header row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV file.')
+        parser.add_argument(
+            '--reason', choices=list(REASONS.keys()), default='manual',
+            help='Why the addresses are suppressed. Defaults to manual.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        headings = next((row for row, position in iter_csv_rows(path, skip_header=False)), [])
+        email_column = get_email_column(headings)
+        if email_column is None:
+            raise CommandError('Could not find the email column of "%s".' % path)
+        emails = (row[email_column] for row, position in iter_csv_rows(path) if len(row) > email_column)
+        emails_count = Suppression.objects.suppress(emails, REASONS[options['reason']])
+        self.stdout.write(self.style.SUCCESS('Suppressed %s email addresses.' % emails_count))
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand, CommandError
+
+from colossus.apps.subscribers import partitions
+
+
+class Command(BaseCommand):
+    help = 'Convert the activities table into a table partitioned by month (PostgreSQL 11+ only) and make sure ' \
+           'the partitions for the upcoming months exist.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=2,
+            help='Number of future months to create partitions for. Defaults to 2.',
+        )
+
+    def handle(self, *args, **options):
+        months_ahead = options['months_ahead']
+
+        if not partitions.supports_partitioning():
+            raise CommandError('Table partitioning requires PostgreSQL 11 or newer.')
+
+        if not partitions.is_partitioned():
+            self.stdout.write('Converting "%s" into a partitioned table...' % partitions.ACTIVITIES_TABLE)
+            moved_rows = partitions.convert_to_partitioned_table(months_ahead)
+            self.stdout.write(self.style.SUCCESS('Moved %s activities to the partitioned table.' % moved_rows))
+
+        names = partitions.ensure_partitions(months_ahead)
+        self.stdout.write(self.style.SUCCESS('Partitions ready: %s.' % ', '.join(names)))
@@ -0,0 +1,33 @@
+import os
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from colossus.apps.lists.tasks import process_bounces_mailbox
+
+
+class Command(BaseCommand):
+    help = 'Read the new bounce messages of a Maildir directory or mbox file and clean the hard bounced email ' \
+           'addresses from all the mailing lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=None,
+            help='Path to the Maildir directory or mbox file. Defaults to the COLOSSUS_BOUNCES_MAILBOX setting.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of messages applied at a time.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.COLOSSUS_BOUNCES_MAILBOX
+        if not path:
+            raise CommandError('Inform the path of the mailbox or set COLOSSUS_BOUNCES_MAILBOX.')
+        if not os.path.exists(path):
+            raise CommandError('The mailbox "%s" does not exist.' % path)
+        summary = process_bounces_mailbox(path, max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(
+            'Read %(messages)s bounce messages: %(hard_bounces)s hard bounces, '
+            '%(cleaned)s subscribers cleaned.' % summary
+        ))
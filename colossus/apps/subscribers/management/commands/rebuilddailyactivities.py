@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from colossus.apps.subscribers.models import DailyActivity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily activity rollup table from the activities table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Only rebuild the last N days (including today). Defaults to the whole history.',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        start_date = None
+        if days is not None:
+            start_date = timezone.localdate() - datetime.timedelta(max(days, 1) - 1)
+        rows_count = DailyActivity.objects.rebuild(start_date)
+        self.stdout.write(self.style.SUCCESS('Rebuilt %s daily activity rows.' % rows_count))
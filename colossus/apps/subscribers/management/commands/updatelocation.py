@@ -1,50 +1,94 @@
-import sys
+import os
+import time
 
 from django.core.management import BaseCommand
 
-from colossus.apps.subscribers.models import Subscriber
-from colossus.utils import get_location
+from colossus.apps.subscribers.locations import (
+    get_activities_queryset, get_distinct_ip_addresses,
+    get_subscribers_queryset, resolve_ip_addresses,
+    update_activities_locations, update_subscribers_locations,
+)
+from colossus.utils import get_geoip_locator
+
+
+class Progress:
+    """
+    Write the number of processed items and the processing rate, at most once
+    per `interval` seconds.
+    """
+    def __init__(self, command, label: str, total: int, interval: float = 1.0):
+        self.command = command
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start_time = time.monotonic()
+        self.last_write = self.start_time
+
+    def __call__(self, count: int):
+        self.done += count
+        now = time.monotonic()
+        if now - self.last_write >= self.interval:
+            self.last_write = now
+            self.write(now)
+
+    def write(self, now: float = None):
+        elapsed = (now or time.monotonic()) - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        self.command.stdout.write('%s: %s/%s (%.0f/s)' % (self.label, self.done, self.total, rate))
 
 
 class Command(BaseCommand):
-    help = 'Update subscriber location information based on confirm IP address ' \
-           'field or last seen IP address, if available.'
+    help = 'Update subscriber location information based on last seen IP address field or confirm IP ' \
+           'address, if available, as well as the location of activities without one.'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--all', action='store_true',
             help='Force update all subscribers information. By default it only update those with location = None.',
         )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes looking up the IP addresses. Defaults to the number of CPUs.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of IP addresses looked up, and of rows updated, at a time.',
+        )
 
     def handle(self, *args, **options):
-        all = options['all']
-
-        queryset = Subscriber.objects.exclude(confirm_ip_address=None)
-
-        if not all:
-            queryset = queryset.filter(location=None)
-
-        updated = 0
-
-        for subscriber in queryset:
-            ip_address = subscriber.last_seen_ip_address
-            if ip_address is None:
-                ip_address = subscriber.confirm_ip_address
-            location = get_location(ip_address)
-            if location is not None:
-                subscriber.location = location
-                subscriber.save(update_fields=['location'])
-                if updated % 100 == 0:
-                    sys.stdout.write('\n')
-                sys.stdout.write('.')
-                sys.stdout.flush()
-                updated += 1
-
-        if updated > 0:
-            self.stdout.write(
-                self.style.SUCCESS('\nSuccessfully updated location for %s subscribers.' % updated)
-            )
+        workers = max(options['workers'], 1)
+        chunk_size = max(options['chunk_size'], 1)
+
+        subscribers = get_subscribers_queryset(options['all'])
+        activities = get_activities_queryset()
+        ip_addresses = get_distinct_ip_addresses(subscribers, activities, chunk_size)
+        if not ip_addresses:
+            self.stdout.write(self.style.WARNING('Could not find any new information. Nothing changed.'))
+            return
+
+        progress = Progress(self, 'IP addresses', len(ip_addresses))
+        locations = resolve_ip_addresses(ip_addresses, workers, chunk_size, progress)
+        progress.write()
+
+        progress = Progress(self, 'Subscribers', subscribers.count())
+        subscribers_updated = update_subscribers_locations(subscribers, locations, chunk_size, progress)
+        progress.write()
+
+        progress = Progress(self, 'Activities IP addresses', len(locations))
+        activities_updated = update_activities_locations(activities, locations, chunk_size, progress)
+        progress.write()
+
+        stats = get_geoip_locator().stats()
+        self.stdout.write('GeoIP cache hit rates: %s' % ', '.join(
+            '%s %.1f%%' % (name, cache_stats['hit_rate'] * 100) for name, cache_stats in stats.items()
+        ))
+
+        if subscribers_updated > 0 or activities_updated > 0:
+            self.stdout.write(self.style.SUCCESS(
+                'Successfully updated location for %s subscribers and %s activities.' % (
+                    subscribers_updated, activities_updated
+                )
+            ))
         else:
-            self.stdout.write(
-                self.style.WARNING('Could not find any new information. Nothing changed.')
-            )
+            self.stdout.write(self.style.WARNING('Could not find any new information. Nothing changed.'))
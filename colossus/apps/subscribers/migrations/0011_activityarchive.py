@@ -0,0 +1,31 @@
+# Generated by Django 2.1 on 2026-10-19 05:27
+
+import colossus.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0010_auto_20180825_0042'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(db_index=True, help_text='First day of the archived month.', verbose_name='period')),
+                ('file', models.FileField(storage=colossus.storage.PrivateMediaStorage(), upload_to='archives', verbose_name='file')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], max_length=10, verbose_name='file format')),
+                ('rows_count', models.PositiveIntegerField(default=0, verbose_name='rows count')),
+                ('summary', models.TextField(blank=True, verbose_name='summary')),
+                ('archive_date', models.DateTimeField(auto_now_add=True, verbose_name='archive date')),
+            ],
+            options={
+                'verbose_name': 'activity archive',
+                'verbose_name_plural': 'activity archives',
+                'db_table': 'colossus_activities_archives',
+            },
+        ),
+    ]
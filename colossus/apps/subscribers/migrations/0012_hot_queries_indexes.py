@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:28
+
+from django.db import migrations, models
+
+from colossus.apps.subscribers.indexes import (
+    create_expression_index, drop_expression_index,
+)
+
+
+def create_upper_email_index(apps, schema_editor):
+    create_expression_index(schema_editor, 'colossus_sub_upper_email_idx')
+
+
+def drop_upper_email_index(apps, schema_editor):
+    drop_expression_index(schema_editor, 'colossus_sub_upper_email_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0011_activityarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['subscriber', 'activity_type', 'email'], name='colossus_act_sub_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['email', 'activity_type'], name='colossus_act_email_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['subscriber', 'date'], name='colossus_act_sub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(fields=['mailing_list', 'status'], name='colossus_sub_list_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(condition=models.Q(status=2), fields=['mailing_list', 'id'], name='colossus_sub_active_idx'),
+        ),
+        migrations.RunPython(create_upper_email_index, drop_upper_email_index),
+    ]
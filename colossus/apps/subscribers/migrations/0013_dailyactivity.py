@@ -0,0 +1,62 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def populate_daily_activities(apps, schema_editor):
+    Activity = apps.get_model('subscribers', 'Activity')
+    DailyActivity = apps.get_model('subscribers', 'DailyActivity')
+    totals = Activity.objects \
+        .annotate(campaign_key=Coalesce('campaign_id', 'email__campaign_id'), day=TruncDate('date')) \
+        .values('day', 'activity_type', 'campaign_key', mailing_list_key=F('subscriber__mailing_list_id')) \
+        .annotate(total=Count('id')) \
+        .order_by()
+    DailyActivity.objects.bulk_create([
+        DailyActivity(
+            mailing_list_id=entry['mailing_list_key'],
+            campaign_id=entry['campaign_key'],
+            day=entry['day'],
+            activity_type=entry['activity_type'],
+            count=entry['total']
+        ) for entry in totals.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0003_auto_20180815_2311'),
+        ('lists', '0001_initial'),
+        ('subscribers', '0012_hot_queries_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('activity_type', models.PositiveSmallIntegerField(choices=[(1, 'Subscribed'), (2, 'Unsubscribed'), (3, 'Was sent'), (4, 'Opened'), (5, 'Clicked'), (6, 'Imported'), (7, 'Cleaned')], verbose_name='type')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_activities', to='campaigns.Campaign')),
+                ('mailing_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activities', to='lists.MailingList')),
+            ],
+            options={
+                'verbose_name': 'daily activity',
+                'verbose_name_plural': 'daily activities',
+                'db_table': 'colossus_daily_activities',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivity',
+            constraint=models.UniqueConstraint(fields=('mailing_list', 'campaign', 'day', 'activity_type'), name='colossus_daily_act_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivity',
+            constraint=models.UniqueConstraint(condition=models.Q(campaign__isnull=True), fields=('mailing_list', 'day', 'activity_type'), name='colossus_daily_act_no_campaign_uniq'),
+        ),
+        migrations.RunPython(populate_daily_activities, migrations.RunPython.noop),
+    ]
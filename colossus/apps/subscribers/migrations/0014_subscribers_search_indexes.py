@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:55
+
+from django.db import migrations, models
+
+from colossus.apps.subscribers.indexes import (
+    create_expression_index, drop_expression_index,
+)
+
+SEARCH_INDEXES = ('colossus_sub_email_trgm_idx', 'colossus_sub_name_trgm_idx')
+
+
+def create_search_indexes(apps, schema_editor):
+    for name in SEARCH_INDEXES:
+        create_expression_index(schema_editor, name)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name in SEARCH_INDEXES:
+        drop_expression_index(schema_editor, name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0013_dailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriber',
+            index=models.Index(fields=['mailing_list', 'optin_date', 'id'], name='colossus_sub_list_optin_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-19 05:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0003_subscriberimport_manifest'),
+        ('subscribers', '0014_subscribers_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('description', models.TextField(blank=True, verbose_name='description')),
+                ('match', models.PositiveSmallIntegerField(choices=[(1, 'Subscribers matching all the conditions'), (2, 'Subscribers matching any of the conditions')], default=1, verbose_name='match')),
+                ('filters', models.TextField(blank=True, verbose_name='filters')),
+                ('members_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='members')),
+                ('refresh_date', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='refresh date')),
+                ('mailing_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='lists.MailingList')),
+            ],
+            options={
+                'verbose_name': 'segment',
+                'verbose_name_plural': 'segments',
+                'db_table': 'colossus_segments',
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='subscribers.Segment')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_memberships', to='subscribers.Subscriber')),
+            ],
+            options={
+                'verbose_name': 'segment member',
+                'verbose_name_plural': 'segment members',
+                'db_table': 'colossus_segment_members',
+                'unique_together': {('segment', 'subscriber')},
+            },
+        ),
+    ]
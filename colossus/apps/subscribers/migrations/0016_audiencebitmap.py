@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-19 06:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0003_subscriberimport_manifest'),
+        ('subscribers', '0015_segment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudienceBitmap',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Pending'), (2, 'Subscribed'), (3, 'Unsubscribed'), (4, 'Cleaned')], null=True, verbose_name='status')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('cardinality', models.PositiveIntegerField(default=0, verbose_name='cardinality')),
+                ('build_date', models.DateTimeField(auto_now_add=True, verbose_name='build date')),
+                ('mailing_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience_bitmaps', to='lists.MailingList')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='audience_bitmaps', to='subscribers.Tag')),
+            ],
+            options={
+                'verbose_name': 'audience bitmap',
+                'verbose_name_plural': 'audience bitmaps',
+                'db_table': 'colossus_audience_bitmaps',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='audiencebitmap',
+            constraint=models.UniqueConstraint(condition=models.Q(tag__isnull=False), fields=('tag',), name='colossus_audience_bitmap_tag_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='audiencebitmap',
+            constraint=models.UniqueConstraint(condition=models.Q(tag__isnull=True), fields=('mailing_list', 'status'), name='colossus_audience_bitmap_status_uniq'),
+        ),
+    ]
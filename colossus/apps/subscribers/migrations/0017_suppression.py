@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-19 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0016_audiencebitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suppression',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_hash', models.CharField(max_length=64, unique=True, verbose_name='email hash')),
+                ('reason', models.PositiveSmallIntegerField(choices=[(1, 'Hard bounce'), (2, 'Spam complaint'), (3, 'Unsubscribed from all lists'), (4, 'Manually suppressed')], verbose_name='reason')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='create date')),
+            ],
+            options={
+                'verbose_name': 'suppression',
+                'verbose_name_plural': 'suppressions',
+                'db_table': 'colossus_suppressions',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-19 06:16
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0017_suppression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Identifier of the email service provider event the activity was created from.', max_length=100, null=True, verbose_name='external id'),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='activity_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Subscribed'), (2, 'Unsubscribed'), (3, 'Was sent'), (4, 'Opened'), (5, 'Clicked'), (6, 'Imported'), (7, 'Cleaned'), (8, 'Was delivered'), (9, 'Delivery failed')], verbose_name='type'),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='date'),
+        ),
+        migrations.AlterField(
+            model_name='dailyactivity',
+            name='activity_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Subscribed'), (2, 'Unsubscribed'), (3, 'Was sent'), (4, 'Opened'), (5, 'Clicked'), (6, 'Imported'), (7, 'Cleaned'), (8, 'Was delivered'), (9, 'Delivery failed')], verbose_name='type'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(external_id__isnull=False), fields=['external_id'], name='colossus_act_external_id_idx'),
+        ),
+    ]
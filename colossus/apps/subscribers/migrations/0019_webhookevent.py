@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-19 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0018_activity_external_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('mailgun', 'Mailgun')], max_length=30, verbose_name='provider')),
+                ('payload', models.TextField(verbose_name='payload')),
+                ('received_date', models.DateTimeField(auto_now_add=True, verbose_name='received date')),
+            ],
+            options={
+                'verbose_name': 'webhook event',
+                'verbose_name_plural': 'webhook events',
+                'db_table': 'colossus_webhook_events',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0019_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='attempts'),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='error'),
+        ),
+    ]
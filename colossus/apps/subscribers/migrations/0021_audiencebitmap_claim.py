@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribers', '0020_webhookevent_attempts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiencebitmap',
+            name='data',
+            field=models.BinaryField(null=True, verbose_name='data'),
+        ),
+    ]
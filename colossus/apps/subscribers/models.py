@@ -1,11 +1,16 @@
 import hashlib
+import json
 import uuid
+from itertools import islice
+from typing import Dict, Iterable, Set
 from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.mail import EmailMultiAlternatives
-from django.db import models, transaction
-from django.db.models import Count, Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, ProtectedError, Q
+from django.db.models.functions import Coalesce, TruncDate
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
@@ -15,9 +20,11 @@ from django.utils.translation import gettext_lazy as _
 
 import html2text
 
+from colossus.apps.campaigns.constants import CampaignStatus
 from colossus.apps.campaigns.models import Campaign, Email, Link
 from colossus.apps.core.models import City, Token
 from colossus.apps.lists.models import MailingList
+from colossus.apps.lists.utils import is_subscribers_count_suspended
 from colossus.apps.subscribers.exceptions import (
     FormTemplateIsNotEmail, FormTemplateIsNotForm,
 )
@@ -25,10 +32,16 @@ from colossus.apps.subscribers.tasks import (
     update_click_rate, update_open_rate,
     update_rates_after_subscriber_deletion, update_subscriber_location,
 )
-from colossus.utils import get_absolute_url, get_client_ip
+from colossus.bitmaps import RoaringBitmap
+from colossus.storage import PrivateMediaStorage
+from colossus.utils import LRUCache, get_absolute_url, get_client_ip
 
 from .activities import render_activity
-from .constants import ActivityTypes, Status, TemplateKeys
+from .constants import (
+    ActivityTypes, ArchiveFormats, SegmentMatch, Status, SuppressionReasons,
+    TemplateKeys, WebhookProviders,
+)
+from .segments import compile_segment_filters
 from .subscription_settings import SUBSCRIPTION_FORM_TEMPLATE_SETTINGS
 
 
@@ -54,9 +67,54 @@ class Tag(models.Model):
         self.name = slugify(self.name)
 
 
+class DomainManager(models.Manager):
+    """
+    Resolve domain names to primary keys through a process-local LRU cache,
+    since a handful of domains (e.g. "@gmail.com") cover most subscribers.
+
+    Concurrent inserts of the same domain are settled by the unique constraint
+    on the name. The ids are only cached once the transaction that read or
+    created them commits, so a rolled back insert never leaves a dangling id
+    behind.
+    """
+    cache = LRUCache(maxsize=settings.COLOSSUS_DOMAIN_CACHE_SIZE)
+
+    def cache_on_commit(self, domains: Dict[str, int]):
+        if domains:
+            transaction.on_commit(lambda: [self.cache.set(name, pk) for name, pk in domains.items()])
+
+    def get_pk(self, name: str) -> int:
+        pk = self.cache.get(name)
+        if pk is None:
+            domain, created = self.get_or_create(name=name)
+            pk = domain.pk
+            self.cache_on_commit({name: pk})
+        return pk
+
+    def get_pks(self, names: Iterable[str]) -> Dict[str, int]:
+        domains = dict()
+        missing = set()
+        for name in set(names):
+            pk = self.cache.get(name)
+            if pk is None:
+                missing.add(name)
+            else:
+                domains[name] = pk
+        if missing:
+            found = dict(self.filter(name__in=missing).values_list('name', 'id'))
+            if missing - found.keys():
+                self.bulk_create([self.model(name=name) for name in missing - found.keys()], ignore_conflicts=True)
+                found.update(self.filter(name__in=missing - found.keys()).values_list('name', 'id'))
+            self.cache_on_commit(found)
+            domains.update(found)
+        return domains
+
+
 class Domain(models.Model):
     name = models.CharField(max_length=255, unique=True)
 
+    objects = DomainManager()
+
     class Meta:
         verbose_name = _('domain')
         verbose_name_plural = _('domains')
@@ -65,6 +123,10 @@ class Domain(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def delete(self, using=None, keep_parents=False):
+        Domain.objects.cache.pop(self.name)
+        return super().delete(using, keep_parents)
+
     def clean(self):
         super().clean()
         self.name = self.name.lower()
@@ -141,6 +203,15 @@ class Subscriber(models.Model):
         verbose_name_plural = _('subscribers')
         unique_together = (('email', 'mailing_list',),)
         db_table = 'colossus_subscribers'
+        indexes = [
+            models.Index(fields=['mailing_list', 'status'], name='colossus_sub_list_status_idx'),
+            models.Index(
+                fields=['mailing_list', 'id'],
+                name='colossus_sub_active_idx',
+                condition=Q(status=Status.SUBSCRIBED)
+            ),
+            models.Index(fields=['mailing_list', 'optin_date', 'id'], name='colossus_sub_list_optin_idx'),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -161,16 +232,19 @@ class Subscriber(models.Model):
         if self.__email != self.email:
             email_name, domain_part = self.email.rsplit('@', 1)
             domain_name = '@' + domain_part
-            email_domain, created = Domain.objects.get_or_create(name=domain_name)
-            self.domain = email_domain
+            self.domain = Domain(pk=Domain.objects.get_pk(domain_name), name=domain_name)
             if update_fields is not None and 'domain' not in update_fields:
                 update_fields.append('domain')
             self.__email = self.email
 
+        adding = self._state.adding
         super().save(force_insert, force_update, using, update_fields)
 
-        if self.__status != self.status:
-            self.mailing_list.update_subscribers_count()
+        if adding or self.__status != self.status:
+            was_active = not adding and self.__status == Status.SUBSCRIBED
+            self.adjust_subscribers_count(int(self.status == Status.SUBSCRIBED) - int(was_active))
+            statuses = [self.status] if adding else [self.__status, self.status]
+            AudienceBitmap.objects.invalidate(self.mailing_list_id, statuses=statuses, tag_ids=[])
             self.__status = self.status
 
     def delete(self, using=None, keep_parents=False):
@@ -179,9 +253,27 @@ class Subscriber(models.Model):
                         .values_list('link_id', flat=True)
                         .order_by('link_id')
                         .distinct())
+        tag_ids = list(self.tags.values_list('pk', flat=True))
         super().delete(using, keep_parents)
+        AudienceBitmap.objects.invalidate(self.mailing_list_id, statuses=[self.__status], tag_ids=tag_ids)
+        if self.__status == Status.SUBSCRIBED:
+            self.adjust_subscribers_count(-1)
         update_rates_after_subscriber_deletion.delay(self.mailing_list_id, email_ids, link_ids)
 
+    def adjust_subscribers_count(self, delta: int):
+        """
+        Increment (or decrement) the subscribers count of the mailing list
+        with an UPDATE ... SET subscribers_count = subscribers_count + delta,
+        instead of counting all its active subscribers again. Does nothing
+        while the count is suspended (see `suspend_subscribers_count`).
+        """
+        if not delta or is_subscribers_count_suspended(self.mailing_list_id):
+            return
+        MailingList.objects.filter(pk=self.mailing_list_id, subscribers_count__gte=-delta) \
+            .update(subscribers_count=F('subscribers_count') + delta)
+        if Subscriber.mailing_list.is_cached(self):
+            self.mailing_list.subscribers_count = max(self.mailing_list.subscribers_count + delta, 0)
+
     def get_gravatar_url(self):
         email = self.email.lower().encode('utf-8')
         default = 'mm'
@@ -236,13 +328,14 @@ class Subscriber(models.Model):
             'activity_type': activity_type
         })
         activity = Activity.objects.create(**activity_kwargs)
+        DailyActivity.objects.increment_activity(activity)
         return activity
 
     def get_activities(self, **filter_kwargs):
         return self.activities \
             .select_related('subscriber__mailing_list', 'email__campaign', 'link') \
             .filter(**filter_kwargs) \
-            .order_by('-date')
+            .order_by('-date', '-id')
 
     def open(self, email, ip_address=None):
         """
@@ -328,7 +421,7 @@ class Subscriber(models.Model):
 
 class Activity(models.Model):
     activity_type = models.PositiveSmallIntegerField(_('type'), choices=ActivityTypes.CHOICES)
-    date = models.DateTimeField(_('date'), auto_now_add=True)
+    date = models.DateTimeField(_('date'), default=timezone.now)
     description = models.TextField(_('description'), blank=True)
     ip_address = models.GenericIPAddressField(_('confirm IP address'), unpack_ipv4=True, blank=True, null=True)
     location = models.ForeignKey(
@@ -342,6 +435,13 @@ class Activity(models.Model):
     campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
     email = models.ForeignKey(Email, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
     link = models.ForeignKey(Link, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
+    external_id = models.CharField(
+        _('external id'),
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text=_('Identifier of the email service provider event the activity was created from.')
+    )
 
     __cached_html = ''
 
@@ -349,6 +449,16 @@ class Activity(models.Model):
         verbose_name = _('activity')
         verbose_name_plural = _('activities')
         db_table = 'colossus_activities'
+        indexes = [
+            models.Index(fields=['subscriber', 'activity_type', 'email'], name='colossus_act_sub_type_idx'),
+            models.Index(fields=['email', 'activity_type'], name='colossus_act_email_type_idx'),
+            models.Index(fields=['subscriber', 'date'], name='colossus_act_sub_date_idx'),
+            models.Index(
+                fields=['external_id'],
+                name='colossus_act_external_id_idx',
+                condition=Q(external_id__isnull=False)
+            ),
+        ]
 
     @property
     def is_subscribed(self):
@@ -375,6 +485,471 @@ class Activity(models.Model):
         return self.date.strftime('%b %d, %Y %H:%M')
 
 
+class ActivityArchive(models.Model):
+    """
+    Activities older than a few months are moved out of the database into a
+    compressed file (see `archiveactivities` management command). A summary
+    with the number of activities per mailing list, campaign and activity type
+    is kept online so the historical numbers are still available.
+    """
+    period = models.DateField(_('period'), help_text=_('First day of the archived month.'), db_index=True)
+    file = models.FileField(_('file'), upload_to='archives', storage=PrivateMediaStorage())
+    file_format = models.CharField(_('file format'), max_length=10, choices=ArchiveFormats.CHOICES)
+    rows_count = models.PositiveIntegerField(_('rows count'), default=0)
+    summary = models.TextField(_('summary'), blank=True)
+    archive_date = models.DateTimeField(_('archive date'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('activity archive')
+        verbose_name_plural = _('activity archives')
+        db_table = 'colossus_activities_archives'
+
+    def __str__(self):
+        return self.period.strftime('%b %Y')
+
+    def set_summary(self, summary):
+        self.summary = json.dumps(summary)
+
+    def get_summary(self):
+        try:
+            summary = json.loads(self.summary)
+        except (TypeError, json.JSONDecodeError):
+            summary = list()
+        return summary
+
+
+class DailyActivityManager(models.Manager):
+    def increment(self, mailing_list_id, campaign_id, day, activity_type, count=1):
+        """
+        Add `count` to the rollup row of the given key, creating it if it does
+        not exist yet. The update is done using an F() expression so concurrent
+        writers don't overwrite each other. If two writers race to create the
+        same row, the loser of the race falls back to the update.
+        """
+        lookup = {
+            'mailing_list_id': mailing_list_id,
+            'campaign_id': campaign_id,
+            'day': day,
+            'activity_type': activity_type,
+        }
+        if self.filter(**lookup).update(count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                self.create(count=count, **lookup)
+        except IntegrityError:
+            self.filter(**lookup).update(count=F('count') + count)
+
+    def increment_activity(self, activity):
+        campaign_id = activity.campaign_id
+        if campaign_id is None and activity.email_id is not None:
+            campaign_id = activity.email.campaign_id
+        self.increment(
+            mailing_list_id=activity.subscriber.mailing_list_id,
+            campaign_id=campaign_id,
+            day=timezone.localdate(activity.date),
+            activity_type=activity.activity_type
+        )
+
+    def rebuild(self, start_date=None, batch_size=1000):
+        """
+        Recompute the rollup rows from the `Activity` table. If `start_date` is
+        informed, only the days starting from it are rebuilt. Note that archived
+        activities are no longer in the database, so rebuilding the days they
+        cover will drop their counts.
+        """
+        activities = Activity.objects.all()
+        rollup = self.all()
+        if start_date is not None:
+            activities = activities.filter(date__date__gte=start_date)
+            rollup = rollup.filter(day__gte=start_date)
+
+        totals = activities \
+            .annotate(campaign_key=Coalesce('campaign_id', 'email__campaign_id'), day=TruncDate('date')) \
+            .values('day', 'activity_type', 'campaign_key', mailing_list_key=F('subscriber__mailing_list_id')) \
+            .annotate(total=Count('id')) \
+            .order_by()
+
+        with transaction.atomic():
+            rollup.delete()
+            rows = [
+                self.model(
+                    mailing_list_id=entry['mailing_list_key'],
+                    campaign_id=entry['campaign_key'],
+                    day=entry['day'],
+                    activity_type=entry['activity_type'],
+                    count=entry['total']
+                ) for entry in totals
+            ]
+            self.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+
+class DailyActivity(models.Model):
+    """
+    Number of activities per mailing list, campaign, day and activity type.
+    The rows are incremented as the activities are created, so the charts and
+    summaries can read a handful of rows instead of grouping the whole
+    `Activity` table on every page view.
+    """
+    mailing_list = models.ForeignKey(MailingList, on_delete=models.CASCADE, related_name='daily_activities')
+    campaign = models.ForeignKey(
+        Campaign,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_activities'
+    )
+    day = models.DateField(_('day'))
+    activity_type = models.PositiveSmallIntegerField(_('type'), choices=ActivityTypes.CHOICES)
+    count = models.PositiveIntegerField(_('count'), default=0)
+
+    objects = DailyActivityManager()
+
+    class Meta:
+        verbose_name = _('daily activity')
+        verbose_name_plural = _('daily activities')
+        db_table = 'colossus_daily_activities'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mailing_list', 'campaign', 'day', 'activity_type'],
+                name='colossus_daily_act_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['mailing_list', 'day', 'activity_type'],
+                condition=Q(campaign__isnull=True),
+                name='colossus_daily_act_no_campaign_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.day.isoformat(), self.get_activity_type_display())
+
+
+class AudienceBitmapManager(models.Manager):
+    """
+    Bitmaps are a cache of the subscribers' primary keys: they are built on
+    demand from the database and dropped (`invalidate`) whenever the
+    underlying rows change, to be rebuilt on the next read.
+
+    A build first claims its row (with no data yet), and only then reads the
+    primary keys and stores them, if the claim wasn't dropped in between. As
+    `invalidate` drops the bitmaps again once the changes are committed, a
+    build never stores a bitmap read before a concurrent change without that
+    change dropping it afterwards.
+    """
+    def _get_bitmap(self, mailing_list_id: int, tag_id=None, status=None) -> RoaringBitmap:
+        lookup = {'mailing_list_id': mailing_list_id, 'tag_id': tag_id, 'status': status}
+        audience_bitmap = self.filter(**lookup).only('data').first()
+        if audience_bitmap is not None and audience_bitmap.data is not None:
+            return audience_bitmap.get_bitmap()
+
+        # Within a transaction, the claim would be invisible to the concurrent
+        # invalidations until the commit, so the bitmap is built but not stored.
+        store = not transaction.get_connection().in_atomic_block
+        if store and audience_bitmap is None:
+            try:
+                with transaction.atomic():
+                    audience_bitmap = self.create(**lookup)
+            except IntegrityError:
+                audience_bitmap = self.filter(**lookup).only('pk').first()  # Claimed concurrently.
+
+        if tag_id is not None:
+            pks = Subscriber.tags.through.objects.filter(tag_id=tag_id).values_list('subscriber_id', flat=True)
+        else:
+            pks = Subscriber.objects.filter(mailing_list_id=mailing_list_id, status=status) \
+                .values_list('pk', flat=True)
+        bitmap = RoaringBitmap(pks.order_by().iterator(chunk_size=settings.COLOSSUS_EXPORT_CHUNK_SIZE))
+
+        if store and audience_bitmap is not None:
+            self.filter(pk=audience_bitmap.pk, data__isnull=True) \
+                .update(data=bitmap.to_bytes(), cardinality=len(bitmap))
+        return bitmap
+
+    def get_tag_bitmap(self, tag) -> RoaringBitmap:
+        return self._get_bitmap(tag.mailing_list_id, tag_id=tag.pk)
+
+    def get_status_bitmap(self, mailing_list_id: int, status: int) -> RoaringBitmap:
+        return self._get_bitmap(mailing_list_id, status=status)
+
+    def get_tags_cardinalities(self, tags) -> Dict[int, int]:
+        """
+        Number of subscribers of each tag, read from the stored cardinalities.
+        """
+        cardinalities = dict(self.filter(tag__in=tags, data__isnull=False).values_list('tag_id', 'cardinality'))
+        for tag in tags:
+            if tag.pk not in cardinalities:
+                cardinalities[tag.pk] = len(self.get_tag_bitmap(tag))
+        return cardinalities
+
+    def invalidate(self, mailing_list_id: int, statuses: Iterable[int] = (), tag_ids: Iterable[int] = None):
+        """
+        Drop the bitmaps within the current transaction, and again once it is
+        committed, for the ones claimed by a build in the meantime.
+
+        :param tag_ids: IDs of the tags whose bitmaps are dropped. If None,
+        the bitmaps of all the tags of the mailing list are dropped.
+        """
+        condition = Q(status__in=list(statuses))
+        if tag_ids is None:
+            condition |= Q(tag__isnull=False)
+        else:
+            condition |= Q(tag_id__in=list(tag_ids))
+
+        def delete():
+            self.filter(condition, mailing_list_id=mailing_list_id).delete()
+
+        delete()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(delete)
+
+
+class AudienceBitmap(models.Model):
+    """
+    Compressed set of the primary keys of the subscribers of a mailing list,
+    either having a tag or a status, so audiences like "tag A and tag B but
+    not tag C" are computed in memory (see `colossus.apps.subscribers.audiences`)
+    and counted without touching the subscribers table.
+    """
+    mailing_list = models.ForeignKey(MailingList, on_delete=models.CASCADE, related_name='audience_bitmaps')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=True, blank=True, related_name='audience_bitmaps')
+    status = models.PositiveSmallIntegerField(_('status'), choices=Status.CHOICES, null=True, blank=True)
+    data = models.BinaryField(_('data'), null=True)
+    cardinality = models.PositiveIntegerField(_('cardinality'), default=0)
+    build_date = models.DateTimeField(_('build date'), auto_now_add=True)
+
+    objects = AudienceBitmapManager()
+
+    class Meta:
+        verbose_name = _('audience bitmap')
+        verbose_name_plural = _('audience bitmaps')
+        db_table = 'colossus_audience_bitmaps'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag'],
+                condition=Q(tag__isnull=False),
+                name='colossus_audience_bitmap_tag_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['mailing_list', 'status'],
+                condition=Q(tag__isnull=True),
+                name='colossus_audience_bitmap_status_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s (%s)' % (self.tag or self.get_status_display(), self.cardinality)
+
+    def get_bitmap(self) -> RoaringBitmap:
+        return RoaringBitmap.from_bytes(self.data)
+
+
+class Segment(models.Model):
+    """
+    A subset of the active subscribers of a mailing list, defined by filters
+    (see `colossus.apps.subscribers.segments`). The members are materialized
+    in the `SegmentMember` table by `refresh_members`, so sending a campaign
+    or reporting on the segment reads a single narrow table instead of
+    evaluating the filters again.
+    """
+    name = models.CharField(_('name'), max_length=100)
+    description = models.TextField(_('description'), blank=True)
+    mailing_list = models.ForeignKey(MailingList, on_delete=models.CASCADE, related_name='segments')
+    match = models.PositiveSmallIntegerField(_('match'), choices=SegmentMatch.CHOICES, default=SegmentMatch.ALL)
+    filters = models.TextField(_('filters'), blank=True)
+    members_count = models.PositiveIntegerField(_('members'), default=0, editable=False)
+    refresh_date = models.DateTimeField(_('refresh date'), null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = _('segment')
+        verbose_name_plural = _('segments')
+        db_table = 'colossus_segments'
+
+    def __str__(self) -> str:
+        return self.name
+
+    def get_absolute_url(self) -> str:
+        return reverse('lists:edit_segment', kwargs={'pk': self.mailing_list_id, 'segment_pk': self.pk})
+
+    def get_unsent_campaigns(self):
+        return self.campaigns.exclude(status=CampaignStatus.SENT)
+
+    def delete(self, *args, **kwargs):
+        """
+        Campaigns without a segment are sent to the whole mailing list, so a
+        segment can't be deleted while a campaign is yet to be sent to it.
+
+        :raises ProtectedError: If any campaign targeting the segment isn't sent
+        """
+        unsent_campaigns = self.get_unsent_campaigns()
+        if unsent_campaigns.exists():
+            raise ProtectedError(
+                'The segment "%s" is targeted by campaigns that were not sent yet.' % self.name,
+                list(unsent_campaigns)
+            )
+        return super().delete(*args, **kwargs)
+
+    def set_filters(self, filters):
+        self.filters = json.dumps(filters)
+
+    def get_filters(self) -> list:
+        try:
+            return json.loads(self.filters)
+        except (TypeError, json.JSONDecodeError):
+            return list()
+
+    def get_matching_subscribers(self):
+        """
+        Evaluate the filters against the current state of the subscribers.
+
+        :raises InvalidSegmentFilter: If any of the filters is malformed
+        """
+        return self.mailing_list.get_active_subscribers() \
+            .filter(compile_segment_filters(self.get_filters(), self.match))
+
+    def get_members(self):
+        """
+        Materialized members which are still subscribed, as of the last refresh.
+        """
+        return Subscriber.objects.filter(
+            mailing_list_id=self.mailing_list_id,
+            status=Status.SUBSCRIBED,
+            segment_memberships__segment=self
+        )
+
+    def refresh_members(self, batch_size=1000):
+        """
+        Bring the materialized members up to date by applying only the
+        difference with the current matching subscribers: the members not
+        matching anymore are deleted and the new ones are inserted, so a
+        refresh writes as many rows as there are changes.
+
+        :return: The number of members added and removed
+        """
+        matching = self.get_matching_subscribers().values('pk')
+        memberships = SegmentMember.objects.filter(segment=self)
+        with transaction.atomic():
+            removed, _deleted = memberships.exclude(subscriber_id__in=matching).delete()
+            new_members = self.get_matching_subscribers() \
+                .exclude(pk__in=memberships.values('subscriber_id')) \
+                .values_list('pk', flat=True) \
+                .iterator(chunk_size=batch_size)
+            added = 0
+            while True:
+                batch = [SegmentMember(segment=self, subscriber_id=pk) for pk in islice(new_members, batch_size)]
+                if not batch:
+                    break
+                SegmentMember.objects.bulk_create(batch)
+                added += len(batch)
+            self.members_count = memberships.count()
+            self.refresh_date = timezone.now()
+            self.save(update_fields=['members_count', 'refresh_date'])
+        return added, removed
+
+
+class SegmentMember(models.Model):
+    segment = models.ForeignKey(Segment, on_delete=models.CASCADE, related_name='memberships')
+    subscriber = models.ForeignKey(Subscriber, on_delete=models.CASCADE, related_name='segment_memberships')
+
+    class Meta:
+        verbose_name = _('segment member')
+        verbose_name_plural = _('segment members')
+        db_table = 'colossus_segment_members'
+        unique_together = (('segment', 'subscriber'),)
+
+
+def hash_email(email: str) -> str:
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
+
+
+class SuppressionManager(models.Manager):
+    def suppress(self, emails: Iterable[str], reason: int, batch_size: int = 1000) -> int:
+        """
+        Add the email addresses to the suppression list, ignoring the ones
+        already suppressed.
+
+        :return: Number of non-blank email addresses read, including the
+        duplicates and the ones already suppressed
+        """
+        emails_count = 0
+        emails = iter(emails)
+        while True:
+            chunk = list(islice(emails, batch_size))
+            if not chunk:
+                break
+            hashes = [hash_email(email) for email in chunk if email and email.strip()]
+            emails_count += len(hashes)
+            self.bulk_create([self.model(email_hash=email_hash, reason=reason) for email_hash in set(hashes)],
+                             ignore_conflicts=True)
+        return emails_count
+
+    def get_suppressed_emails(self, emails: Iterable[str]) -> Set[str]:
+        """
+        Look up a batch of email addresses with a single query.
+
+        :return: The email addresses within `emails` that are suppressed
+        """
+        hashes = dict()
+        for email in emails:
+            hashes.setdefault(hash_email(email), list()).append(email)
+        suppressed = self.filter(email_hash__in=hashes.keys()).values_list('email_hash', flat=True)
+        return {email for email_hash in suppressed for email in hashes[email_hash]}
+
+    def is_suppressed(self, email: str) -> bool:
+        return self.filter(email_hash=hash_email(email)).exists()
+
+
+class Suppression(models.Model):
+    """
+    Email addresses that must not receive any campaign, whatever the mailing
+    list. Only the SHA-256 digest of the lowercased address is stored: it has
+    a fixed width, which keeps the unique index compact, and the addresses
+    themselves are not kept once suppressed.
+    """
+    email_hash = models.CharField(_('email hash'), max_length=64, unique=True)
+    reason = models.PositiveSmallIntegerField(_('reason'), choices=SuppressionReasons.CHOICES)
+    create_date = models.DateTimeField(_('create date'), auto_now_add=True)
+
+    objects = SuppressionManager()
+
+    class Meta:
+        verbose_name = _('suppression')
+        verbose_name_plural = _('suppressions')
+        db_table = 'colossus_suppressions'
+
+    def __str__(self):
+        return self.email_hash
+
+
+class WebhookEvent(models.Model):
+    """
+    Queue of the events pushed by the email service provider webhooks. The
+    webhook view only appends the payload here; `process_webhook_events`
+    applies the queued events in batches and deletes them. The events which
+    fail to apply are retried up to `COLOSSUS_WEBHOOK_MAX_ATTEMPTS` times,
+    and then kept with their last error for inspection.
+    """
+    provider = models.CharField(_('provider'), max_length=30, choices=WebhookProviders.CHOICES)
+    payload = models.TextField(_('payload'))
+    received_date = models.DateTimeField(_('received date'), auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    error = models.TextField(_('error'), blank=True)
+
+    class Meta:
+        verbose_name = _('webhook event')
+        verbose_name_plural = _('webhook events')
+        db_table = 'colossus_webhook_events'
+
+    def __str__(self):
+        return '%s event %s' % (self.get_provider_display(), self.pk)
+
+    def set_payload(self, payload: Dict):
+        self.payload = json.dumps(payload)
+
+    def get_payload(self) -> Dict:
+        return json.loads(self.payload)
+
+
 class SubscriptionFormTemplate(models.Model):
     key = models.CharField(_('key'), choices=TemplateKeys.CHOICES, max_length=30, db_index=True)
     mailing_list = models.ForeignKey(
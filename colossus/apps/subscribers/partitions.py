@@ -0,0 +1,209 @@
+"""
+Helpers to manage the monthly partitions of the activities table.
+
+Declarative partitioning is only available on PostgreSQL 11 or newer. On any
+other database (or when the table was never converted using the
+`partitionactivities` management command) the activities are stored in a
+regular table and the functions in this module are no-ops.
+"""
+import datetime
+import logging
+import re
+from typing import List, Optional
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+ACTIVITIES_TABLE = 'colossus_activities'
+
+LEGACY_TABLE = 'colossus_activities_legacy'
+
+DEFAULT_PARTITION = 'colossus_activities_default'
+
+PARTITION_NAME_RE = re.compile(r'^%s_y(?P<year>\d{4})m(?P<month>\d{2})$' % ACTIVITIES_TABLE)
+
+
+def month_start(date: datetime.date) -> datetime.date:
+    return datetime.date(date.year, date.month, 1)
+
+
+def add_months(date: datetime.date, months: int) -> datetime.date:
+    """
+    Return the first day of the month `months` away from `date`. The number
+    of months can be negative.
+    """
+    index = date.year * 12 + (date.month - 1) + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def get_partition_name(month: datetime.date) -> str:
+    return '%s_y%04dm%02d' % (ACTIVITIES_TABLE, month.year, month.month)
+
+
+def parse_partition_name(name: str) -> Optional[datetime.date]:
+    match = PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    return datetime.date(int(match.group('year')), int(match.group('month')), 1)
+
+
+def supports_partitioning() -> bool:
+    return connection.vendor == 'postgresql' and connection.pg_version >= 110000
+
+
+def is_partitioned() -> bool:
+    """
+    Check if the activities table was converted into a partitioned table.
+    """
+    if not supports_partitioning():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT 1
+              FROM pg_partitioned_table p
+              JOIN pg_class c ON c.oid = p.partrelid
+             WHERE c.relname = %s
+        ''', [ACTIVITIES_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_partitions() -> List[datetime.date]:
+    """
+    List the monthly partitions attached to the activities table, sorted
+    from the oldest to the newest. The default partition is not included.
+    """
+    if not is_partitioned():
+        return list()
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT c.relname
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+              JOIN pg_class p ON p.oid = i.inhparent
+             WHERE p.relname = %s
+        ''', [ACTIVITIES_TABLE])
+        months = [parse_partition_name(row[0]) for row in cursor.fetchall()]
+    return sorted(month for month in months if month is not None)
+
+
+def create_partition(month: datetime.date) -> str:
+    name = get_partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)' % (
+            connection.ops.quote_name(name),
+            connection.ops.quote_name(ACTIVITIES_TABLE),
+        ), [month.isoformat(), add_months(month, 1).isoformat()])
+    return name
+
+
+def ensure_partitions(months_ahead: int = 2) -> List[str]:
+    """
+    Make sure there is a partition for the current month and for the next
+    `months_ahead` months, so the inserts never fall back to the default
+    partition.
+
+    :param months_ahead: Number of future months to create partitions for
+    :return: The names of the partitions checked/created
+    """
+    if not is_partitioned():
+        return list()
+    current_month = month_start(datetime.date.today())
+    return [create_partition(add_months(current_month, i)) for i in range(months_ahead + 1)]
+
+
+def detach_partition(month: datetime.date, drop: bool = True) -> str:
+    name = connection.ops.quote_name(get_partition_name(month))
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (connection.ops.quote_name(ACTIVITIES_TABLE), name))
+        if drop:
+            cursor.execute('DROP TABLE %s' % name)
+    return name
+
+
+def convert_to_partitioned_table(months_ahead: int = 2) -> int:
+    """
+    Convert the regular activities table into a table partitioned by month
+    on the `date` column.
+
+    The existing table is renamed, a partitioned table with the same columns,
+    indexes and foreign keys is created in its place, one partition is created
+    for each month with data and finally the rows are copied over. Everything
+    runs inside a single transaction and the table is locked for the duration
+    of the copy, so plan for a maintenance window on large tables.
+
+    Because PostgreSQL requires the partition key to be part of the primary
+    key, the primary key of the partitioned table is (id, date).
+
+    :param months_ahead: Number of future months to create partitions for
+    :return: Number of rows moved to the partitioned table
+    """
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE %s IN ACCESS EXCLUSIVE MODE' % qn(ACTIVITIES_TABLE))
+
+        cursor.execute('''
+            SELECT i.indexname, i.indexdef
+              FROM pg_indexes i
+             WHERE i.tablename = %s
+               AND i.indexname NOT IN (
+                   SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+               )
+        ''', [ACTIVITIES_TABLE, ACTIVITIES_TABLE])
+        indexes = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT conname, pg_get_constraintdef(oid)
+              FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype IN ('f', 'c')
+        ''', [ACTIVITIES_TABLE])
+        constraints = cursor.fetchall()
+
+        cursor.execute('ALTER TABLE %s RENAME TO %s' % (qn(ACTIVITIES_TABLE), qn(LEGACY_TABLE)))
+        for index_name, index_definition in indexes:
+            cursor.execute('ALTER INDEX %s RENAME TO %s' % (qn(index_name), qn(index_name[:50] + '_legacy')))
+        for constraint_name, constraint_definition in constraints:
+            cursor.execute('ALTER TABLE %s RENAME CONSTRAINT %s TO %s' % (
+                qn(LEGACY_TABLE), qn(constraint_name), qn(constraint_name[:50] + '_legacy')
+            ))
+
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) PARTITION BY RANGE (%s)' % (
+            qn(ACTIVITIES_TABLE), qn(LEGACY_TABLE), qn('date')
+        ))
+        cursor.execute('ALTER TABLE %s ADD PRIMARY KEY (%s, %s)' % (qn(ACTIVITIES_TABLE), qn('id'), qn('date')))
+
+        # The id sequence is owned by the legacy table. Transfer the ownership
+        # otherwise it would be dropped together with the legacy table.
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [LEGACY_TABLE])
+        sequence_name = cursor.fetchone()[0]
+        if sequence_name is not None:
+            cursor.execute('ALTER SEQUENCE %s OWNED BY %s.%s' % (sequence_name, qn(ACTIVITIES_TABLE), qn('id')))
+
+        for index_name, index_definition in indexes:
+            if index_definition.startswith('CREATE UNIQUE'):
+                logger.warning('Skipping unique index "%s": unique indexes must include the partition key.'
+                               % index_name)
+                continue
+            cursor.execute(index_definition)
+
+        for constraint_name, constraint_definition in constraints:
+            cursor.execute('ALTER TABLE %s ADD CONSTRAINT %s %s' % (
+                qn(ACTIVITIES_TABLE), qn(constraint_name), constraint_definition
+            ))
+
+        cursor.execute('CREATE TABLE %s PARTITION OF %s DEFAULT' % (qn(DEFAULT_PARTITION), qn(ACTIVITIES_TABLE)))
+
+        cursor.execute('SELECT MIN(%s) FROM %s' % (qn('date'), qn(LEGACY_TABLE)))
+        oldest_date = cursor.fetchone()[0]
+        current_month = month_start(datetime.date.today())
+        month = month_start(oldest_date.date()) if oldest_date is not None else current_month
+        while month <= add_months(current_month, months_ahead):
+            create_partition(month)
+            month = add_months(month, 1)
+
+        cursor.execute('INSERT INTO %s SELECT * FROM %s' % (qn(ACTIVITIES_TABLE), qn(LEGACY_TABLE)))
+        moved_rows = cursor.rowcount
+        cursor.execute('DROP TABLE %s' % qn(LEGACY_TABLE))
+
+    return moved_rows
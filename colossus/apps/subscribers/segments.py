@@ -0,0 +1,120 @@
+"""
+Compile the filters of a segment into a single `Q` object.
+
+A segment filter is a dict like::
+
+    {"field": "open_rate", "operator": "gte", "value": 0.25}
+
+The filters are combined with AND or OR (see `SegmentMatch`) and applied on
+top of the active subscribers of the mailing list, so a segment is always one
+query. Filters on related tables (tags, domains, countries) are written as
+`pk IN (subquery)` instead of joins, so a subscriber is never returned twice
+and the conditions can be freely combined with OR.
+"""
+import datetime
+import operator
+from functools import reduce
+from typing import Any, Dict, Iterable, List
+
+from django.apps import apps
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from colossus.apps.subscribers.constants import SegmentFields, SegmentMatch
+from colossus.apps.subscribers.exceptions import InvalidSegmentFilter
+
+
+def _get_list(value: Any, item_type: type) -> List:
+    """
+    Check the `value` is a non-empty list of `item_type` values, e.g. tag ids
+    or country codes.
+    """
+    if not isinstance(value, list) or not value:
+        raise InvalidSegmentFilter('Expected a non-empty list, got "%s".' % value)
+    for item in value:
+        if isinstance(item, bool) or not isinstance(item, item_type):
+            raise InvalidSegmentFilter('Expected a list of %s, got "%s".' % (
+                'ids' if item_type is int else 'names', value
+            ))
+    return value
+
+
+def _get_number(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidSegmentFilter('Expected a number, got "%s".' % value)
+    return value
+
+
+def _get_datetime(value: Any) -> datetime.datetime:
+    parsed = None
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            if date is not None:
+                parsed = datetime.datetime.combine(date, datetime.time.min)
+    if parsed is None:
+        raise InvalidSegmentFilter('Expected an ISO 8601 date, got "%s".' % value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def _get_days_ago(value: Any) -> datetime.datetime:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidSegmentFilter('Expected a positive number of days, got "%s".' % value)
+    return timezone.now() - datetime.timedelta(days=value)
+
+
+def _get_related_filter(field: str, value: Any) -> Q:
+    Subscriber = apps.get_model('subscribers', 'Subscriber')
+    values = _get_list(value, int if field in (SegmentFields.TAGS, SegmentFields.CITY) else str)
+    if field == SegmentFields.TAGS:
+        tagged = Subscriber.tags.through.objects.filter(tag_id__in=values).values('subscriber_id')
+        return Q(pk__in=tagged)
+    if field == SegmentFields.DOMAIN:
+        Domain = apps.get_model('subscribers', 'Domain')
+        names = ['@' + name.strip().lstrip('@').lower() for name in values]
+        return Q(domain_id__in=Domain.objects.filter(name__in=names).values('pk'))
+    if field == SegmentFields.CITY:
+        return Q(location_id__in=values)
+    City = apps.get_model('core', 'City')
+    codes = [code.strip().upper() for code in values]
+    return Q(location_id__in=City.objects.filter(country__code__in=codes).values('pk'))
+
+
+def compile_segment_filter(segment_filter: Dict) -> Q:
+    if not isinstance(segment_filter, dict):
+        raise InvalidSegmentFilter('Expected a filter object, got "%s".' % segment_filter)
+    field = segment_filter.get('field')
+    lookup = segment_filter.get('operator')
+    value = segment_filter.get('value')
+    if lookup not in SegmentFields.OPERATORS.get(field, ()):
+        raise InvalidSegmentFilter('Invalid operator "%s" for the field "%s".' % (lookup, field))
+
+    if field in (SegmentFields.TAGS, SegmentFields.DOMAIN, SegmentFields.CITY, SegmentFields.COUNTRY):
+        condition = _get_related_filter(field, value)
+        return ~condition if lookup == 'not_in' else condition
+
+    if field in (SegmentFields.OPEN_RATE, SegmentFields.CLICK_RATE):
+        return Q(**{'%s__%s' % (field, lookup): _get_number(value)})
+
+    # Date fields. A subscriber never seen is considered as seen long ago.
+    if lookup == 'before':
+        return ~Q(**{'%s__gte' % field: _get_datetime(value)})
+    if lookup == 'after':
+        return Q(**{'%s__gte' % field: _get_datetime(value)})
+    condition = Q(**{'%s__gte' % field: _get_days_ago(value)})
+    return ~condition if lookup == 'not_within_days' else condition
+
+
+def compile_segment_filters(segment_filters: Iterable[Dict], match: int = SegmentMatch.ALL) -> Q:
+    """
+    :raises InvalidSegmentFilter: If any of the filters is malformed
+    """
+    conditions = [compile_segment_filter(segment_filter) for segment_filter in segment_filters]
+    if not conditions:
+        return Q()
+    combine = operator.or_ if match == SegmentMatch.ANY else operator.and_
+    return reduce(combine, conditions)
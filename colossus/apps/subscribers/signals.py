@@ -0,0 +1,16 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from colossus.apps.subscribers.models import AudienceBitmap, Subscriber
+
+
+@receiver(m2m_changed, sender=Subscriber.tags.through)
+def invalidate_tags_bitmaps(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # The subscribers of a tag were changed.
+        AudienceBitmap.objects.invalidate(instance.mailing_list_id, tag_ids=[instance.pk])
+    else:
+        # The tags of a subscriber were changed. The tags are unknown when cleared.
+        AudienceBitmap.objects.invalidate(instance.mailing_list_id, tag_ids=pk_set)
@@ -1,14 +1,16 @@
 import logging
 
 from django.apps import apps
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
 
 from celery import shared_task
 
 from colossus.apps.lists.models import MailingList
+from colossus.apps.subscribers import partitions
 from colossus.apps.subscribers.constants import ActivityTypes
-from colossus.utils import get_location
+from colossus.utils import get_location_id
 
 logger = logging.getLogger(__name__)
 
@@ -72,19 +74,83 @@ def update_rates_after_subscriber_deletion(mailing_list_id, email_ids, link_ids)
         link.update_clicks_count()
 
 
+@shared_task
+def update_rates_after_events(subscriber_ids, email_ids, link_ids):
+    """
+    Refresh the rates and counters once for a whole batch of opens and clicks
+    reported by the email service provider.
+    """
+    Subscriber = apps.get_model('subscribers', 'Subscriber')
+    subscribers = Subscriber.objects.filter(pk__in=subscriber_ids)
+    for subscriber in subscribers:
+        subscriber.update_open_and_click_rate()
+    for mailing_list in MailingList.objects.filter(pk__in={subscriber.mailing_list_id for subscriber in subscribers}):
+        mailing_list.update_open_and_click_rate()
+
+    Email = apps.get_model('campaigns', 'Email')
+    for email in Email.objects.filter(pk__in=email_ids).select_related('campaign'):
+        email.update_opens_count()
+        email.update_clicks_count()
+        email.campaign.update_opens_count_and_rate()
+        email.campaign.update_clicks_count_and_rate()
+
+    Link = apps.get_model('campaigns', 'Link')
+    for link in Link.objects.filter(pk__in=link_ids).only('pk'):
+        link.update_clicks_count()
+
+
 @shared_task
 def update_subscriber_location(ip_address, subscriber_id):
-    location = get_location(ip_address)
-    if location is not None:
+    location_id = get_location_id(ip_address)
+    if location_id is not None:
         Subscriber = apps.get_model('subscribers', 'Subscriber')
 
         subscriber = Subscriber.objects.get(pk=subscriber_id)
 
-        if subscriber.last_seen_ip_address == ip_address and subscriber.location_id != location.pk:
-            subscriber.location = location
+        if subscriber.last_seen_ip_address == ip_address and subscriber.location_id != location_id:
+            subscriber.location_id = location_id
             subscriber.save(update_fields=['location'])
 
         subscriber.activities \
             .filter(ip_address=ip_address) \
             .filter(Q(location=None) | Q(activity_type=ActivityTypes.OPENED)) \
-            .update(location=location)
+            .update(location_id=location_id)
+
+
+@shared_task
+def ensure_activity_partitions_task():
+    names = partitions.ensure_partitions()
+    return 'Activity partitions ready: %s' % ', '.join(names)
+
+
+@shared_task
+def refresh_segment_members(segment_id):
+    Segment = apps.get_model('subscribers', 'Segment')
+    try:
+        segment = Segment.objects.select_related('mailing_list').get(pk=segment_id)
+    except Segment.DoesNotExist:
+        logger.warning('Segment %s does not exist, skipping refresh.' % segment_id)
+        return
+    added, removed = segment.refresh_members()
+    return 'Segment "%s" refreshed: %s added, %s removed' % (segment.name, added, removed)
+
+
+@shared_task
+def ingest_mailgun_events_task():
+    if not settings.MAILGUN_API_KEY:
+        return 'Mailgun is not configured, skipping events ingestion.'
+    from colossus.apps.subscribers.events import poll_mailgun_events
+    activities_count = poll_mailgun_events()
+    return 'Mailgun events ingested: %s activities created' % activities_count
+
+
+@shared_task
+def process_webhook_events_task():
+    from colossus.apps.subscribers.webhooks import process_webhook_events
+    events_count = 0
+    while True:
+        processed = process_webhook_events()
+        if not processed:
+            break
+        events_count += processed
+    return 'Webhook events processed: %s' % events_count
@@ -1,9 +1,14 @@
 from colossus.apps.campaigns.tests.factories import (
     CampaignFactory, EmailFactory, LinkFactory,
 )
-from colossus.apps.subscribers.activities import render_activity
+from colossus.apps.subscribers.activities import (
+    render_activities, render_activity,
+)
 from colossus.apps.subscribers.constants import ActivityTypes
-from colossus.apps.subscribers.tests.factories import ActivityFactory
+from colossus.apps.subscribers.models import Activity
+from colossus.apps.subscribers.tests.factories import (
+    ActivityFactory, SubscriberFactory,
+)
 from colossus.test.testcases import TestCase
 
 
@@ -24,3 +29,31 @@ class RenderActivityTests(TestCase):
                 activity = ActivityFactory(activity_type=activity_type, email=self.email, link=self.link)
                 activity.activity_type = activity_type
                 self.assertNotEqual('', render_activity(activity))
+
+
+class RenderActivitiesTests(TestCase):
+    def setUp(self):
+        self.subscriber = SubscriberFactory()
+        for i in range(5):
+            link = LinkFactory()
+            ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.SENT, email=link.email)
+            ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.CLICKED,
+                            email=link.email, link=link)
+            ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.UNSUBSCRIBED,
+                            campaign=link.email.campaign)
+
+    def test_related_objects_fetched_in_bulk(self):
+        """
+        One query for the activities plus one query per relation used by the
+        renderers, regardless of the number of activities.
+        """
+        with self.assertNumQueries(9):
+            activities = render_activities(Activity.objects.all())
+            html = [activity.as_html for activity in activities]
+        self.assertEqual(15, len(html))
+
+    def test_same_output_as_render_activity(self):
+        activities = render_activities(Activity.objects.order_by('pk'))
+        for activity in Activity.objects.order_by('pk'):
+            with self.subTest(activity=activity.pk):
+                self.assertEqual(render_activity(activity), activities.pop(0).as_html)
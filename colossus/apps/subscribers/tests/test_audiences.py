@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.audiences import (
+    get_audience, iter_audience_querysets,
+)
+from colossus.apps.subscribers.constants import Status
+from colossus.apps.subscribers.models import AudienceBitmap, Subscriber, Tag
+from colossus.bitmaps import RoaringBitmap
+
+from .factories import SubscriberFactory
+
+
+class AudienceTests(TransactionTestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.tag_a = Tag.objects.create(name='a', mailing_list=self.mailing_list)
+        self.tag_b = Tag.objects.create(name='b', mailing_list=self.mailing_list)
+        self.tag_c = Tag.objects.create(name='c', mailing_list=self.mailing_list)
+        self.subscribers = SubscriberFactory.create_batch(4, mailing_list=self.mailing_list)
+        first, second, third, fourth = self.subscribers
+        first.tags.add(self.tag_a, self.tag_b)
+        second.tags.add(self.tag_a, self.tag_b, self.tag_c)
+        third.tags.add(self.tag_a)
+        fourth.tags.add(self.tag_a, self.tag_b)
+        fourth.status = Status.UNSUBSCRIBED
+        fourth.save()
+
+    def test_tags_algebra(self):
+        audience = get_audience(self.mailing_list.pk, all_tags=[self.tag_a, self.tag_b], exclude_tags=[self.tag_c])
+        self.assertEqual([self.subscribers[0].pk], list(audience))
+        audience = get_audience(self.mailing_list.pk, status=None, any_tags=[self.tag_b, self.tag_c])
+        self.assertEqual(3, len(audience))
+
+    def test_bitmaps_are_stored_and_invalidated(self):
+        self.assertEqual(3, len(get_audience(self.mailing_list.pk, all_tags=[self.tag_a])))
+        self.assertEqual(2, AudienceBitmap.objects.count())
+        new_subscriber = SubscriberFactory(mailing_list=self.mailing_list)
+        self.assertFalse(AudienceBitmap.objects.filter(status=Status.SUBSCRIBED).exists())
+        new_subscriber.tags.add(self.tag_a)
+        self.assertFalse(AudienceBitmap.objects.filter(tag=self.tag_a).exists())
+        self.assertEqual(4, len(get_audience(self.mailing_list.pk, all_tags=[self.tag_a])))
+        self.tag_a.subscribers.remove(new_subscriber)
+        self.assertEqual(3, len(get_audience(self.mailing_list.pk, all_tags=[self.tag_a])))
+
+    def test_iter_audience_querysets(self):
+        audience = get_audience(self.mailing_list.pk)
+        querysets = list(iter_audience_querysets(Subscriber.objects.order_by('pk'), audience, batch_size=2))
+        self.assertEqual(2, len(querysets))
+        self.assertEqual(self.subscribers[:3], [subscriber for queryset in querysets for subscriber in queryset])
+
+
+class AudienceBitmapBuildTests(TransactionTestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.subscriber = SubscriberFactory(mailing_list=self.mailing_list)
+
+    def build_during(self, change):
+        """
+        Build the SUBSCRIBED bitmap, running `change` (committed right away)
+        once the primary keys are read but before the bitmap is stored.
+        """
+        def build(pks):
+            bitmap = RoaringBitmap(pks)
+            change()
+            return bitmap
+        with mock.patch('colossus.apps.subscribers.models.RoaringBitmap', side_effect=build):
+            return AudienceBitmap.objects.get_status_bitmap(self.mailing_list.pk, Status.SUBSCRIBED)
+
+    def test_bitmap_stored(self):
+        self.assertEqual([self.subscriber.pk], list(get_audience(self.mailing_list.pk)))
+        audience_bitmap = AudienceBitmap.objects.get(status=Status.SUBSCRIBED)
+        self.assertEqual([self.subscriber.pk], list(audience_bitmap.get_bitmap()))
+        self.assertEqual(1, audience_bitmap.cardinality)
+
+    def test_subscriber_added_during_build(self):
+        new_subscribers = list()
+        bitmap = self.build_during(lambda: new_subscribers.append(SubscriberFactory(mailing_list=self.mailing_list)))
+        self.assertEqual([self.subscriber.pk], list(bitmap))
+        self.assertFalse(AudienceBitmap.objects.filter(status=Status.SUBSCRIBED, data__isnull=False).exists())
+        self.assertEqual([self.subscriber.pk, new_subscribers[0].pk], list(get_audience(self.mailing_list.pk)))
+
+    def test_subscriber_unsubscribed_during_build(self):
+        def unsubscribe():
+            self.subscriber.status = Status.UNSUBSCRIBED
+            self.subscriber.save()
+        self.build_during(unsubscribe)
+        self.assertEqual([], list(get_audience(self.mailing_list.pk)))
+
+    def test_claimed_bitmap_dropped_on_commit(self):
+        with transaction.atomic():
+            SubscriberFactory(mailing_list=self.mailing_list)
+            # Claimed by a concurrent build, after the first invalidation
+            AudienceBitmap.objects.create(mailing_list=self.mailing_list, status=Status.SUBSCRIBED)
+        self.assertFalse(AudienceBitmap.objects.exists())
+
+    def test_not_stored_within_transaction(self):
+        with transaction.atomic():
+            self.assertEqual([self.subscriber.pk], list(get_audience(self.mailing_list.pk)))
+        self.assertFalse(AudienceBitmap.objects.exists())
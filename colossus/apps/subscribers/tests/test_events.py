@@ -0,0 +1,133 @@
+import datetime
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from colossus.apps.campaigns.tests.factories import (
+    CampaignFactory, EmailFactory, LinkFactory,
+)
+from colossus.apps.core.models import Option
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers import events
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import Activity, DailyActivity
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.test.testcases import TestCase
+
+TIMESTAMP = 1539993600.5
+
+
+class IngestEventsTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.campaign = CampaignFactory(mailing_list=self.mailing_list)
+        self.email = EmailFactory(campaign=self.campaign)
+        self.link = LinkFactory(email=self.email, url='https://example.com/')
+        self.subscriber = SubscriberFactory(mailing_list=self.mailing_list)
+
+    def event(self, event_id, event_type, **kwargs):
+        event = {
+            'id': event_id,
+            'event': event_type,
+            'timestamp': TIMESTAMP,
+            'recipient': self.subscriber.email,
+            'user-variables': {
+                'colossus_email': str(self.email.uuid),
+                'colossus_subscriber': str(self.subscriber.uuid),
+            },
+        }
+        event.update(kwargs)
+        return event
+
+    def test_activities_created(self):
+        count = events.ingest_events([
+            self.event('a', 'delivered'),
+            self.event('b', 'failed', severity='permanent', **{'delivery-status': {'message': 'No such user'}}),
+            self.event('c', 'failed', severity='temporary'),
+            self.event('d', 'opened', ip='203.0.113.7'),
+            self.event('e', 'clicked', url='https://example.com/', ip='203.0.113.7'),
+            self.event('f', 'accepted'),
+        ])
+        self.assertEqual(4, count)
+        activities = {activity.external_id: activity for activity in Activity.objects.all()}
+        self.assertEqual(['a', 'b', 'd', 'e'], sorted(activities.keys()))
+        self.assertEqual(ActivityTypes.DELIVERED, activities['a'].activity_type)
+        self.assertEqual('No such user', activities['b'].description)
+        self.assertEqual('203.0.113.7', activities['d'].ip_address)
+        self.assertEqual(self.link.pk, activities['e'].link_id)
+        expected_date = datetime.datetime.fromtimestamp(TIMESTAMP, tz=timezone.utc)
+        self.assertTrue(all(activity.date == expected_date for activity in activities.values()))
+        daily_activity = DailyActivity.objects.get(campaign=self.campaign, activity_type=ActivityTypes.DELIVERED)
+        self.assertEqual((self.mailing_list.pk, timezone.localdate(expected_date), 1),
+                         (daily_activity.mailing_list_id, daily_activity.day, daily_activity.count))
+
+    def test_click_matched_by_tracking_url(self):
+        url = 'https://colossus.example.com/track/click/%s/%s/' % (self.link.uuid, self.subscriber.uuid)
+        events.ingest_events([self.event('a', 'clicked', url=url)])
+        self.assertEqual(self.link.pk, Activity.objects.get().link_id)
+
+    def test_duplicated_events_skipped(self):
+        batch = [self.event('a', 'delivered'), self.event('a', 'delivered'), self.event('b', 'opened')]
+        self.assertEqual(2, events.ingest_events(batch))
+        self.assertEqual(0, events.ingest_events(batch))
+        self.assertEqual(2, Activity.objects.count())
+
+    def test_tracked_opens_not_counted_twice(self):
+        self.subscriber.open(self.email)
+        self.assertEqual(0, events.ingest_events([self.event('a', 'opened'), self.event('b', 'opened')]))
+        self.assertEqual(1, Activity.objects.filter(activity_type=ActivityTypes.OPENED).count())
+
+    def test_unknown_recipients_skipped(self):
+        unknown = self.event('a', 'delivered')
+        unknown['user-variables'] = {'colossus_email': str(self.email.uuid), 'colossus_subscriber': 'invalid'}
+        no_variables = self.event('b', 'delivered')
+        del no_variables['user-variables']
+        self.assertEqual(0, events.ingest_events([unknown, no_variables]))
+
+    def test_rates_updated(self):
+        events.ingest_events([self.event('a', 'delivered'), self.event('b', 'opened')])
+        self.email.refresh_from_db()
+        self.assertEqual(1, self.email.unique_opens_count)
+
+    def test_checkpoint_saved(self):
+        events.ingest_events([self.event('a', 'delivered')], checkpoint=TIMESTAMP)
+        self.assertEqual(TIMESTAMP, events.get_checkpoint())
+
+
+@override_settings(MAILGUN_EVENTS_SETTLE_TIME=1800, MAILGUN_EVENTS_INITIAL_LOOKBACK=3600)
+class PollMailgunEventsTests(TestCase):
+    def setUp(self):
+        self.email = EmailFactory()
+        self.subscriber = SubscriberFactory()
+        self.events = [
+            {'id': str(index), 'event': 'delivered', 'timestamp': TIMESTAMP + index, 'user-variables': {
+                'colossus_email': str(self.email.uuid),
+                'colossus_subscriber': str(self.subscriber.uuid),
+            }} for index in range(5)
+        ]
+        patcher = mock.patch('colossus.apps.core.mailgun.Mailgun.events', return_value=iter(self.events))
+        self.mailgun_events = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('colossus.apps.subscribers.events.time.time', return_value=TIMESTAMP + 7200)
+    def test_first_poll(self, time):
+        self.assertEqual(5, events.poll_mailgun_events(batch_size=2))
+        params = self.mailgun_events.call_args[0][0]
+        self.assertEqual((TIMESTAMP + 3600, TIMESTAMP + 5400), (params['begin'], params['end']))
+        self.assertEqual('yes', params['ascending'])
+        self.assertEqual(TIMESTAMP + 5400, events.get_checkpoint())
+
+    @mock.patch('colossus.apps.subscribers.events.time.time', return_value=TIMESTAMP + 7200)
+    def test_poll_from_checkpoint(self, time):
+        events.set_checkpoint(TIMESTAMP)
+        events.poll_mailgun_events()
+        self.assertEqual(TIMESTAMP, self.mailgun_events.call_args[0][0]['begin'])
+
+    @mock.patch('colossus.apps.subscribers.events.time.time', return_value=TIMESTAMP + 7200)
+    def test_checkpoint_kept_on_failure(self, time):
+        with mock.patch('colossus.apps.subscribers.events.build_activities', side_effect=[[], RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                events.poll_mailgun_events(batch_size=2)
+        self.assertEqual(TIMESTAMP + 1, events.get_checkpoint())
+        self.assertEqual(1, Option.objects.filter(key=events.CHECKPOINT_OPTION_KEY).count())
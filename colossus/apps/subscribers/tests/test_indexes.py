@@ -0,0 +1,43 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import ProgrammingError, connection
+from django.test import TransactionTestCase
+
+from colossus.apps.subscribers.indexes import (
+    EXPRESSION_INDEXES, create_expression_index,
+)
+from colossus.apps.subscribers.models import Activity, Subscriber
+from colossus.test.testcases import TestCase
+
+
+class CreateExpressionIndexTests(TestCase):
+    def setUp(self):
+        def execute(sql):
+            if sql.startswith('CREATE EXTENSION'):
+                raise ProgrammingError('permission denied to create extension "pg_trgm"')
+        self.schema_editor = mock.Mock(connection=mock.Mock(vendor='postgresql', alias=connection.alias))
+        self.schema_editor.execute.side_effect = execute
+
+    def test_trigram_index_skipped_without_extension(self):
+        with self.assertLogs('colossus.apps.subscribers.indexes', 'WARNING'):
+            create_expression_index(self.schema_editor, 'colossus_sub_email_trgm_idx')
+        self.assertNotIn(
+            mock.call(EXPRESSION_INDEXES['colossus_sub_email_trgm_idx']),
+            self.schema_editor.execute.call_args_list
+        )
+
+    def test_index_without_extension(self):
+        create_expression_index(self.schema_editor, 'colossus_sub_upper_email_idx')
+        self.schema_editor.execute.assert_called_once_with(EXPRESSION_INDEXES['colossus_sub_upper_email_idx'])
+
+
+class BenchmarkQueriesCommandTests(TransactionTestCase):
+    def test_seeded_data_rolled_back(self):
+        out = StringIO()
+        call_command('benchmarkqueries', lists=1, subscribers=10, activities=2, repeat=1, stdout=out)
+        self.assertIn('without indexes', out.getvalue())
+        self.assertIn('with indexes', out.getvalue())
+        self.assertFalse(Subscriber.objects.exists())
+        self.assertFalse(Activity.objects.exists())
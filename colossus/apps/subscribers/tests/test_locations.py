@@ -0,0 +1,81 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from geoip2.errors import AddressNotFoundError
+
+from colossus.apps.core.models import City
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers import locations
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import Activity, Subscriber
+from colossus.utils import get_geoip_locator
+
+from .factories import ActivityFactory, SubscriberFactory
+
+GEODATA = {
+    '203.0.113.1': {'country_code': 'CA', 'country_name': 'Canada', 'city': 'Vancouver'},
+    '203.0.113.2': {'country_code': 'CA', 'country_name': 'Canada', 'city': 'Montreal'},
+    '203.0.113.3': {'country_code': 'CA', 'country_name': 'Canada', 'city': None},
+}
+
+
+def fake_city(ip_address):
+    if ip_address not in GEODATA:
+        raise AddressNotFoundError('The address %s is not in the database.' % ip_address)
+    return GEODATA[ip_address]
+
+
+class UpdateLocationTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch('colossus.apps.subscribers.locations.GeoIP2')
+        self.geoip2 = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.geoip2.city.side_effect = fake_city
+        locations._geoip2 = None
+        get_geoip_locator().clear()
+        self.mailing_list = MailingListFactory()
+
+    def tearDown(self):
+        locations._geoip2 = None
+        get_geoip_locator().clear()
+
+    def test_resolve_ip_addresses(self):
+        resolved = locations.resolve_ip_addresses(['203.0.113.1', '203.0.113.2', '203.0.113.3'], 1, 2)
+        self.assertEqual(
+            {'203.0.113.1': 'Vancouver', '203.0.113.2': 'Montreal'},
+            {ip_address: City.objects.get(pk=city_id).name for ip_address, city_id in resolved.items()}
+        )
+
+    def test_resolve_ip_addresses_in_parallel(self):
+        ip_addresses = ['203.0.113.1', '203.0.113.2', '203.0.113.3', '198.51.100.1']
+        counts = list()
+        self.assertEqual(
+            locations.resolve_ip_addresses(ip_addresses, 1, 1),
+            locations.resolve_ip_addresses(ip_addresses, 2, 1, counts.append)
+        )
+        self.assertEqual([1, 1, 1, 1], counts)
+
+    def test_update_location(self):
+        subscriber = SubscriberFactory(mailing_list=self.mailing_list, confirm_ip_address='203.0.113.1')
+        seen_subscriber = SubscriberFactory(mailing_list=self.mailing_list, confirm_ip_address='203.0.113.1',
+                                            last_seen_ip_address='203.0.113.2')
+        unknown_subscriber = SubscriberFactory(mailing_list=self.mailing_list, confirm_ip_address='198.51.100.1')
+        activity = ActivityFactory(subscriber=subscriber, activity_type=ActivityTypes.OPENED,
+                                   ip_address='203.0.113.2')
+        unknown_activity = ActivityFactory(subscriber=subscriber, activity_type=ActivityTypes.OPENED,
+                                           ip_address='203.0.113.3')
+
+        out = StringIO()
+        call_command('updatelocation', workers=1, chunk_size=2, stdout=out)
+
+        self.assertEqual('Vancouver', Subscriber.objects.get(pk=subscriber.pk).location.name)
+        self.assertEqual('Montreal', Subscriber.objects.get(pk=seen_subscriber.pk).location.name)
+        self.assertIsNone(Subscriber.objects.get(pk=unknown_subscriber.pk).location)
+        self.assertEqual('Montreal', Activity.objects.get(pk=activity.pk).location.name)
+        self.assertIsNone(Activity.objects.get(pk=unknown_activity.pk).location)
+        self.assertEqual(4, self.geoip2.city.call_count)
+        self.assertIn('IP addresses: 4/4', out.getvalue())
+        self.assertIn('2 subscribers and 1 activities', out.getvalue())
@@ -1,11 +1,20 @@
+import tempfile
+from io import StringIO
+
 from django.core import mail
-from django.test import override_settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from colossus.apps.campaigns.tests.factories import EmailFactory, LinkFactory
 from colossus.apps.lists.tests.factories import MailingListFactory
-from colossus.apps.subscribers.constants import ActivityTypes, TemplateKeys
+from colossus.apps.lists.utils import suspend_subscribers_count
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, Status, SuppressionReasons, TemplateKeys,
+)
 from colossus.apps.subscribers.exceptions import FormTemplateIsNotEmail
-from colossus.apps.subscribers.models import Subscriber
+from colossus.apps.subscribers.models import Domain, Subscriber, Suppression
 from colossus.apps.subscribers.subscription_settings import (
     SUBSCRIPTION_FORM_TEMPLATE_SETTINGS,
 )
@@ -14,6 +23,138 @@ from colossus.test.testcases import TestCase
 from .factories import SubscriberFactory, SubscriptionFormTemplateFactory
 
 
+class DomainCacheTests(TransactionTestCase):
+    def setUp(self):
+        Domain.objects.cache.clear()
+        self.mailing_list = MailingListFactory()
+
+    def tearDown(self):
+        Domain.objects.cache.clear()
+
+    def test_get_pk(self):
+        pk = Domain.objects.get_pk('@example.com')
+        self.assertEqual(Domain.objects.get(name='@example.com').pk, pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(pk, Domain.objects.get_pk('@example.com'))
+
+    def test_get_pks(self):
+        domain = Domain.objects.create(name='@example.com')
+        domains = Domain.objects.get_pks(['@example.com', '@colossus.test'])
+        self.assertEqual(domain.pk, domains['@example.com'])
+        self.assertEqual(Domain.objects.get(name='@colossus.test').pk, domains['@colossus.test'])
+        with self.assertNumQueries(0):
+            self.assertEqual(domains, Domain.objects.get_pks(['@example.com', '@colossus.test']))
+
+    def test_not_cached_on_rollback(self):
+        try:
+            with transaction.atomic():
+                Domain.objects.get_pk('@example.com')
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertNotIn('@example.com', Domain.objects.cache)
+
+    def test_subscriber_save(self):
+        subscriber = Subscriber(email='john@colossus.test', mailing_list=self.mailing_list)
+        subscriber.domain = Domain.objects.create(name='@colossus.test')
+        subscriber.save()
+        subscriber.email = 'john@example.com'
+        subscriber.save()
+        subscriber.refresh_from_db()
+        self.assertEqual(Domain.objects.cache.get('@example.com'), subscriber.domain_id)
+
+    def test_delete(self):
+        domain = Domain.objects.get(pk=Domain.objects.get_pk('@example.com'))
+        domain.delete()
+        self.assertNotIn('@example.com', Domain.objects.cache)
+
+
+class SuppressionTests(TestCase):
+    def test_suppress_ignores_existing_addresses(self):
+        Suppression.objects.suppress(['john@example.com'], SuppressionReasons.BOUNCED)
+        Suppression.objects.suppress(['JOHN@example.com ', 'mary@example.com', ''], SuppressionReasons.MANUAL)
+        self.assertEqual(2, Suppression.objects.count())
+        self.assertEqual(SuppressionReasons.BOUNCED, Suppression.objects.order_by('pk').first().reason)
+
+    def test_suppress_after_blank_rows(self):
+        emails = ['john@example.com', '', ' ', None, '', 'mary@example.com', 'Mary@example.com']
+        emails_count = Suppression.objects.suppress(emails, SuppressionReasons.MANUAL, batch_size=2)
+        self.assertEqual(3, emails_count)
+        self.assertEqual(2, Suppression.objects.count())
+        self.assertTrue(Suppression.objects.is_suppressed('mary@example.com'))
+
+    def test_get_suppressed_emails(self):
+        Suppression.objects.suppress(['john@example.com'], SuppressionReasons.COMPLAINED)
+        emails = ['John@Example.com', 'mary@example.com', 'john@example.com']
+        with self.assertNumQueries(1):
+            suppressed = Suppression.objects.get_suppressed_emails(emails)
+        self.assertEqual({'John@Example.com', 'john@example.com'}, suppressed)
+        self.assertTrue(Suppression.objects.is_suppressed('JOHN@EXAMPLE.COM'))
+        self.assertFalse(Suppression.objects.is_suppressed('mary@example.com'))
+
+    def test_load_suppressions_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as csv_file:
+            csv_file.write('Name,Email Address\nJohn,john@example.com\nMary,MARY@example.com\n')
+            csv_file.flush()
+            call_command('loadsuppressions', csv_file.name, reason='complained', stdout=StringIO())
+        self.assertTrue(Suppression.objects.is_suppressed('mary@example.com'))
+        self.assertEqual(
+            [SuppressionReasons.COMPLAINED] * 2,
+            list(Suppression.objects.values_list('reason', flat=True))
+        )
+
+
+class SubscriberSubscribersCountTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.subscriber = SubscriberFactory(mailing_list=self.mailing_list, status=Status.SUBSCRIBED)
+
+    def get_subscribers_count(self):
+        self.mailing_list.refresh_from_db()
+        return self.mailing_list.subscribers_count
+
+    def test_create_subscribed(self):
+        self.assertEqual(1, self.get_subscribers_count())
+
+    def test_create_pending(self):
+        SubscriberFactory(mailing_list=self.mailing_list, status=Status.PENDING)
+        self.assertEqual(1, self.get_subscribers_count())
+
+    def test_unsubscribe_and_subscribe_again(self):
+        self.subscriber.status = Status.UNSUBSCRIBED
+        self.subscriber.save()
+        self.assertEqual(0, self.get_subscribers_count())
+        self.subscriber.status = Status.SUBSCRIBED
+        self.subscriber.save()
+        self.assertEqual(1, self.get_subscribers_count())
+
+    def test_status_change_does_not_count_subscribers(self):
+        self.subscriber.status = Status.CLEANED
+        with CaptureQueriesContext(connection) as context:
+            self.subscriber.save()
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+
+    def test_inactive_status_change(self):
+        self.subscriber.status = Status.UNSUBSCRIBED
+        self.subscriber.save()
+        self.subscriber.status = Status.CLEANED
+        self.subscriber.save()
+        self.assertEqual(0, self.get_subscribers_count())
+
+    def test_delete(self):
+        self.subscriber.delete()
+        self.assertEqual(0, self.get_subscribers_count())
+
+    def test_suspend_subscribers_count(self):
+        subscribers = SubscriberFactory.create_batch(3, mailing_list=self.mailing_list, status=Status.PENDING)
+        with suspend_subscribers_count(self.mailing_list):
+            for subscriber in subscribers:
+                subscriber.status = Status.SUBSCRIBED
+                subscriber.save()
+            self.assertEqual(1, self.get_subscribers_count())
+        self.assertEqual(4, self.get_subscribers_count())
+
+
 @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
 class SubscriberOpenEmailTests(TestCase):
     def setUp(self):
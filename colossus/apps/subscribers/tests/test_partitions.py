@@ -0,0 +1,79 @@
+import datetime
+import gzip
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from colossus.apps.subscribers import partitions
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import Activity, ActivityArchive
+from colossus.apps.subscribers.tests.factories import (
+    ActivityFactory, SubscriberFactory,
+)
+from colossus.test.testcases import TestCase
+
+
+class PartitionHelpersTests(TestCase):
+    def test_add_months(self):
+        self.assertEqual(datetime.date(2018, 9, 1), partitions.add_months(datetime.date(2018, 8, 15), 1))
+        self.assertEqual(datetime.date(2019, 1, 1), partitions.add_months(datetime.date(2018, 12, 1), 1))
+        self.assertEqual(datetime.date(2017, 12, 1), partitions.add_months(datetime.date(2018, 1, 31), -1))
+        self.assertEqual(datetime.date(2016, 8, 1), partitions.add_months(datetime.date(2018, 8, 1), -24))
+
+    def test_partition_name(self):
+        name = partitions.get_partition_name(datetime.date(2018, 8, 1))
+        self.assertEqual('colossus_activities_y2018m08', name)
+        self.assertEqual(datetime.date(2018, 8, 1), partitions.parse_partition_name(name))
+
+    def test_parse_default_partition_name(self):
+        self.assertIsNone(partitions.parse_partition_name(partitions.DEFAULT_PARTITION))
+
+    def test_not_partitioned(self):
+        self.assertFalse(partitions.is_partitioned())
+        self.assertEqual([], partitions.ensure_partitions())
+
+
+class ArchiveActivitiesCommandTests(TestCase):
+    def setUp(self):
+        self.subscriber = SubscriberFactory()
+        self.old_activities = ActivityFactory.create_batch(
+            3,
+            subscriber=self.subscriber,
+            activity_type=ActivityTypes.IMPORTED
+        )
+        self.recent_activity = ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.SUBSCRIBED)
+        old_date = timezone.now() - datetime.timedelta(days=800)
+        Activity.objects.filter(pk__in=[activity.pk for activity in self.old_activities]).update(date=old_date)
+
+    def tearDown(self):
+        for archive in ActivityArchive.objects.all():
+            archive.file.delete(save=False)
+
+    def test_archive_old_activities(self):
+        call_command('archiveactivities', months=12, stdout=StringIO())
+        self.assertEqual(1, Activity.objects.count())
+        self.assertTrue(Activity.objects.filter(pk=self.recent_activity.pk).exists())
+
+    def test_archive_summary(self):
+        call_command('archiveactivities', months=12, stdout=StringIO())
+        archive = ActivityArchive.objects.get()
+        self.assertEqual(3, archive.rows_count)
+        self.assertEqual([{
+            'mailing_list_id': self.subscriber.mailing_list_id,
+            'campaign_id': None,
+            'activity_type': ActivityTypes.IMPORTED,
+            'total': 3,
+        }], archive.get_summary())
+
+    def test_archive_file_jsonl(self):
+        call_command('archiveactivities', months=12, format='jsonl', stdout=StringIO())
+        archive = ActivityArchive.objects.get()
+        with archive.file.open('rb') as archive_file:
+            lines = gzip.decompress(archive_file.read()).decode('utf-8').splitlines()
+        self.assertEqual(3, len(lines))
+
+    def test_nothing_to_archive(self):
+        call_command('archiveactivities', months=36, stdout=StringIO())
+        self.assertEqual(4, Activity.objects.count())
+        self.assertFalse(ActivityArchive.objects.exists())
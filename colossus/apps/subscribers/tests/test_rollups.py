@@ -0,0 +1,69 @@
+import datetime
+
+from django.utils import timezone
+
+from colossus.apps.campaigns.tests.factories import EmailFactory
+from colossus.apps.lists.charts import SubscriptionsSummaryChart
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.constants import ActivityTypes
+from colossus.apps.subscribers.models import Activity, DailyActivity
+from colossus.test.testcases import TestCase
+
+from .factories import ActivityFactory, SubscriberFactory
+
+
+class DailyActivityTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.subscriber = SubscriberFactory(mailing_list=self.mailing_list)
+        self.today = timezone.localdate()
+
+    def test_create_activity_increments_rollup(self):
+        self.subscriber.create_activity(ActivityTypes.SUBSCRIBED)
+        SubscriberFactory(mailing_list=self.mailing_list).create_activity(ActivityTypes.SUBSCRIBED)
+        daily_activity = DailyActivity.objects.get()
+        self.assertEqual(self.mailing_list.pk, daily_activity.mailing_list_id)
+        self.assertIsNone(daily_activity.campaign_id)
+        self.assertEqual(self.today, daily_activity.day)
+        self.assertEqual(ActivityTypes.SUBSCRIBED, daily_activity.activity_type)
+        self.assertEqual(2, daily_activity.count)
+
+    def test_campaign_taken_from_email(self):
+        email = EmailFactory()
+        self.subscriber.create_activity(ActivityTypes.SENT, email=email)
+        self.assertEqual(email.campaign_id, DailyActivity.objects.get().campaign_id)
+
+    def test_increment_existing_row(self):
+        DailyActivity.objects.increment(self.mailing_list.pk, None, self.today, ActivityTypes.CLEANED, count=3)
+        DailyActivity.objects.increment(self.mailing_list.pk, None, self.today, ActivityTypes.CLEANED)
+        self.assertEqual(4, DailyActivity.objects.get().count)
+
+    def test_rebuild(self):
+        email = EmailFactory()
+        ActivityFactory.create_batch(3, subscriber=self.subscriber, activity_type=ActivityTypes.OPENED, email=email)
+        ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.SUBSCRIBED)
+        Activity.objects.filter(activity_type=ActivityTypes.SUBSCRIBED) \
+            .update(date=timezone.now() - datetime.timedelta(days=60))
+        self.assertEqual(2, DailyActivity.objects.rebuild())
+        self.assertEqual(3, DailyActivity.objects.get(campaign=email.campaign).count)
+        self.assertEqual(1, DailyActivity.objects.get(activity_type=ActivityTypes.SUBSCRIBED).count)
+
+    def test_rebuild_from_date_keeps_older_rows(self):
+        old_day = self.today - datetime.timedelta(days=60)
+        DailyActivity.objects.increment(self.mailing_list.pk, None, old_day, ActivityTypes.IMPORTED, count=10)
+        ActivityFactory(subscriber=self.subscriber, activity_type=ActivityTypes.SUBSCRIBED)
+        self.assertEqual(1, DailyActivity.objects.rebuild(self.today - datetime.timedelta(days=29)))
+        self.assertEqual(10, DailyActivity.objects.get(day=old_day).count)
+
+
+class SubscriptionsSummaryChartTests(TestCase):
+    def test_chart_data_read_from_rollup(self):
+        mailing_list = MailingListFactory()
+        today = timezone.localdate()
+        DailyActivity.objects.increment(mailing_list.pk, None, today, ActivityTypes.SUBSCRIBED, count=5)
+        DailyActivity.objects.increment(mailing_list.pk, None, today, ActivityTypes.UNSUBSCRIBED, count=2)
+        datasets = SubscriptionsSummaryChart(mailing_list).get_data()['datasets']
+        self.assertEqual(30, len(datasets[0]['data']))
+        self.assertEqual(2, datasets[0]['data'][-1])
+        self.assertEqual(5, datasets[1]['data'][-1])
+        self.assertEqual(5, sum(datasets[1]['data']))
@@ -0,0 +1,108 @@
+import datetime
+
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from colossus.apps.campaigns.constants import CampaignStatus
+from colossus.apps.campaigns.tests.factories import CampaignFactory
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.constants import SegmentMatch, Status
+from colossus.apps.subscribers.exceptions import InvalidSegmentFilter
+from colossus.apps.subscribers.models import Segment, Subscriber, Tag
+from colossus.apps.subscribers.segments import compile_segment_filters
+from colossus.test.testcases import TestCase
+
+from .factories import DomainFactory, SubscriberFactory
+
+
+class SegmentTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.tag = Tag.objects.create(name='vip', mailing_list=self.mailing_list)
+        self.gmail = DomainFactory(name='@gmail.com')
+        self.engaged = SubscriberFactory(mailing_list=self.mailing_list, email='engaged@gmail.com', domain=self.gmail)
+        Subscriber.objects.filter(pk=self.engaged.pk).update(open_rate=0.5, last_seen_date=timezone.now())
+        self.engaged.tags.add(self.tag)
+        self.inactive = SubscriberFactory(
+            mailing_list=self.mailing_list,
+            email='inactive@example.com',
+            domain=DomainFactory(name='@example.com')
+        )
+        self.unsubscribed = SubscriberFactory(
+            mailing_list=self.mailing_list,
+            email='gone@gmail.com',
+            domain=self.gmail,
+            status=Status.UNSUBSCRIBED
+        )
+        self.segment = Segment(mailing_list=self.mailing_list, name='Engaged')
+
+    def get_matching(self, filters, match=SegmentMatch.ALL):
+        self.segment.set_filters(filters)
+        self.segment.match = match
+        return set(self.segment.get_matching_subscribers())
+
+    def test_tags_filter(self):
+        matching = self.get_matching([{'field': 'tags', 'operator': 'in', 'value': [self.tag.pk]}])
+        self.assertEqual({self.engaged}, matching)
+
+    def test_domain_filter(self):
+        matching = self.get_matching([{'field': 'domain', 'operator': 'not_in', 'value': ['gmail.com']}])
+        self.assertEqual({self.inactive}, matching)
+
+    def test_match_any(self):
+        filters = [
+            {'field': 'open_rate', 'operator': 'gte', 'value': 0.25},
+            {'field': 'domain', 'operator': 'in', 'value': ['@example.com']},
+        ]
+        self.assertEqual(set(), self.get_matching(filters))
+        self.assertEqual({self.engaged, self.inactive}, self.get_matching(filters, SegmentMatch.ANY))
+
+    def test_never_seen_counts_as_not_seen_recently(self):
+        matching = self.get_matching([{'field': 'last_seen_date', 'operator': 'not_within_days', 'value': 30}])
+        self.assertEqual({self.inactive}, matching)
+
+    def test_date_filter(self):
+        tomorrow = (timezone.now() + datetime.timedelta(days=1)).date().isoformat()
+        matching = self.get_matching([{'field': 'optin_date', 'operator': 'after', 'value': tomorrow}])
+        self.assertEqual(set(), matching)
+
+    def test_invalid_filters(self):
+        invalid_filters = (
+            [{'field': 'email', 'operator': 'in', 'value': ['x']}],
+            [{'field': 'open_rate', 'operator': 'in', 'value': 1}],
+            [{'field': 'open_rate', 'operator': 'gte', 'value': '1'}],
+            [{'field': 'tags', 'operator': 'in', 'value': []}],
+            [{'field': 'tags', 'operator': 'in', 'value': ['abc']}],
+            [{'field': 'city', 'operator': 'in', 'value': ['abc']}],
+            [{'field': 'optin_date', 'operator': 'before', 'value': 'yesterday'}],
+            ['open_rate'],
+        )
+        for filters in invalid_filters:
+            with self.subTest(filters=filters):
+                with self.assertRaises(InvalidSegmentFilter):
+                    compile_segment_filters(filters)
+
+    def test_refresh_members_applies_the_difference(self):
+        self.segment.set_filters([{'field': 'domain', 'operator': 'in', 'value': ['gmail.com']}])
+        self.segment.save()
+        self.assertEqual((1, 0), self.segment.refresh_members())
+        self.assertEqual(1, self.segment.members_count)
+        self.assertIsNotNone(self.segment.refresh_date)
+
+        other = SubscriberFactory(mailing_list=self.mailing_list, email='other@gmail.com', domain=self.gmail)
+        self.engaged.status = Status.UNSUBSCRIBED
+        self.engaged.save()
+        self.assertEqual((1, 1), self.segment.refresh_members())
+        self.assertEqual([other], list(self.segment.get_members()))
+        self.assertEqual((0, 0), self.segment.refresh_members())
+
+    def test_delete_with_unsent_campaigns(self):
+        self.segment.save()
+        campaign = CampaignFactory(mailing_list=self.mailing_list, segment=self.segment, status=CampaignStatus.DRAFT)
+        with self.assertRaises(ProtectedError):
+            self.segment.delete()
+        campaign.status = CampaignStatus.SENT
+        campaign.save()
+        self.segment.delete()
+        campaign.refresh_from_db()
+        self.assertIsNone(campaign.segment)
@@ -0,0 +1,152 @@
+import hashlib
+import hmac
+import json
+import time
+
+from django.test import override_settings
+from django.urls import reverse
+
+from colossus.apps.campaigns.tests.factories import (
+    CampaignFactory, EmailFactory,
+)
+from colossus.apps.lists.tests.factories import MailingListFactory
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, Status, SuppressionReasons,
+)
+from colossus.apps.subscribers.models import (
+    Activity, Suppression, WebhookEvent, hash_email,
+)
+from colossus.apps.subscribers.tests.factories import SubscriberFactory
+from colossus.apps.subscribers.webhooks import process_webhook_events
+from colossus.test.testcases import TestCase
+
+SIGNING_KEY = 'key-test'
+
+
+def sign(timestamp, token='token', signing_key=SIGNING_KEY):
+    digest = hmac.new(signing_key.encode('utf-8'), ('%s%s' % (timestamp, token)).encode('utf-8'), hashlib.sha256)
+    return {'timestamp': str(timestamp), 'token': token, 'signature': digest.hexdigest()}
+
+
+@override_settings(MAILGUN_WEBHOOK_SIGNING_KEY=SIGNING_KEY, MAILGUN_WEBHOOK_MAX_AGE=900)
+class MailgunWebhookViewTests(TestCase):
+    def setUp(self):
+        self.url = reverse('subscribers:mailgun_webhook')
+        self.event_data = {'id': 'a', 'event': 'complained', 'recipient': 'john@example.com'}
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_event_queued_with_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.post({'signature': sign(int(time.time())), 'event-data': self.event_data})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.event_data, WebhookEvent.objects.get().get_payload())
+
+    def test_invalid_signatures_rejected(self):
+        now = int(time.time())
+        for signature in (sign(now, signing_key='other-key'), sign(now - 3600), {'timestamp': 'x'}, 'invalid'):
+            with self.subTest(signature=signature):
+                response = self.post({'signature': signature, 'event-data': self.event_data})
+                self.assertEqual(403, response.status_code)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    @override_settings(MAILGUN_WEBHOOK_SIGNING_KEY='')
+    def test_rejected_without_signing_key(self):
+        response = self.post({'signature': sign(int(time.time()), signing_key=''), 'event-data': self.event_data})
+        self.assertEqual(403, response.status_code)
+
+    def test_malformed_payload(self):
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(400, self.post({'event-data': self.event_data}).status_code)
+
+    def test_get_not_allowed(self):
+        self.assertEqual(405, self.client.get(self.url).status_code)
+
+
+class ProcessWebhookEventsTests(TestCase):
+    def setUp(self):
+        self.mailing_list = MailingListFactory()
+        self.campaign = CampaignFactory(mailing_list=self.mailing_list)
+        self.email = EmailFactory(campaign=self.campaign)
+        self.bounced = SubscriberFactory(mailing_list=self.mailing_list, email='bounced@example.com')
+        self.complained = SubscriberFactory(mailing_list=self.mailing_list, email='complained@example.com')
+        self.delivered = SubscriberFactory(mailing_list=self.mailing_list, email='delivered@example.com')
+        self.mailing_list.update_subscribers_count()
+        self.queue(self.event('a', 'failed', self.bounced, severity='permanent'))
+        self.queue(self.event('b', 'complained', self.complained))
+        self.queue(self.event('c', 'delivered', self.delivered))
+        WebhookEvent.objects.create(provider='mailgun', payload='not json')
+
+    def event(self, event_id, event_type, subscriber, **kwargs):
+        event = {
+            'id': event_id,
+            'event': event_type,
+            'timestamp': time.time(),
+            'recipient': subscriber.email,
+            'user-variables': {
+                'colossus_email': str(self.email.uuid),
+                'colossus_subscriber': str(subscriber.uuid),
+            },
+        }
+        event.update(kwargs)
+        return event
+
+    def queue(self, event):
+        webhook_event = WebhookEvent(provider='mailgun')
+        webhook_event.set_payload(event)
+        webhook_event.save()
+
+    def test_queue_drained(self):
+        self.assertEqual(2, process_webhook_events(batch_size=2))
+        self.assertEqual(2, process_webhook_events(batch_size=2))
+        self.assertEqual(0, process_webhook_events(batch_size=2))
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_status_changes(self):
+        process_webhook_events()
+        for subscriber, status in ((self.bounced, Status.CLEANED),
+                                   (self.complained, Status.UNSUBSCRIBED),
+                                   (self.delivered, Status.SUBSCRIBED)):
+            with self.subTest(subscriber=subscriber):
+                subscriber.refresh_from_db()
+                self.assertEqual(status, subscriber.status)
+        self.mailing_list.refresh_from_db()
+        self.assertEqual(1, self.mailing_list.subscribers_count)
+
+    def test_addresses_suppressed(self):
+        process_webhook_events()
+        reasons = dict(Suppression.objects.values_list('email_hash', 'reason'))
+        self.assertEqual({
+            hash_email('bounced@example.com'): SuppressionReasons.BOUNCED,
+            hash_email('complained@example.com'): SuppressionReasons.COMPLAINED,
+        }, reasons)
+
+    def test_activities_created(self):
+        process_webhook_events()
+        self.assertEqual(
+            {ActivityTypes.FAILED, ActivityTypes.CLEANED},
+            set(self.bounced.activities.values_list('activity_type', flat=True))
+        )
+        unsubscribed = self.complained.activities.get()
+        self.assertEqual((ActivityTypes.UNSUBSCRIBED, self.campaign.pk),
+                         (unsubscribed.activity_type, unsubscribed.campaign_id))
+        self.assertEqual('c', self.delivered.activities.get(activity_type=ActivityTypes.DELIVERED).external_id)
+        self.assertEqual(4, Activity.objects.count())
+
+    @override_settings(COLOSSUS_WEBHOOK_MAX_ATTEMPTS=2)
+    def test_failed_event_isolated(self):
+        self.queue(self.event('d', 'delivered', self.delivered, timestamp='yesterday'))
+        self.assertEqual(5, process_webhook_events())
+        failed = WebhookEvent.objects.get()
+        self.assertEqual(1, failed.attempts)
+        self.assertTrue(failed.error.startswith('TypeError'))
+        self.bounced.refresh_from_db()
+        self.assertEqual(Status.CLEANED, self.bounced.status)
+        self.assertEqual('c', self.delivered.activities.get(activity_type=ActivityTypes.DELIVERED).external_id)
+
+        self.assertEqual(1, process_webhook_events())
+        self.assertEqual(0, process_webhook_events())
+        failed.refresh_from_db()
+        self.assertEqual(2, failed.attempts)
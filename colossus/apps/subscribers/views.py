@@ -1,11 +1,12 @@
 import base64
+import json
 import logging
 from uuid import UUID
 
 from django.contrib import messages
 from django.http import (
     Http404, HttpRequest, HttpResponse, HttpResponseBadRequest,
-    HttpResponseRedirect,
+    HttpResponseForbidden, HttpResponseRedirect,
 )
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.translation import gettext as _
@@ -22,9 +23,10 @@ from colossus.apps.core.models import Token
 from colossus.apps.lists.models import MailingList
 from colossus.utils import get_client_ip, ip_address_key
 
-from .constants import Status
+from .constants import Status, WebhookProviders
 from .forms import SubscribeForm, UnsubscribeForm
-from .models import Subscriber
+from .models import Subscriber, WebhookEvent
+from .webhooks import verify_mailgun_signature
 
 logger = logging.getLogger(__name__)
 
@@ -37,8 +39,7 @@ class IndexView(View):
 @csrf_exempt
 @require_POST
 def manage(request):
-    for k, v in request.POST.items():
-        print('%s ==> %s' % (k, v))
+    logger.debug('Manage request: %s', dict(request.POST.items()))
 
     subject = request.POST.get('subject', '')
     subject = subject.strip().lower()
@@ -49,6 +50,27 @@ def manage(request):
     return HttpResponse('no action tiggered.')
 
 
+@csrf_exempt
+@require_POST
+def mailgun_webhook(request):
+    """
+    Receive the events pushed by Mailgun. The event is only queued here, and
+    applied later by the `process_webhook_events_task`.
+    """
+    try:
+        payload = json.loads(request.body.decode('utf-8'))
+        signature = payload['signature']
+        event_data = payload['event-data']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest()
+    if not isinstance(event_data, dict) or not verify_mailgun_signature(signature):
+        return HttpResponseForbidden()
+    webhook_event = WebhookEvent(provider=WebhookProviders.MAILGUN)
+    webhook_event.set_payload(event_data)
+    webhook_event.save()
+    return HttpResponse('OK', content_type='text/plain')
+
+
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 @ratelimit(key=ip_address_key, rate='10/5m', method='POST')
@@ -0,0 +1,206 @@
+"""
+Intake of the events pushed by the Mailgun webhooks.
+
+The webhook view only checks the signature and appends the event to the
+`WebhookEvent` queue, so it costs a single INSERT whatever the load. The
+queue is drained by `process_webhook_events`, which applies a batch of events
+with a handful of bulk queries:
+
+* deliveries, permanent failures, opens and clicks become activities, the same
+  way as the events read from the Mailgun API (see `events.ingest_events`);
+* hard bounces, complaints and unsubscriptions add the address to the
+  suppression list and change the status of the matching subscribers.
+"""
+import hashlib
+import hmac
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from colossus.apps.campaigns.models import Email
+from colossus.apps.lists.models import MailingList
+from colossus.apps.lists.tasks import clean_bounced_subscribers
+from colossus.apps.lists.utils import suspend_subscribers_count
+from colossus.apps.subscribers.constants import (
+    ActivityTypes, Status, SuppressionReasons,
+)
+from colossus.apps.subscribers.events import (
+    MAILGUN_EVENTS_TYPES, ingest_events, parse_uuid,
+)
+from colossus.apps.subscribers.models import (
+    Activity, DailyActivity, Subscriber, Suppression, WebhookEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+UNSUBSCRIBE_EVENTS_REASONS = {
+    'complained': SuppressionReasons.COMPLAINED,
+    'unsubscribed': SuppressionReasons.UNSUBSCRIBED,
+}
+
+
+def verify_mailgun_signature(signature: Dict) -> bool:
+    """
+    Check the HMAC-SHA256 signature of a webhook request, as documented by
+    Mailgun, and reject the requests older than `MAILGUN_WEBHOOK_MAX_AGE`.
+    """
+    signing_key = settings.MAILGUN_WEBHOOK_SIGNING_KEY
+    if not signing_key or not isinstance(signature, dict):
+        return False
+    timestamp = str(signature.get('timestamp', ''))
+    token = str(signature.get('token', ''))
+    try:
+        if abs(time.time() - float(timestamp)) > settings.MAILGUN_WEBHOOK_MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    digest = hmac.new(signing_key.encode('utf-8'), (timestamp + token).encode('utf-8'), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(digest, str(signature.get('signature', '')))
+
+
+def unsubscribe_subscribers(recipients: List[Tuple[uuid.UUID, Optional[uuid.UUID]]]) -> int:
+    """
+    Unsubscribe the active subscribers identified by the (subscriber uuid,
+    email uuid) pairs of the `recipients`, with one UPDATE and one bulk INSERT
+    of activities per mailing list. The goodbye email is not sent, as the
+    addresses are suppressed.
+
+    :return: Number of unsubscribed subscribers
+    """
+    campaigns = dict(Email.objects.filter(
+        uuid__in={email_uuid for subscriber_uuid, email_uuid in recipients if email_uuid is not None}
+    ).values_list('uuid', 'campaign_id'))
+    subscribers_campaigns = {subscriber_uuid: campaigns.get(email_uuid) for subscriber_uuid, email_uuid in recipients}
+
+    subscribers_by_list: Dict[int, List[Tuple[int, int]]] = dict()
+    subscribers = Subscriber.objects \
+        .filter(uuid__in=subscribers_campaigns.keys(), status=Status.SUBSCRIBED) \
+        .values_list('uuid', 'pk', 'mailing_list_id')
+    for subscriber_uuid, pk, mailing_list_id in subscribers:
+        campaign_id = subscribers_campaigns[subscriber_uuid]
+        subscribers_by_list.setdefault(mailing_list_id, list()).append((pk, campaign_id))
+
+    unsubscribed = 0
+    for mailing_list in MailingList.objects.filter(pk__in=subscribers_by_list.keys()):
+        subscribers = subscribers_by_list[mailing_list.pk]
+        now = timezone.now()
+        with suspend_subscribers_count(mailing_list), transaction.atomic():
+            Subscriber.objects \
+                .filter(pk__in=[pk for pk, campaign_id in subscribers]) \
+                .update(status=Status.UNSUBSCRIBED, update_date=now)
+            Activity.objects.bulk_create([
+                Activity(subscriber_id=pk, campaign_id=campaign_id, activity_type=ActivityTypes.UNSUBSCRIBED)
+                for pk, campaign_id in subscribers
+            ])
+            campaign_counts: Dict[int, int] = dict()
+            for pk, campaign_id in subscribers:
+                campaign_counts[campaign_id] = campaign_counts.get(campaign_id, 0) + 1
+            for campaign_id, count in campaign_counts.items():
+                DailyActivity.objects.increment(mailing_list.pk, campaign_id, timezone.localdate(now),
+                                                ActivityTypes.UNSUBSCRIBED, count)
+        unsubscribed += len(subscribers)
+    return unsubscribed
+
+
+def apply_mailgun_events(events: List[Dict]):
+    activities_events = list()
+    bounced_emails: Set[str] = set()
+    suppressed_emails: Dict[int, Set[str]] = dict()
+    recipients: List[Tuple[uuid.UUID, Optional[uuid.UUID]]] = list()
+    for event in events:
+        event_type = event.get('event')
+        recipient = Subscriber.objects.normalize_email(event.get('recipient') or '')
+        if event_type in MAILGUN_EVENTS_TYPES:
+            activities_events.append(event)
+        if event_type == 'failed' and event.get('severity') == 'permanent' and recipient:
+            bounced_emails.add(recipient)
+        elif event_type in UNSUBSCRIBE_EVENTS_REASONS:
+            if recipient:
+                suppressed_emails.setdefault(UNSUBSCRIBE_EVENTS_REASONS[event_type], set()).add(recipient)
+            variables = event.get('user-variables') or dict()
+            subscriber_uuid = parse_uuid(variables.get('colossus_subscriber'))
+            if subscriber_uuid is not None:
+                recipients.append((subscriber_uuid, parse_uuid(variables.get('colossus_email'))))
+
+    ingest_events(activities_events)
+    if bounced_emails:
+        Suppression.objects.suppress(bounced_emails, SuppressionReasons.BOUNCED)
+        clean_bounced_subscribers(bounced_emails)
+    for reason, emails in suppressed_emails.items():
+        Suppression.objects.suppress(emails, reason)
+    if recipients:
+        unsubscribe_subscribers(recipients)
+
+
+def apply_webhook_events(webhook_events: List[WebhookEvent], events: List[Dict]) -> List[WebhookEvent]:
+    """
+    Apply the `events` parsed from the `webhook_events`, all at once in a
+    savepoint. If that fails, apply them again one by one, so a single bad
+    event doesn't hold back the rest of the batch.
+
+    :return: The webhook events which failed to apply, with their error set
+    """
+    try:
+        with transaction.atomic():
+            apply_mailgun_events(events)
+        return list()
+    except Exception:
+        logger.exception('Failed to apply a batch of %s webhook events. Applying them one by one.' % len(events))
+
+    failed = list()
+    for webhook_event, event in zip(webhook_events, events):
+        try:
+            with transaction.atomic():
+                apply_mailgun_events([event])
+        except Exception as err:
+            logger.exception('Failed to apply the webhook event %s.' % webhook_event.pk)
+            webhook_event.error = '%s: %s' % (type(err).__name__, err)
+            failed.append(webhook_event)
+    return failed
+
+
+def process_webhook_events(batch_size: int = None) -> int:
+    """
+    Apply and delete a batch of queued webhook events, in a single transaction.
+    On PostgreSQL the rows are claimed with SKIP LOCKED, so several workers
+    can drain the queue at the same time. The events which fail are kept in
+    the queue with one more attempt, until `COLOSSUS_WEBHOOK_MAX_ATTEMPTS`.
+
+    :return: Number of events processed
+    """
+    batch_size = batch_size or settings.COLOSSUS_WEBHOOK_BATCH_SIZE
+    with transaction.atomic():
+        queue = WebhookEvent.objects \
+            .filter(attempts__lt=settings.COLOSSUS_WEBHOOK_MAX_ATTEMPTS) \
+            .order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True)
+        webhook_events = list(queue[:batch_size])
+        if not webhook_events:
+            return 0
+        valid_webhook_events = list()
+        events = list()
+        for webhook_event in webhook_events:
+            try:
+                payload = webhook_event.get_payload()
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                valid_webhook_events.append(webhook_event)
+                events.append(payload)
+            else:
+                logger.warning('Discarding the malformed webhook event %s.' % webhook_event.pk)
+        failed = apply_webhook_events(valid_webhook_events, events)
+        for webhook_event in failed:
+            webhook_event.attempts += 1
+            webhook_event.save(update_fields=['attempts', 'error'])
+        failed_pks = {webhook_event.pk for webhook_event in failed}
+        WebhookEvent.objects.filter(
+            pk__in=[webhook_event.pk for webhook_event in webhook_events if webhook_event.pk not in failed_pks]
+        ).delete()
+    return len(webhook_events)
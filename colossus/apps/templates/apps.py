@@ -1,10 +1,10 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps as global_apps
 from django.db.models.signals import post_migrate
 from django.template.loader import get_template
 
 
 def create_default_template(sender, **kwargs):
-    apps = kwargs.get('apps')
+    apps = kwargs.get('apps') or global_apps
     EmailTemplate = apps.get_model('templates', 'EmailTemplate')
     if not EmailTemplate.objects.exists():
         default_content = get_template('templates/default_email_template_content.html')
@@ -0,0 +1,273 @@
+"""
+Pure Python compressed bitmap of non-negative integers, in the spirit of
+Roaring bitmaps.
+
+The integers are split by their high bits (`value >> 16`) into containers of
+65536 possible values. A container holding few values is a sorted
+`array('H')` of the low 16 bits (2 bytes per value); once it grows past
+`ARRAY_MAX_SIZE` values it becomes a dense bitset stored in a Python `int`
+(8 KiB at most), whose bitwise operators run in C. Set operations are applied
+container by container, so they only touch the key ranges both sides have in
+common, and cardinalities are kept per container so `len()` is a sum over a
+handful of integers.
+"""
+import struct
+import sys
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Union
+
+ARRAY_MAX_SIZE = 4096
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+LOW_MASK = CONTAINER_SIZE - 1
+
+MAGIC = b'CRB1'
+HEADER = struct.Struct('<4sI')
+CONTAINER_HEADER = struct.Struct('<QBI')
+ARRAY_CONTAINER = 0
+BITSET_CONTAINER = 1
+
+Container = Union[array, int]
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+def _to_bitset(container: Container) -> int:
+    if isinstance(container, int):
+        return container
+    bitset = 0
+    for low in container:
+        bitset |= 1 << low
+    return bitset
+
+
+def _iter_bitset(bitset: int) -> Iterator[int]:
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+def _normalize(container: Container) -> Container:
+    """
+    Pick the cheapest representation for the container, or None if empty.
+    """
+    if isinstance(container, int):
+        cardinality = _popcount(container)
+        if cardinality > ARRAY_MAX_SIZE:
+            return container
+        container = array('H', _iter_bitset(container))
+    if len(container) > ARRAY_MAX_SIZE:
+        return _to_bitset(container)
+    return container if len(container) else None
+
+
+def _cardinality(container: Container) -> int:
+    return _popcount(container) if isinstance(container, int) else len(container)
+
+
+def _iter_container(container: Container) -> Iterator[int]:
+    return _iter_bitset(container) if isinstance(container, int) else iter(container)
+
+
+class RoaringBitmap:
+    def __init__(self, values: Iterable[int] = ()):
+        self._containers: Dict[int, Container] = dict()
+        self._cardinalities: Dict[int, int] = dict()
+        self.update(values)
+
+    @classmethod
+    def _from_containers(cls, containers: Dict[int, Container]) -> 'RoaringBitmap':
+        bitmap = cls()
+        for high, container in containers.items():
+            container = _normalize(container)
+            if container is not None:
+                bitmap._containers[high] = container
+                bitmap._cardinalities[high] = _cardinality(container)
+        return bitmap
+
+    def update(self, values: Iterable[int]):
+        """
+        Add the `values`. Sorted input (e.g. primary keys read in order) is
+        the fastest, as each container is then filled in a single pass.
+        """
+        pending: Dict[int, List[int]] = dict()
+        for value in values:
+            if value < 0:
+                raise ValueError('Bitmaps only hold non-negative integers, got %s.' % value)
+            pending.setdefault(value >> CONTAINER_BITS, list()).append(value & LOW_MASK)
+        for high, lows in pending.items():
+            container = self._containers.get(high)
+            if container is None:
+                merged = array('H', sorted(set(lows)))
+            elif isinstance(container, int):
+                merged = container | _to_bitset(lows)
+            else:
+                merged = array('H', sorted(set(container).union(lows)))
+            self._set_container(high, _normalize(merged))
+
+    def add(self, value: int):
+        self.update((value,))
+
+    def discard(self, value: int):
+        if value not in self:
+            return
+        high, low = value >> CONTAINER_BITS, value & LOW_MASK
+        container = self._containers[high]
+        if isinstance(container, int):
+            container = container & ~(1 << low)
+        else:
+            container = array('H', (item for item in container if item != low))
+        self._set_container(high, _normalize(container))
+
+    def _set_container(self, high: int, container: Container):
+        if container is None:
+            self._containers.pop(high, None)
+            self._cardinalities.pop(high, None)
+        else:
+            self._containers[high] = container
+            self._cardinalities[high] = _cardinality(container)
+
+    def __contains__(self, value: int) -> bool:
+        if value < 0:
+            return False
+        container = self._containers.get(value >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = value & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        # Binary search in the sorted array container.
+        lo, hi = 0, len(container)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if container[mid] < low:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < len(container) and container[lo] == low
+
+    def __len__(self) -> int:
+        return sum(self._cardinalities.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self._containers):
+            base = high << CONTAINER_BITS
+            for low in _iter_container(self._containers[high]):
+                yield base | low
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        if self._cardinalities != other._cardinalities:
+            return False
+        return all(
+            _to_bitset(container) == _to_bitset(other._containers[high])
+            for high, container in self._containers.items()
+        )
+
+    def __repr__(self) -> str:
+        return '<RoaringBitmap: %s values in %s containers>' % (len(self), len(self._containers))
+
+    def __and__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        containers = dict()
+        for high in self._containers.keys() & other._containers.keys():
+            left, right = self._containers[high], other._containers[high]
+            if isinstance(left, int) or isinstance(right, int):
+                containers[high] = _to_bitset(left) & _to_bitset(right)
+            else:
+                containers[high] = array('H', sorted(set(left).intersection(right)))
+        return self._from_containers(containers)
+
+    def __or__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        containers = dict(self._containers)
+        for high, right in other._containers.items():
+            left = containers.get(high)
+            if left is None:
+                containers[high] = right
+            elif isinstance(left, int) or isinstance(right, int):
+                containers[high] = _to_bitset(left) | _to_bitset(right)
+            else:
+                containers[high] = array('H', sorted(set(left).union(right)))
+        return self._from_containers(containers)
+
+    def __sub__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        containers = dict(self._containers)
+        for high in self._containers.keys() & other._containers.keys():
+            left, right = self._containers[high], other._containers[high]
+            if isinstance(left, int) or isinstance(right, int):
+                containers[high] = _to_bitset(left) & ~_to_bitset(right)
+            else:
+                containers[high] = array('H', sorted(set(left).difference(right)))
+        return self._from_containers(containers)
+
+    @classmethod
+    def union(cls, *bitmaps: 'RoaringBitmap') -> 'RoaringBitmap':
+        result = cls()
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
+
+    @classmethod
+    def intersection(cls, first: 'RoaringBitmap', *others: 'RoaringBitmap') -> 'RoaringBitmap':
+        result = first
+        for bitmap in others:
+            result = result & bitmap
+        return result
+
+    def chunks(self, size: int) -> Iterator[List[int]]:
+        """
+        Iterate over the values in ascending order, `size` values at a time,
+        e.g. to fetch the matching rows with `pk__in` batches.
+        """
+        values = iter(self)
+        while True:
+            chunk = list(islice(values, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def to_bytes(self) -> bytes:
+        parts = [HEADER.pack(MAGIC, len(self._containers))]
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            if isinstance(container, int):
+                payload = container.to_bytes(CONTAINER_SIZE // 8, 'little')
+                parts.append(CONTAINER_HEADER.pack(high, BITSET_CONTAINER, len(payload)))
+            else:
+                values = array('H', container)
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                payload = values.tobytes()
+                parts.append(CONTAINER_HEADER.pack(high, ARRAY_CONTAINER, len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'RoaringBitmap':
+        data = bytes(data)
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a serialized bitmap.')
+        offset = HEADER.size
+        containers = dict()
+        for _ in range(count):
+            high, container_type, length = CONTAINER_HEADER.unpack_from(data, offset)
+            offset += CONTAINER_HEADER.size
+            payload = data[offset:offset + length]
+            offset += length
+            if container_type == BITSET_CONTAINER:
+                containers[high] = int.from_bytes(payload, 'little')
+            else:
+                values = array('H')
+                values.frombytes(payload)
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                containers[high] = values
+        return cls._from_containers(containers)
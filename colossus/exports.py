@@ -0,0 +1,108 @@
+"""
+Helpers to export large querysets as CSV or JSON Lines files.
+
+The rows are consumed from `QuerySet.iterator()`, which uses a server-side
+cursor on PostgreSQL, and serialized one by one, so the memory footprint stays
+flat regardless of the number of rows. The same generator feeds both the
+streaming HTTP responses and the files written by the background tasks.
+"""
+import csv
+import datetime
+import json
+import tempfile
+from typing import Any, Iterable, Iterator, Sequence
+
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+
+
+class ExportFormats:
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+    LABELS = {
+        CSV: _('CSV'),
+        JSONL: _('JSON Lines'),
+    }
+
+    CHOICES = tuple(LABELS.items())
+
+    CONTENT_TYPES = {
+        CSV: 'text/csv',
+        JSONL: 'application/x-ndjson',
+    }
+
+
+class Echo:
+    """
+    File-like object returning the value written, so `csv.writer` can be used
+    to serialize a single row at a time.
+    """
+    def write(self, value: str) -> str:
+        return value
+
+
+def serialize_value(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool, list)) or value is None:
+        return value
+    return str(value)
+
+
+def serialize_csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value)
+    return serialize_value(value)
+
+
+def iter_export_lines(export_format: str, fields: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    """
+    Serialize the `rows` (sequences of values in the same order as the
+    `fields`) as lines of text. CSV output starts with the header row.
+    """
+    if export_format == ExportFormats.JSONL:
+        for row in rows:
+            yield json.dumps(dict(zip(fields, map(serialize_value, row)))) + '\n'
+    else:
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([serialize_csv_value(value) for value in row])
+
+
+def get_export_filename(name: str, export_format: str) -> str:
+    return '%s.%s' % (name, export_format)
+
+
+def get_streaming_export_response(name: str,
+                                  export_format: str,
+                                  fields: Sequence[str],
+                                  rows: Iterable[Sequence]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(
+        iter_export_lines(export_format, fields, rows),
+        content_type=ExportFormats.CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = 'attachment; filename="%s"' % get_export_filename(name, export_format)
+    return response
+
+
+def save_export(storage: Storage,
+                name: str,
+                export_format: str,
+                fields: Sequence[str],
+                rows: Iterable[Sequence]) -> str:
+    """
+    Write the export to a temporary file first, then hand it to the `storage`.
+
+    :return: The name of the file in the storage
+    """
+    with tempfile.TemporaryFile() as export_file:
+        for line in iter_export_lines(export_format, fields, rows):
+            export_file.write(line.encode('utf-8'))
+        export_file.seek(0)
+        return storage.save(get_export_filename(name, export_format), File(export_file))
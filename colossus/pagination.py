@@ -0,0 +1,83 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list: List[Any], next_cursor: Optional[str]):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset using the values of the last row of the page (the
+    cursor) instead of an OFFSET, so fetching a page deep into a large table
+    costs the same as fetching the first one, provided there is an index
+    covering the `ordering` fields.
+
+    The `ordering` must uniquely identify a row, so its last field should be
+    the primary key (e.g. `('-date', '-id')`). Only forward pagination is
+    supported. Cursors are opaque url-safe strings.
+    """
+    def __init__(self, queryset: QuerySet, ordering: Sequence[str], per_page: int = 50):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj) -> str:
+        model_fields = [self.queryset.model._meta.get_field(name) for name in self.fields]
+        values = [field.value_to_string(obj) for field in model_fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            model_fields = [self.queryset.model._meta.get_field(name) for name in self.fields]
+            return [field.to_python(value) for field, value in zip(model_fields, values)]
+        except (ValueError, TypeError, ValidationError) as err:
+            raise InvalidCursor('Invalid cursor "%s".' % cursor) from err
+
+    def get_cursor_filter(self, values: List[Any]) -> Q:
+        """
+        Build the row comparison `(a, b, c) > (x, y, z)` as
+        `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`, honoring
+        the direction of each field of the ordering.
+        """
+        cursor_filter = Q()
+        equals = dict()
+        for ordering, field, value in zip(self.ordering, self.fields, values):
+            lookup = '%s__lt' % field if ordering.startswith('-') else '%s__gt' % field
+            cursor_filter |= Q(**equals, **{lookup: value})
+            equals[field] = value
+        return cursor_filter
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.get_cursor_filter(self.decode_cursor(cursor)))
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
@@ -228,6 +228,22 @@ CELERY_BEAT_SCHEDULE = {
     'clean-lists-hard-bounces': {
         'task': 'colossus.apps.lists.tasks.clean_lists_hard_bounces_task',
         'schedule': crontab(hour=12, minute=0)
+    },
+    'ensure-activity-partitions': {
+        'task': 'colossus.apps.subscribers.tasks.ensure_activity_partitions_task',
+        'schedule': crontab(hour=0, minute=30)
+    },
+    'ingest-mailgun-events': {
+        'task': 'colossus.apps.subscribers.tasks.ingest_mailgun_events_task',
+        'schedule': 300.0
+    },
+    'process-webhook-events': {
+        'task': 'colossus.apps.subscribers.tasks.process_webhook_events_task',
+        'schedule': 60.0
+    },
+    'process-bounces-mailbox': {
+        'task': 'colossus.apps.lists.tasks.process_bounces_mailbox_task',
+        'schedule': 900.0
     }
 }
 
@@ -240,6 +256,71 @@ CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=True, cast
 
 COLOSSUS_HTTPS_ONLY = config('COLOSSUS_HTTPS_ONLY', default=False, cast=bool)
 
+# Maximum number of domain name to id entries kept in memory by each process.
+COLOSSUS_DOMAIN_CACHE_SIZE = config('COLOSSUS_DOMAIN_CACHE_SIZE', default=10000, cast=int)
+
+COLOSSUS_IMPORT_CHUNK_SIZE = config('COLOSSUS_IMPORT_CHUNK_SIZE', default=5000, cast=int)
+
+# Either "orm" or "postgresql_copy". The COPY engine is only used if the database is PostgreSQL.
+COLOSSUS_IMPORT_ENGINE = config('COLOSSUS_IMPORT_ENGINE', default='orm')
+
+# Number of processes used to parse the CSV files of the ORM import engine. Parallel parsing is disabled if 1.
+COLOSSUS_IMPORT_WORKERS = config('COLOSSUS_IMPORT_WORKERS', default=1, cast=int)
+
+# Pasted email lists longer than this are imported by a Celery task instead of within the request.
+COLOSSUS_PASTE_IMPORT_SYNC_LIMIT = config('COLOSSUS_PASTE_IMPORT_SYNC_LIMIT', default=1000, cast=int)
+
+# Number of rows fetched at a time from the database cursor by the CSV/JSON Lines exports.
+COLOSSUS_EXPORT_CHUNK_SIZE = config('COLOSSUS_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Number of recipients loaded at a time while sending a campaign, and checked against the suppression list.
+COLOSSUS_SEND_CHUNK_SIZE = config('COLOSSUS_SEND_CHUNK_SIZE', default=500, cast=int)
+
+# Number of queued webhook events applied at a time.
+COLOSSUS_WEBHOOK_BATCH_SIZE = config('COLOSSUS_WEBHOOK_BATCH_SIZE', default=500, cast=int)
+
+# Queued webhook events failing this many times are kept aside, with their error, instead of being retried.
+COLOSSUS_WEBHOOK_MAX_ATTEMPTS = config('COLOSSUS_WEBHOOK_MAX_ATTEMPTS', default=5, cast=int)
+
+# Maildir directory or mbox file receiving the bounce messages (DSNs), for setups not using the Mailgun API.
+COLOSSUS_BOUNCES_MAILBOX = config('COLOSSUS_BOUNCES_MAILBOX', default='')
+
+# Number of IP addresses, and of cities, whose location is cached by each process.
+COLOSSUS_GEOIP_CACHE_SIZE = config('COLOSSUS_GEOIP_CACHE_SIZE', default=100000, cast=int)
+
+COLOSSUS_GEOIP_CITIES_CACHE_SIZE = config('COLOSSUS_GEOIP_CITIES_CACHE_SIZE', default=20000, cast=int)
+
+# Log the hit rates of the GeoIP caches every N lookups. Set to 0 to disable.
+COLOSSUS_GEOIP_STATS_INTERVAL = config('COLOSSUS_GEOIP_STATS_INTERVAL', default=10000, cast=int)
+
+# Seconds the total number of subscribers displayed in the subscribers list is cached.
+COLOSSUS_SUBSCRIBERS_TOTAL_CACHE_TIMEOUT = config('COLOSSUS_SUBSCRIBERS_TOTAL_CACHE_TIMEOUT', default=300, cast=int)
+
 MAILGUN_API_KEY = config('MAILGUN_API_KEY', default='')
 
 MAILGUN_API_BASE_URL = config('MAILGUN_API_BASE_URL', default='')
+
+# Seconds to wait for the Mailgun API to accept the connection and to send each response.
+MAILGUN_API_CONNECT_TIMEOUT = config('MAILGUN_API_CONNECT_TIMEOUT', default=5, cast=float)
+
+MAILGUN_API_READ_TIMEOUT = config('MAILGUN_API_READ_TIMEOUT', default=30, cast=float)
+
+# Retries of the Mailgun API requests answered with 429 or 5xx, sleeping backoff_factor * 2 ** (retry - 1) seconds.
+MAILGUN_API_MAX_RETRIES = config('MAILGUN_API_MAX_RETRIES', default=5, cast=int)
+
+MAILGUN_API_BACKOFF_FACTOR = config('MAILGUN_API_BACKOFF_FACTOR', default=0.5, cast=float)
+
+# Maximum number of connections to the Mailgun API kept open by each process.
+MAILGUN_API_POOL_SIZE = config('MAILGUN_API_POOL_SIZE', default=10, cast=int)
+
+# Seconds Mailgun may take to store an event, so the events ingestion never reads past (now - settle time).
+MAILGUN_EVENTS_SETTLE_TIME = config('MAILGUN_EVENTS_SETTLE_TIME', default=1800, cast=int)
+
+# Seconds of past events read by the first events ingestion, when there is no checkpoint yet.
+MAILGUN_EVENTS_INITIAL_LOOKBACK = config('MAILGUN_EVENTS_INITIAL_LOOKBACK', default=86400, cast=int)
+
+# Key used to verify the signature of the Mailgun webhooks. The webhooks are rejected while it is empty.
+MAILGUN_WEBHOOK_SIGNING_KEY = config('MAILGUN_WEBHOOK_SIGNING_KEY', default='')
+
+# Seconds a signed Mailgun webhook request is accepted for, to limit replays.
+MAILGUN_WEBHOOK_MAX_AGE = config('MAILGUN_WEBHOOK_MAX_AGE', default=900, cast=int)
@@ -1,10 +1,13 @@
 import logging
+import threading
 import uuid
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
 
 from django.conf import settings
 from django.contrib.gis.geoip2 import GeoIP2
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import connection, transaction
 from django.http import HttpRequest
 from django.urls import reverse
 
@@ -56,28 +59,136 @@ def ip_address_key(group: str, request: HttpRequest) -> str:
     return get_client_ip(request)
 
 
+class GeoIPLocator:
+    """
+    Resolve IP addresses to the primary key of their City.
+
+    The GeoLite2 database is opened once (memory-mapped by the reader) and
+    shared by all the lookups of the process. The lookups go through
+    process-local LRU caches: IP address to city id, plus the ids of the
+    countries and cities already seen, so a cache hit costs no query at all.
+    The ids are only cached once the transaction that read or created them
+    commits, the same as the domains cache.
+    """
+    # Cached for the IP addresses without a known city
+    NO_CITY = 0
+
+    def __init__(self, ip_cache_size: int, cities_cache_size: int, stats_interval: int = 0):
+        self.ips = LRUCache(maxsize=ip_cache_size)
+        self.countries = LRUCache(maxsize=1024)
+        self.cities = LRUCache(maxsize=cities_cache_size)
+        self.stats_interval = stats_interval
+        self._geoip2 = None
+        self._lock = threading.Lock()
+        self._lookups = 0
+
+    @property
+    def geoip2(self) -> GeoIP2:
+        if self._geoip2 is None:
+            with self._lock:
+                if self._geoip2 is None:
+                    self._geoip2 = GeoIP2()
+        return self._geoip2
+
+    def get_country_id(self, code: str, name: str) -> int:
+        country_id = self.countries.get(code)
+        if country_id is None:
+            country, created = Country.objects.get_or_create(code=code, defaults={'name': name})
+            country_id = country.pk
+            transaction.on_commit(lambda: self.countries.set(code, country_id))
+        return country_id
+
+    def get_city_id(self, country_id: int, name: str) -> int:
+        key = (country_id, name)
+        city_id = self.cities.get(key)
+        if city_id is None:
+            city, created = City.objects.get_or_create(name=name, country_id=country_id)
+            city_id = city.pk
+            transaction.on_commit(lambda: self.cities.set(key, city_id))
+        return city_id
+
+    def get_city_id_for_ip(self, ip_address: str) -> Optional[int]:
+        city_id = self.ips.get(ip_address)
+        if city_id is None:
+            city_id = self.NO_CITY
+            try:
+                geodata = self.geoip2.city(ip_address)
+                if geodata.get('country_code') is not None:
+                    country_id = self.get_country_id(geodata['country_code'], geodata['country_name'])
+                    if geodata.get('city') is not None:
+                        city_id = self.get_city_id(country_id, geodata['city'])
+            except AddressNotFoundError:
+                logger.warning('Address not found for ip_address = "%s"' % ip_address)
+            transaction.on_commit(lambda: self.ips.set(ip_address, city_id))
+        self._log_stats()
+        return city_id if city_id != self.NO_CITY else None
+
+    def _log_stats(self):
+        self._lookups += 1
+        if self.stats_interval and self._lookups % self.stats_interval == 0:
+            logger.info('GeoIP caches after %s lookups: %s' % (self._lookups, self.stats()))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Size and hit rate of each cache, to help sizing them.
+        """
+        stats = dict()
+        for name, cache in (('ips', self.ips), ('countries', self.countries), ('cities', self.cities)):
+            cache_stats = cache.stats()
+            lookups = cache_stats['hits'] + cache_stats['misses']
+            cache_stats['hit_rate'] = round(cache_stats['hits'] / lookups, 4) if lookups else 0.0
+            stats[name] = cache_stats
+        return stats
+
+    def clear(self):
+        self.ips.clear()
+        self.countries.clear()
+        self.cities.clear()
+        self._lookups = 0
+
+
+_geoip_locator: Optional[GeoIPLocator] = None
+_geoip_locator_lock = threading.Lock()
+
+
+def get_geoip_locator() -> GeoIPLocator:
+    """
+    Return the locator shared by the whole process.
+    """
+    global _geoip_locator
+    if _geoip_locator is None:
+        with _geoip_locator_lock:
+            if _geoip_locator is None:
+                _geoip_locator = GeoIPLocator(
+                    ip_cache_size=settings.COLOSSUS_GEOIP_CACHE_SIZE,
+                    cities_cache_size=settings.COLOSSUS_GEOIP_CITIES_CACHE_SIZE,
+                    stats_interval=settings.COLOSSUS_GEOIP_STATS_INTERVAL
+                )
+    return _geoip_locator
+
+
+def get_location_id(ip_address: str) -> Optional[int]:
+    """
+    Searches for the city of a given IP address using Django's GeoIP2
+    library, through the process-wide `GeoIPLocator`.
+
+    :param ip_address: An IP address in string format
+    :return: The primary key of the City of the IP address, or None if not
+             found.
+    """
+    return get_geoip_locator().get_city_id_for_ip(ip_address)
+
+
 def get_location(ip_address: str) -> Optional[City]:
     """
-    Searches for the country and city of a given IP address using Django's
-    GeoIP2 library.
+    Same as `get_location_id`, but fetching the City instance.
 
     :param ip_address: An IP address in string format
     :return: A City instance representing the location of the IP address, or
              None if not found.
     """
-    geoip2 = GeoIP2()
-    city = None
-    try:
-        geodata = geoip2.city(ip_address)
-        if geodata.get('country_code') is not None:
-            country, created = Country.objects.get_or_create(code=geodata['country_code'], defaults={
-                'name': geodata['country_name']
-            })
-            if geodata.get('city') is not None:
-                city, created = City.objects.get_or_create(name=geodata['city'], country=country)
-    except AddressNotFoundError:
-        logger.warning('Address not found for ip_address = "%s"' % ip_address)
-    return city
+    city_id = get_location_id(ip_address)
+    return City.objects.filter(pk=city_id).first() if city_id is not None else None
 
 
 def is_uuid(uuid_value: str) -> bool:
@@ -102,3 +213,67 @@ def get_absolute_url(urlname: str, kwargs: dict = None) -> str:
     path = reverse(urlname, kwargs=kwargs)
     absolute_url = '%s://%s%s' % (protocol, site.domain, path)
     return absolute_url
+
+
+def get_max_batch_size(batch_size: int, reserved_params: int = 10) -> int:
+    """
+    Keep the `batch_size` of the queries with one parameter per item (e.g.
+    `pk__in`) within the database's limit of query parameters, leaving
+    `reserved_params` for the rest of the query. Unchanged if the database
+    has no such limit.
+    """
+    max_query_params = connection.features.max_query_params
+    if max_query_params is None:
+        return batch_size
+    return max(1, min(batch_size, max_query_params - reserved_params))
+
+
+class LRUCache:
+    """
+    Thread-safe, process-local mapping holding up to `maxsize` entries. When
+    full, setting a new key discards the least recently used entry. Keeps
+    hits/misses counters to help sizing it.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}